@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Benchmark suite: synthetic data (seed.py), scenarios and the runner (run.py)."""
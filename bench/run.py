@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run the benchmark scenarios and compare them with a saved baseline.
+
+The seeded database (bench/seed.py) is a template. It is created on first
+use under bench/.data/ and reused afterwards. Every run works on a fresh
+copy of it, so write scenarios do not change what later runs measure.
+
+Each scenario is warmed up, then timed `--repeat` times. Results
+(min/p50/p95/mean/max in ms, plus machine, scale and commit) go to a JSON
+file. With `--baseline`, a scenario regresses when its p50 is more than
+`--threshold` slower than the baseline AND at least `--min-delta-ms`
+slower, so a 0.1 ms blip on a 0.3 ms call is not a failure. Any regression
+makes the exit status 1.
+
+Usage:
+    python bench/run.py --scale ci --save-baseline bench/.data/baseline-ci.json
+    python bench/run.py --scale ci --baseline bench/.data/baseline-ci.json
+    python bench/run.py --scale full -k events -k usage --repeat 20
+    python bench/run.py --db /srv/bench/full.db --baseline base.json --threshold 0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'server'))
+
+from bench import scenarios, seed  # noqa: E402
+
+DATA_DIR = os.path.join(ROOT_DIR, 'bench', '.data')
+# Seed metadata that must match for a baseline comparison to mean anything.
+COMPARABLE = ('projects', 'events', 'usage', 'days', 'seed')
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _copy_db(src: str, dst: str) -> None:
+    """Consistent copy via the SQLite backup API (safe with WAL files around)."""
+    source = sqlite3.connect(src)
+    try:
+        target = sqlite3.connect(dst)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+
+def template_db(args, scale: Dict[str, Any], log) -> str:
+    """Path of the seeded template, seeding it first when missing."""
+    if args.db:
+        if not os.path.exists(args.db):
+            raise SystemExit(f'{args.db} does not exist; create it with bench/seed.py')
+        return args.db
+    name = f"{scale['scale']}-p{scale['projects']}-e{scale['events']}-u{scale['usage']}" \
+           f"-d{scale['days']}-s{scale['seed']}.db"
+    path = os.path.join(DATA_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        log(f'seeding {path} (one-off) ...')
+        partial = path + '.partial'
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(partial + suffix):
+                os.remove(partial + suffix)
+        seed.seed(partial, **scale, log=log)
+        os.replace(partial, path)
+    return path
+
+
+def time_scenario(sc: scenarios.Scenario, repeat: int, warmup: int) -> Dict[str, Any]:
+    for _ in range(warmup):
+        sc.fn()
+    gc.collect()
+    samples: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        sc.fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return {
+        'kind': sc.kind,
+        'n': len(samples),
+        'minMs': round(samples[0], 4),
+        'p50Ms': round(statistics.median(samples), 4),
+        'p95Ms': round(samples[max(0, int(round(len(samples) * 0.95)) - 1)], 4),
+        'meanMs': round(statistics.fmean(samples), 4),
+        'maxMs': round(samples[-1], 4),
+    }
+
+
+def run(db_file: str, *, repeat: int, warmup: int, only: List[str], log) -> Dict[str, Any]:
+    """Time the scenarios against a fresh copy of `db_file`."""
+    from mypm import Config, create_app
+    from mypm.jsoncodec import get_codec
+    from mypm.storage import StorageContext
+
+    # Agent routes are open without a token; login-protected reads accept agents then too.
+    os.environ.pop('PM_AGENT_TOKEN', None)
+    with tempfile.TemporaryDirectory(prefix='pilotdeck-bench-') as tmp:
+        work = os.path.join(tmp, 'bench.db')
+        _copy_db(db_file, work)
+        cfg = Config()
+        cfg.DB_FILE = work
+        cfg.SQL_TRACE = False
+        app = create_app(cfg)
+        storage = StorageContext(work, project_cache_size=0)
+        try:
+            conn = storage.acquire()
+            try:
+                meta = seed.read_meta(conn)
+            finally:
+                storage.release(conn)
+            if meta is None:
+                raise SystemExit(f'{db_file} was not created by bench/seed.py (no {seed.META_KEY} meta)')
+
+            results: Dict[str, Any] = {}
+            todo = [sc for sc in scenarios.build(app, storage, meta)
+                    if not only or any(k in sc.name for k in only)]
+            for sc in sorted(todo, key=lambda s: s.writes):
+                results[sc.name] = time_scenario(sc, repeat, warmup)
+                r = results[sc.name]
+                log(f"{sc.name:<28} p50={r['p50Ms']:9.3f}ms p95={r['p95Ms']:9.3f}ms min={r['minMs']:9.3f}ms")
+        finally:
+            storage.close()
+            app.extensions['storage'].close()
+
+    return {
+        'meta': {
+            'createdAt': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'sqlite': sqlite3.sqlite_version,
+            'jsonCodec': get_codec().name,
+            'repeat': repeat,
+            'warmup': warmup,
+            'data': {k: meta.get(k) for k in ('scale',) + COMPARABLE + ('runs',)},
+        },
+        'scenarios': results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], *, threshold: float,
+            min_delta_ms: float) -> List[Dict[str, Any]]:
+    """One row per scenario: status is ok, regressed, improved, new or missing."""
+    rows = []
+    cur, base = current['scenarios'], baseline['scenarios']
+    for name in sorted(set(cur) | set(base)):
+        if name not in base or name not in cur:
+            rows.append({'name': name, 'status': 'new' if name in cur else 'missing'})
+            continue
+        b, c = base[name]['p50Ms'], cur[name]['p50Ms']
+        ratio = c / b if b > 0 else float('inf')
+        if ratio > 1 + threshold and c - b >= min_delta_ms:
+            status = 'regressed'
+        elif ratio < 1 / (1 + threshold) and b - c >= min_delta_ms:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'status': status, 'baseMs': b, 'currentMs': c, 'ratio': round(ratio, 3)})
+    return rows
+
+
+def _print_comparison(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'scenario':<28} {'baseline p50':>13} {'current p50':>13} {'ratio':>7}  status")
+    for r in rows:
+        if 'ratio' in r:
+            print(f"{r['name']:<28} {r['baseMs']:11.3f}ms {r['currentMs']:11.3f}ms {r['ratio']:7.2f}  {r['status']}")
+        else:
+            print(f"{r['name']:<28} {'':>13} {'':>13} {'':>7}  {r['status']}")
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description='Run the PilotDeck benchmark scenarios')
+    seed.add_scale_args(p)
+    p.add_argument('--db', help='seeded template database (default: bench/.data/<scale>-...db, seeded on first use)')
+    p.add_argument('--repeat', type=int, default=10, help='timed iterations per scenario')
+    p.add_argument('--warmup', type=int, default=2, help='untimed iterations per scenario')
+    p.add_argument('-k', '--only', action='append', default=[], help='run scenarios whose name contains this (repeatable)')
+    p.add_argument('--out', default=os.path.join(DATA_DIR, 'results.json'), help='results JSON path')
+    p.add_argument('--baseline', help='compare with this results file; exit 1 on regression')
+    p.add_argument('--save-baseline', help='also write the results here')
+    p.add_argument('--threshold', type=float, default=0.2, help='allowed p50 slowdown ratio (default 0.2 = 20%%)')
+    p.add_argument('--min-delta-ms', type=float, default=1.0, help='ignore slowdowns smaller than this')
+    p.add_argument('-q', '--quiet', action='store_true')
+    args = p.parse_args(argv)
+
+    def log(msg: str) -> None:
+        if not args.quiet:
+            print(msg, file=sys.stderr)
+
+    if args.repeat < 1 or args.warmup < 0:
+        p.error('--repeat must be >= 1 and --warmup >= 0')
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    scale = seed.resolve_scale(args)
+    db_file = template_db(args, scale, log)
+    result = run(db_file, repeat=args.repeat, warmup=args.warmup, only=args.only, log=log)
+    _write_json(args.out, result)
+    if args.save_baseline:
+        _write_json(args.save_baseline, result)
+    log(f'results: {args.out}')
+
+    if baseline is None:
+        return 0
+    want = {k: baseline['meta']['data'].get(k) for k in COMPARABLE}
+    got = {k: result['meta']['data'].get(k) for k in COMPARABLE}
+    if want != got:
+        print(f'baseline was measured on different data: {want} vs {got}', file=sys.stderr)
+        return 2
+    if args.only:
+        baseline = dict(baseline, scenarios={name: r for name, r in baseline['scenarios'].items()
+                                             if any(k in name for k in args.only)})
+    rows = compare(result, baseline, threshold=args.threshold, min_delta_ms=args.min_delta_ms)
+    _print_comparison(rows)
+    regressed = [r['name'] for r in rows if r['status'] == 'regressed']
+    if regressed:
+        print(f"{len(regressed)} regression(s) over {args.threshold:.0%}: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Timed scenarios for bench/run.py.
+
+`api.*` scenarios go through the Flask test client, so routing, auth,
+conditional GET, JSON encoding and compression are included. `store.*`
+scenarios call the stores and ActionService directly, on a StorageContext
+without the project read cache, so they time the SQL and decoding alone.
+
+Reads come first and writes (`writes=True`) last, so the reads see the
+seeded data unchanged. Write scenarios use fresh ids on every iteration,
+and run.py starts each run from a copy of the seeded database.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import count
+from typing import Any, Callable, Dict, List
+
+BULK = 500
+ACTIONS = 20
+
+
+@dataclass
+class Scenario:
+    name: str
+    fn: Callable[[], Any]
+    writes: bool = False
+
+    @property
+    def kind(self) -> str:
+        return self.name.split('.', 1)[0]
+
+
+def _get(client, path: str) -> Callable[[], Any]:
+    def run():
+        resp = client.get(path, headers={'Accept-Encoding': 'gzip'})
+        if resp.status_code != 200:
+            raise RuntimeError(f'GET {path} -> {resp.status_code}: {resp.get_data(as_text=True)[:200]}')
+        return resp.get_data()
+    return run
+
+
+def _post(client, path: str, body: Callable[[], Dict[str, Any]]) -> Callable[[], Any]:
+    def run():
+        resp = client.post(path, json=body(), headers={'Accept-Encoding': 'gzip'})
+        if resp.status_code not in (200, 201):
+            raise RuntimeError(f'POST {path} -> {resp.status_code}: {resp.get_data(as_text=True)[:200]}')
+        return resp.get_data()
+    return run
+
+
+def build(app, storage, meta: Dict[str, Any]) -> List[Scenario]:
+    """Scenarios for a seeded database described by `meta` (seed.META_KEY)."""
+    client = app.test_client()
+    end = datetime.fromisoformat(meta['end'])
+    since_30d = (end - timedelta(days=30)).date().isoformat()
+    # Partial first and last day: the aggregate has to read raw records for the edges.
+    edge_since = (end - timedelta(days=7, hours=-9)).isoformat(timespec='seconds')
+    edge_until = (end - timedelta(hours=6)).isoformat(timespec='seconds')
+    hot = meta['hotProjects'][0]
+    agent = meta['hotAgents'][0]
+    conn = storage.acquire()
+    try:
+        last_seq = conn.execute('SELECT MAX(seq) FROM agent_events').fetchone()[0] or 0
+    finally:
+        storage.release(conn)
+    ids = count()
+
+    def events_batch() -> Dict[str, Any]:
+        n = next(ids)
+        return {'events': [{'id': f'bench-evt-{n}-{i}', 'type': 'note', 'projectId': hot, 'runId': f'bench-run-{n}',
+                            'agentId': agent, 'message': f'bench event {i}', 'data': {'i': i}} for i in range(BULK)]}
+
+    def usage_batch() -> Dict[str, Any]:
+        n = next(ids)
+        ts = end.isoformat(timespec='seconds')
+        return {'records': [{'id': f'bench-usage-{n}-{i}', 'ts': ts, 'projectId': hot, 'agentId': agent,
+                             'workspace': 'ws-00', 'source': 'bench', 'model': 'gpt-4.1-mini',
+                             'promptTokens': 1500, 'completionTokens': 300, 'totalTokens': 1800,
+                             'cost': 0.00108} for i in range(BULK)]}
+
+    def actions_batch() -> Dict[str, Any]:
+        n = next(ids)
+        kinds = (
+            ('bump_progress', {'delta': 1 if n % 2 == 0 else -1}),
+            ('append_note', {'note': f'bench note {n}'}),
+            ('add_tag' if n % 2 == 0 else 'remove_tag', {'tag': 'bench'}),
+        )
+        actions = []
+        for i in range(ACTIONS):
+            typ, params = kinds[i % len(kinds)]
+            actions.append({'id': f'bench-act-{n}-{i}', 'projectId': meta['hotProjects'][i % len(meta['hotProjects'])],
+                            'type': typ, 'params': params})
+        return {'agentId': agent, 'actions': actions}
+
+    action_service = app.extensions['action_service']
+
+    return [
+        # Projects
+        Scenario('api.projects.list', _get(client, '/api/projects')),
+        Scenario('api.projects.page', _get(client, '/api/projects?limit=100&fields=name,status,priority,progress,tags')),
+        Scenario('api.projects.filter', _get(client, '/api/projects?status=in-progress&priority=high')),
+        Scenario('api.projects.get', _get(client, f'/api/projects/{hot}')),
+        Scenario('store.projects.list', lambda: storage.projects.list()),
+        Scenario('store.projects.filter', lambda: storage.projects.list(status='in-progress', category='category-00')),
+        Scenario('store.projects.page', lambda: storage.projects.list(fields=['name', 'status', 'tags'], limit=100)),
+        # Events feed
+        Scenario('api.events.feed', _get(client, '/api/agent/events?limit=200')),
+        Scenario('api.events.feed_2000', _get(client, '/api/agent/events?limit=2000')),
+        Scenario('api.events.project', _get(client, f'/api/agent/events?projectId={hot}&limit=200')),
+        Scenario('api.events.incremental', _get(client, f'/api/agent/events?after={max(0, last_seq - 100)}&limit=200')),
+        Scenario('store.events.feed', lambda: storage.agent_events.list(
+            project_id=None, run_id=None, agent_id=None, typ=None, since_dt=None, limit=200)),
+        Scenario('store.events.agent', lambda: storage.agent_events.list(
+            project_id=None, run_id=None, agent_id=agent, typ='error', since_dt=None, limit=200)),
+        # Token usage
+        Scenario('api.usage.list_5000', _get(client, '/api/agent/usage?limit=5000')),
+        Scenario('api.stats.tokens_30d', _get(client, f'/api/stats/tokens?since={since_30d}')),
+        Scenario('api.stats.tokens_project', _get(client, f'/api/stats/tokens?projectId={hot}')),
+        Scenario('api.stats.series', _get(client, f'/api/stats/tokens/series?granularity=day&groupBy=model&since={since_30d}')),
+        Scenario('store.usage.aggregate', lambda: storage.token_usage.aggregate()),
+        Scenario('store.usage.aggregate_edges', lambda: storage.token_usage.aggregate(since=edge_since, until=edge_until)),
+        Scenario('store.usage.series_hour', lambda: storage.token_usage.series(
+            granularity='hour', group_by=['model'], since=edge_since, until=edge_until)),
+        # Writes
+        Scenario('api.actions.batch', _post(client, '/api/agent/actions', actions_batch), writes=True),
+        Scenario('store.actions.batch', lambda: action_service.execute(
+            actions_batch()['actions'], agent_id=agent), writes=True),
+        Scenario('api.events.ingest', _post(client, '/api/agent/events', events_batch), writes=True),
+        Scenario('api.usage.ingest', _post(client, '/api/agent/usage', usage_batch), writes=True),
+        Scenario('store.events.append_many', lambda: storage.agent_events.append_many(events_batch()['events']),
+                 writes=True),
+        Scenario('store.usage.ingest_many', lambda: storage.token_usage.ingest_many(usage_batch()['records']),
+                 writes=True),
+    ]
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Seed a SQLite database with synthetic PilotDeck data at a given scale.
+
+Everything goes through the public store methods (create / append_many /
+ingest_many), so rows, indexes, rollups and payload_json look exactly like
+production writes. The same seed and scale always produce the same data.
+
+Shapes the generator follows:
+- Projects: skewed status/priority mixes, Zipf-distributed categories and
+  tags, log-normal note lengths and budgets.
+- Activity: Zipf over projects and agents, so a few hot projects get most
+  events and usage, with a long tail.
+- Time: `days` ending at a fixed date. Weekdays are busier than weekends and
+  working hours busier than nights. Timestamps only move forward, as in a
+  real append-only feed.
+- Usage: a handful of models with different prices; log-normal prompt
+  sizes, completion tokens a log-normal fraction of the prompt.
+
+Run metadata (scale, seed, window, hot ids) is stored under the
+`bench.seed` meta key, where bench/run.py reads it.
+
+Usage:
+    python bench/seed.py --db /tmp/bench.db --scale ci
+    python bench/seed.py --db /tmp/bench.db --projects 10000 --events 1000000 --usage 5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'server'))
+
+from mypm.storage import StorageContext  # noqa: E402
+
+
+# name -> (projects, agent events, token usage records)
+SCALES: Dict[str, Tuple[int, int, int]] = {
+    'ci': (300, 20_000, 50_000),
+    'dev': (2_000, 200_000, 1_000_000),
+    'full': (10_000, 1_000_000, 5_000_000),
+}
+META_KEY = 'bench.seed'
+END = datetime(2026, 3, 31, 23, 59, 59)
+BATCH = 5000
+EVENTS_PER_RUN = 25
+
+STATUSES = [('planning', 20), ('in-progress', 35), ('paused', 10), ('completed', 30), ('cancelled', 5)]
+PRIORITIES = [('low', 25), ('medium', 45), ('high', 22), ('urgent', 8)]
+EVENT_TYPES = [('note', 45), ('action', 25), ('tool_call', 12), ('status', 10), ('warning', 5), ('error', 3)]
+RUN_STATUSES = [('success', 80), ('failed', 8), ('cancelled', 4), ('running', 8)]
+# model -> (weight, USD per 1k prompt tokens, USD per 1k completion tokens)
+MODELS = {
+    'gpt-4.1': (18, 0.002, 0.008),
+    'gpt-4.1-mini': (30, 0.0004, 0.0016),
+    'claude-sonnet': (22, 0.003, 0.015),
+    'claude-haiku': (12, 0.0008, 0.004),
+    'gemini-pro': (10, 0.00125, 0.01),
+    'local-llama': (8, 0.0, 0.0),
+}
+SOURCES = [('opencode', 55), ('cli', 20), ('ide', 15), ('api', 7), ('batch', 3)]
+# Relative activity per hour of day (local time).
+HOURLY = [1, 1, 1, 1, 1, 2, 3, 5, 8, 10, 10, 9, 7, 9, 10, 10, 9, 8, 6, 5, 4, 3, 2, 1]
+WORDS = ('deploy fix refactor review schema index cache query latency budget migrate agent '
+         'release test docs api sync retry batch stream token usage report audit').split()
+
+
+def zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    return [1.0 / (k ** s) for k in range(1, n + 1)]
+
+
+class Picker:
+    """Weighted choice with precomputed cumulative weights (O(log n) per draw)."""
+
+    def __init__(self, rng: random.Random, items: Sequence[Any], weights: Sequence[float]):
+        self.rng = rng
+        self.items = list(items)
+        self.cum = list(accumulate(weights))
+        self.total = self.cum[-1]
+
+    def __call__(self) -> Any:
+        return self.items[bisect_left(self.cum, self.rng.random() * self.total)]
+
+
+def _pairs(rng: random.Random, pairs: Sequence[Tuple[Any, float]]) -> Picker:
+    return Picker(rng, [p[0] for p in pairs], [p[1] for p in pairs])
+
+
+def _text(rng: random.Random, median_chars: int, sigma: float = 1.0, cap: int = 8000) -> str:
+    n = min(cap, max(8, int(rng.lognormvariate(math.log(median_chars), sigma))))
+    out: List[str] = []
+    size = 0
+    while size < n:
+        w = WORDS[int(rng.random() * len(WORDS))]
+        out.append(w)
+        size += len(w) + 1
+    return ' '.join(out)[:n]
+
+
+def timeline(rng: random.Random, n: int, days: int) -> Iterator[datetime]:
+    """n increasing timestamps over `days` days ending at END (weekday/daytime heavy)."""
+    start = (END - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0)
+    day_weights = [1.0 if (start + timedelta(days=d)).weekday() < 5 else 0.4 for d in range(days)]
+    total = sum(day_weights)
+    hour = Picker(rng, range(24), HOURLY)
+    emitted = 0
+    acc = 0.0
+    for d, w in enumerate(day_weights):
+        acc += w
+        count = round(n * acc / total) - emitted
+        emitted += count
+        base = start + timedelta(days=d)
+        seconds = sorted(hour() * 3600 + rng.random() * 3600 for _ in range(count))
+        for s in seconds:
+            yield base + timedelta(seconds=s)
+
+
+def _project(rng: random.Random, i: int, status: Picker, priority: Picker, category: Picker,
+             tag: Picker, days: int) -> Dict[str, Any]:
+    st = status()
+    progress = {'completed': 100, 'planning': 0, 'cancelled': rng.randint(0, 60)}.get(st, rng.randint(5, 95))
+    created = END - timedelta(days=days + rng.random() * 365)
+    updated = created + (END - created) * rng.random()
+    budget = round(rng.lognormvariate(math.log(20000), 1.0), 2)
+    return {
+        'id': f'proj-{i:06d}',
+        'name': f'{WORDS[i % len(WORDS)].title()} project {i}',
+        'status': st,
+        'priority': priority(),
+        'category': category(),
+        'progress': progress,
+        'tags': sorted({tag() for _ in range(rng.choice((0, 1, 2, 2, 3, 3, 4, 5)))}),
+        'description': _text(rng, 120, 0.8, 2000),
+        'notes': _text(rng, 250, 1.2),
+        'budget': budget,
+        'actualCost': round(budget * rng.random() * progress / 100.0, 2),
+        'cost': {'items': [{'label': f'item {k}', 'amount': round(rng.lognormvariate(6, 1), 2)}
+                           for k in range(rng.randint(0, 8))]},
+        'createdAt': created.isoformat(timespec='seconds'),
+        'updatedAt': updated.isoformat(timespec='seconds'),
+    }
+
+
+def seed(db_file: str, *, projects: int, events: int, usage: int, days: int = 90,
+         seed: int = 42, scale: Optional[str] = None, log=None) -> Dict[str, Any]:
+    """Fill a fresh database; returns the metadata stored under META_KEY."""
+    rng = random.Random(seed)
+    log = log or (lambda msg: None)
+    storage = StorageContext(db_file)
+    try:
+        conn = storage.acquire()
+        try:
+            row = conn.execute('SELECT COUNT(*) FROM projects').fetchone()
+        finally:
+            storage.release(conn)
+        if row[0]:
+            raise SystemExit(f'{db_file} already has data; seed into a new file')
+
+        t0 = time.perf_counter()
+        status, priority = _pairs(rng, STATUSES), _pairs(rng, PRIORITIES)
+        category = Picker(rng, [f'category-{k:02d}' for k in range(25)], zipf_weights(25))
+        tag = Picker(rng, [f'tag-{k:02d}' for k in range(60)], zipf_weights(60, 0.9))
+        for i in range(projects):
+            storage.projects.create(_project(rng, i, status, priority, category, tag, days))
+        log(f'projects: {projects} in {time.perf_counter() - t0:.1f}s')
+
+        # Hot projects are shuffled, so popularity does not follow id or sort order.
+        project_ids = [f'proj-{i:06d}' for i in range(projects)]
+        rng.shuffle(project_ids)
+        project = Picker(rng, project_ids, zipf_weights(projects))
+        agent_ids = [f'agent-{k:03d}' for k in range(40)]
+        agent = Picker(rng, agent_ids, zipf_weights(len(agent_ids)))
+
+        t0 = time.perf_counter()
+        typ, run_status = _pairs(rng, EVENT_TYPES), _pairs(rng, RUN_STATUSES)
+        levels = {'warning': 'warn', 'error': 'error'}
+        batch: List[Dict[str, Any]] = []
+        run: Dict[str, Any] = {}
+        runs = 0
+        for i, ts in enumerate(timeline(rng, events, days)):
+            if i % EVENTS_PER_RUN == 0:
+                runs += 1
+                run = {'id': f'run-{runs:07d}', 'projectId': project(), 'agentId': agent(),
+                       'status': run_status(), 'createdAt': ts.isoformat(timespec='seconds'),
+                       'updatedAt': ts.isoformat(timespec='seconds'), 'title': _text(rng, 40, 0.5, 120)}
+                storage.agent_runs.create(run)
+            t = typ()
+            batch.append({
+                'id': f'evt-{i:08d}',
+                'ts': ts.isoformat(timespec='milliseconds'),
+                'type': t,
+                'level': levels.get(t, 'info'),
+                'projectId': run['projectId'],
+                'runId': run['id'],
+                'agentId': run['agentId'],
+                'title': _text(rng, 30, 0.5, 120),
+                'message': _text(rng, 160, 1.1, 4000),
+                'data': {'step': i % EVENTS_PER_RUN, 'durationMs': int(rng.lognormvariate(6, 1.2))},
+            })
+            if len(batch) >= BATCH:
+                storage.agent_events.append_many(batch)
+                batch = []
+                if (i + 1) % (BATCH * 20) == 0:
+                    log(f'events: {i + 1}/{events}')
+        if batch:
+            storage.agent_events.append_many(batch)
+        log(f'events: {events} ({runs} runs) in {time.perf_counter() - t0:.1f}s')
+
+        t0 = time.perf_counter()
+        model = Picker(rng, list(MODELS), [m[0] for m in MODELS.values()])
+        source = _pairs(rng, SOURCES)
+        workspaces = [f'ws-{k:02d}' for k in range(30)]
+        workspace = Picker(rng, workspaces, zipf_weights(len(workspaces)))
+        batch = []
+        for i, ts in enumerate(timeline(rng, usage, days)):
+            m = model()
+            prompt = min(200_000, int(rng.lognormvariate(math.log(2000), 1.2)))
+            completion = min(32_000, int(prompt * min(2.0, rng.lognormvariate(math.log(0.15), 0.8))))
+            _, p_in, p_out = MODELS[m]
+            batch.append({
+                'id': f'usage-{i:08d}',
+                'ts': ts.isoformat(timespec='milliseconds'),
+                'projectId': project(),
+                'agentId': agent(),
+                'workspace': workspace(),
+                'sessionId': f'sess-{i // 40:07d}',
+                'source': source(),
+                'model': m,
+                'promptTokens': prompt,
+                'completionTokens': completion,
+                'totalTokens': prompt + completion,
+                'cost': round(prompt / 1000.0 * p_in + completion / 1000.0 * p_out, 6),
+            })
+            if len(batch) >= BATCH:
+                storage.token_usage.ingest_many(batch)
+                batch = []
+                if (i + 1) % (BATCH * 40) == 0:
+                    log(f'usage: {i + 1}/{usage}')
+        if batch:
+            storage.token_usage.ingest_many(batch)
+        log(f'usage: {usage} in {time.perf_counter() - t0:.1f}s')
+
+        meta = {
+            'scale': scale,
+            'seed': seed,
+            'projects': projects,
+            'events': events,
+            'runs': runs,
+            'usage': usage,
+            'days': days,
+            'end': END.isoformat(),
+            'hotProjects': [project_ids[k] for k in range(min(10, projects))],
+            'hotAgents': agent_ids[:5],
+            'createdAt': datetime.now().isoformat(timespec='seconds'),
+        }
+        conn = storage.acquire()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO meta(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value',
+                    (META_KEY, json.dumps(meta)),
+                )
+            conn.execute('PRAGMA optimize')
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            storage.release(conn)
+        return meta
+    finally:
+        storage.close()
+
+
+def read_meta(conn) -> Optional[Dict[str, Any]]:
+    row = conn.execute('SELECT value FROM meta WHERE key=?', (META_KEY,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def add_scale_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument('--scale', choices=sorted(SCALES), default='ci',
+                   help='preset sizes: ' + ', '.join(f'{k}={v}' for k, v in SCALES.items()))
+    p.add_argument('--projects', type=int, help='override the preset project count')
+    p.add_argument('--events', type=int, help='override the preset agent event count')
+    p.add_argument('--usage', type=int, help='override the preset token usage record count')
+    p.add_argument('--days', type=int, default=90, help='time window the activity is spread over')
+    p.add_argument('--seed', type=int, default=42)
+
+
+def resolve_scale(args) -> Dict[str, Any]:
+    projects, events, usage = SCALES[args.scale]
+    custom = any(v is not None for v in (args.projects, args.events, args.usage))
+    return {
+        'scale': f'{args.scale}+custom' if custom else args.scale,
+        'projects': args.projects if args.projects is not None else projects,
+        'events': args.events if args.events is not None else events,
+        'usage': args.usage if args.usage is not None else usage,
+        'days': args.days,
+        'seed': args.seed,
+    }
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description='Seed a database with synthetic data for bench/run.py')
+    p.add_argument('--db', required=True, help='new SQLite file to create')
+    add_scale_args(p)
+    args = p.parse_args()
+
+    if os.path.exists(args.db):
+        print(f'{args.db} exists; remove it or pick another path', file=sys.stderr)
+        return 2
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    meta = seed(args.db, **resolve_scale(args), log=lambda msg: print(msg, file=sys.stderr))
+    print(json.dumps(meta, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
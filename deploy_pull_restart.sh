@@ -334,6 +334,11 @@ echo "[INFO] Build artifacts:"
 ls -lh dist/ | head -n 10 || true
 cd "$ROOT_DIR"
 
+# .gz/.br next to text assets; the server sends them to clients that accept them.
+if ! "$ROOT_DIR/.venv/bin/python" "$ROOT_DIR/scripts/precompress_frontend.py" --dist "$ROOT_DIR/frontend/dist"; then
+  echo "[WARN] Precompressing frontend assets failed; serving uncompressed assets."
+fi
+
 SERVICE_FILE="/etc/systemd/system/${SERVICE_NAME}.service"
 
 if command -v systemctl >/dev/null 2>&1; then
@@ -350,6 +355,8 @@ WorkingDirectory=$ROOT_DIR
 Environment=PM_PORT=$PORT
 Environment=PM_DEBUG=0
 ExecStart=$ROOT_DIR/.venv/bin/python $ROOT_DIR/server/main.py
+# gunicorn: SIGHUP = graceful worker reload (systemctl reload)
+ExecReload=/bin/kill -HUP \$MAINPID
 Restart=always
 RestartSec=2
 
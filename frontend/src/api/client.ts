@@ -5,6 +5,8 @@ import type {
   AgentRun,
   AgentEvent,
   Stats,
+  TokenSeries,
+  TokenSeriesQuery,
   MetaInfo,
   HealthCheck,
   ApiResponse,
@@ -275,6 +277,19 @@ export async function getStats(): Promise<Stats> {
   }
 }
 
+export async function getTokenSeries(options: TokenSeriesQuery = {}): Promise<TokenSeries | null> {
+  const params = new URLSearchParams()
+  for (const [key, value] of Object.entries(options)) {
+    if (value === undefined || value === null || value === '') continue
+    params.append(key, Array.isArray(value) ? value.join(',') : String(value))
+  }
+
+  const query = params.toString()
+  const path = query ? `/stats/tokens/series?${query}` : '/stats/tokens/series'
+  const response = await apiFetch<ApiResponse<TokenSeries>>(path)
+  return response.data || null
+}
+
 // ===== Agent API =====
 
 export async function getAgentRuns(projectId?: string): Promise<AgentRun[]> {
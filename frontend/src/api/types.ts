@@ -77,6 +77,7 @@ export interface AgentEvent {
   title: string | null
   message: string | null
   data: any
+  seq?: number  // monotonic insert sequence (GET /agent/events)
 }
 
 // ===== Stats Types =====
@@ -106,6 +107,51 @@ export interface Stats {
   financial: FinancialStats
 }
 
+export type TokenSeriesGranularity = 'hour' | 'day' | 'week' | 'month'
+
+export type TokenSeriesDimension = 'projectId' | 'agentId' | 'workspace' | 'model' | 'source'
+
+export interface TokenUsageTotals {
+  records: number
+  promptTokens: number
+  completionTokens: number
+  totalTokens: number
+  cost: number
+}
+
+export interface TokenSeriesPoint extends TokenUsageTotals {
+  bucket: string
+}
+
+export interface TokenSeriesLine {
+  key?: Partial<Record<TokenSeriesDimension, string | null>>
+  label: string
+  totals: TokenUsageTotals
+  points: TokenSeriesPoint[]
+  seriesCount?: number
+}
+
+export interface TokenSeries {
+  granularity: TokenSeriesGranularity
+  groupBy: TokenSeriesDimension[]
+  buckets: string[]
+  totals: TokenUsageTotals
+  series: TokenSeriesLine[]
+  other: TokenSeriesLine | null
+}
+
+export interface TokenSeriesQuery {
+  granularity?: TokenSeriesGranularity
+  groupBy?: TokenSeriesDimension[]
+  limit?: number
+  projectId?: string
+  agentId?: string
+  workspace?: string
+  source?: string
+  since?: string
+  until?: string
+}
+
 // ===== API Response Types =====
 
 export interface ApiResponse<T = any> {
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compare the JSON codecs (mypm.jsoncodec) on realistic payloads.
+
+Payloads are shaped like what the app actually stores and serves: a
+project with tags, notes and cost/revenue items, an action audit event,
+and a token usage record. Each one is timed both as a single object (one
+payload_json row) and as a list of 500 (one list response).
+
+Usage:
+    python scripts/bench_json_codec.py [--iterations 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'server'))
+
+from mypm.jsoncodec import available, make_codec  # noqa: E402
+
+
+def _project(i: int) -> dict:
+    return {
+        'id': f'proj-{i:05d}',
+        'name': f'项目 {i} / Project {i}',
+        'status': 'in-progress',
+        'priority': 'high',
+        'category': 'platform',
+        'progress': i % 100,
+        'tags': ['backend', 'agent', f't{i % 7}'],
+        'notes': '\n'.join(f'[2026-02-{d:02d} 10:00] (agent) 完成第 {d} 步 step done' for d in range(1, 21)),
+        'budget': 12000.0,
+        'actualCost': 3456.78,
+        'cost': {'items': [{'label': f'item {k}', 'amount': 100.5 + k} for k in range(5)]},
+        'revenue': {'items': [{'label': 'contract', 'amount': 20000}]},
+        'createdAt': '2026-01-15T10:00:00.123456',
+        'updatedAt': '2026-02-11T14:30:00.654321',
+    }
+
+
+def _event(i: int) -> dict:
+    return {
+        'id': f'act-{i:06d}',
+        'ts': '2026-02-11T14:30:00.654321',
+        'type': 'action.set_progress',
+        'level': 'info',
+        'projectId': f'proj-{i % 50:05d}',
+        'runId': f'run-{i % 20:04d}',
+        'agentId': 'agent-main',
+        'title': 'set_progress',
+        'message': f'set progress -> {i % 100}%',
+        'data': {
+            'action': {'type': 'set_progress', 'params': {'progress': i % 100}, 'recordOnly': False, 'ifUpdatedAt': None},
+            'before': {'status': 'in-progress', 'priority': 'high', 'progress': 10, 'tags': ['a', 'b']},
+            'after': {'status': 'in-progress', 'priority': 'high', 'progress': i % 100, 'tags': ['a', 'b']},
+            'projectUpdatedAt': '2026-02-11T14:30:00.654321',
+        },
+    }
+
+
+def _usage(i: int) -> dict:
+    return {
+        'id': f'usage-{i:06d}',
+        'ts': '2026-02-11T14:30:00',
+        'projectId': f'proj-{i % 50:05d}',
+        'agentId': 'agent-main',
+        'workspace': 'ws',
+        'source': 'cli',
+        'model': 'model-large',
+        'inputTokens': 1200 + i,
+        'outputTokens': 340,
+        'cacheReadTokens': 800,
+        'cacheWriteTokens': 0,
+        'totalTokens': 2340 + i,
+        'cost': {'currency': 'USD', 'amount': 0.0123},
+    }
+
+
+def _time(fn, iterations: int) -> float:
+    best = float('inf')
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / iterations)
+    return best * 1e6
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description='Benchmark JSON codecs on app payloads')
+    p.add_argument('--iterations', type=int, default=200)
+    args = p.parse_args()
+
+    codecs = [make_codec(name) for name in available()]
+    payloads = {
+        'project': _project(1),
+        'event': _event(1),
+        'usage': _usage(1),
+        'projects x500': [_project(i) for i in range(500)],
+        'events x500': [_event(i) for i in range(500)],
+        'usage x500': [_usage(i) for i in range(500)],
+    }
+
+    names = [c.name for c in codecs]
+    print(f"{'payload':<16}{'op':<8}" + ''.join(f'{n + " us":>14}' for n in names)
+          + (f"{'speedup':>10}" if len(codecs) > 1 else ''))
+    for label, obj in payloads.items():
+        iterations = args.iterations if 'x500' not in label else max(1, args.iterations // 50)
+        text = codecs[0].dumps(obj)
+        for c in codecs[1:]:
+            assert c.loads(c.dumps(obj)) == codecs[0].loads(text), f'{c.name} round trip differs on {label}'
+        for op in ('dumps', 'loads'):
+            row = []
+            for c in codecs:
+                fn = (lambda c=c: c.dumps(obj)) if op == 'dumps' else (lambda c=c: c.loads(text))
+                row.append(_time(fn, iterations))
+            line = f'{label:<16}{op:<8}' + ''.join(f'{v:>14.1f}' for v in row)
+            if len(row) > 1:
+                line += f'{row[0] / row[-1]:>9.1f}x'
+            print(line)
+    if len(codecs) == 1:
+        print('orjson is not installed; only the stdlib codec was measured.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
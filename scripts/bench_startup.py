@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Measure storage start-up cost.
+
+Each iteration drops all pooled connections first, so it pays what a fresh
+process pays: opening connections, applying PRAGMAs and checking migrations.
+
+Usage:
+    python scripts/bench_startup.py [--iterations 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'server'))
+
+from mypm import create_app, Config  # noqa: E402
+from mypm.storage import StorageContext  # noqa: E402
+from mypm.storage import context, sqlite_db  # noqa: E402
+
+
+def _count_migrate_calls():
+    calls = {'n': 0}
+    original = sqlite_db.migrate
+
+    def counting(conn):
+        calls['n'] += 1
+        return original(conn)
+
+    return calls, original, counting
+
+
+def _all_stores(db_file: str) -> None:
+    storage = StorageContext(db_file)
+    for name in (
+        'projects',
+        'agent_runs',
+        'agent_events',
+        'agent_profiles',
+        'agent_capabilities',
+        'token_usage',
+    ):
+        getattr(storage, name)
+
+
+def _run(label: str, fn, iterations: int, db_file: str) -> None:
+    calls, original, counting = _count_migrate_calls()
+    context.migrate = counting
+    try:
+        samples = []
+        opened = 0
+        for _ in range(iterations):
+            sqlite_db.close_pools()
+            t0 = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - t0) * 1000)
+            opened += sqlite_db.get_pool(db_file).stats['opened']
+    finally:
+        context.migrate = original
+
+    samples.sort()
+    print(
+        f"{label:<28} p50={statistics.median(samples):7.2f}ms "
+        f"p95={samples[int(len(samples) * 0.95) - 1]:7.2f}ms "
+        f"connections/run={opened / iterations:.1f} "
+        f"migrate()/run={calls['n'] / iterations:.1f}"
+    )
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description='Benchmark storage start-up')
+    p.add_argument('--iterations', type=int, default=50)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='pilotdeck-bench-') as tmp:
+        db_file = os.path.join(tmp, 'pm.db')
+        cfg = Config()
+        cfg.DB_FILE = db_file
+        create_app(cfg)  # create + migrate schema once
+
+        _run('create_app()', lambda: create_app(cfg), args.iterations, db_file)
+        _run('six stores', lambda: _all_stores(db_file), args.iterations, db_file)
+        _run('CLI (lazy): open only', lambda: StorageContext(db_file, lazy=True).projects,
+             args.iterations, db_file)
+        _run('CLI (lazy): projects list', lambda: StorageContext(db_file, lazy=True).projects.list(),
+             args.iterations, db_file)
+        sqlite_db.close_pools()
+
+
+if __name__ == '__main__':
+    main()
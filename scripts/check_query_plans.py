@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Fail if a store query falls back to a table scan or a temp B-tree sort.
+
+Exercises every store method (with the filter combinations the API passes)
+against a scratch database, records each statement, then runs
+EXPLAIN QUERY PLAN on it. A plan step is a problem when it is
+
+- `SCAN <table>` without an index (full table scan), or
+- `USE TEMP B-TREE` (sort/grouping the indexes do not provide),
+
+unless the statement matches an ALLOWED entry below.
+
+Usage:
+    python scripts/check_query_plans.py [-v]
+
+scripts/smoke_test_api.py runs the same check via check_storage().
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+# (statement regex, plan regex, reason) -- keep this list short.
+ALLOWED: List[Tuple[str, str, str]] = [
+    (r'^DELETE FROM token_usage_daily$', r'SCAN token_usage_daily',
+     'rollup rebuild clears the table'),
+    (r'^INSERT INTO token_usage_daily\(', r'SCAN token_usage_records|TEMP B-TREE FOR GROUP BY',
+     'rollup rebuild reads every record once'),
+    (r'FROM token_usage_daily', r'SCAN token_usage_daily|TEMP B-TREE FOR GROUP BY',
+     'unbounded windows read the whole (small) rollup table'),
+    (r'FROM token_usage_records .*GROUP BY', r'TEMP B-TREE FOR GROUP BY',
+     'multi-dimension GROUP BY over an index-selected ts range'),
+]
+
+_TABLE_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def _problems(conn, sql: str) -> List[str]:
+    try:
+        plan = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    out = []
+    for row in plan:
+        detail = str(row[-1])
+        if not (_TABLE_SCAN.match(detail) or 'TEMP B-TREE' in detail):
+            continue
+        if any(re.search(s, sql) and re.search(p, detail) for s, p, _ in ALLOWED):
+            continue
+        out.append(detail)
+    return out
+
+
+def _exercise(storage) -> None:
+    """Call every store method with representative arguments."""
+    projects = storage.projects
+    p1 = projects.create({'name': 'plan-a', 'status': 'planning', 'priority': 'high', 'category': 'c1'})
+    p2 = projects.create({'name': 'plan-b', 'status': 'in-progress', 'priority': 'low'})
+    projects.get(p1['id'])
+    projects.last_updated()
+    for filters in ({}, {'status': 'planning'}, {'priority': 'high'}, {'category': 'c1'},
+                    {'status': 'planning', 'priority': 'high', 'category': 'c1'}):
+        projects.list(**filters)
+        _, meta = projects.list(fields=['name', 'tags'], limit=1, **filters)
+        if meta['nextCursor']:
+            projects.list(fields=['name'], limit=1, cursor=meta['nextCursor'], **filters)
+    projects.patch(p1['id'], {'progress': 10}, if_updated_at=None)
+    projects.update(p2['id'], dict(p2, name='plan-b2'))
+    projects.batch_update([{'id': p1['id'], 'patch': {'progress': 20}}])
+    projects.reorder([p2['id'], p1['id']])
+    projects.get_statistics()
+
+    runs = storage.agent_runs
+    runs.create({'id': 'plan-run-1', 'projectId': p1['id'], 'agentId': 'a1'})
+    runs.create({'id': 'plan-run-2', 'projectId': p1['id'], 'agentId': 'a1', 'status': 'success'})
+    runs.get('plan-run-1')
+    runs.patch('plan-run-1', {'status': 'success'})
+    for filters in ({}, {'project_id': p1['id']}, {'agent_id': 'a1'}, {'status': 'success'},
+                    {'project_id': p1['id'], 'agent_id': 'a1', 'status': 'success'}):
+        args = dict({'project_id': None, 'agent_id': None, 'status': None}, **filters)
+        _, _, cursor = runs.list(limit=1, **args)
+        runs.list(limit=1, offset=1, include_total=False, **args)
+        if cursor:
+            runs.list(limit=1, cursor=cursor, **args)
+
+    events = storage.agent_events
+    events.append({'id': 'plan-evt-1', 'type': 'note', 'projectId': p1['id'], 'runId': 'plan-run-1', 'agentId': 'a1'})
+    events.append_many([{'id': 'plan-evt-2', 'type': 'note'}, {'id': 'plan-evt-1', 'type': 'note'}])
+    events.exists('plan-evt-1')
+    from datetime import datetime
+    for filters in ({}, {'project_id': p1['id']}, {'run_id': 'plan-run-1'}, {'agent_id': 'a1'}, {'typ': 'note'}):
+        args = dict({'project_id': None, 'run_id': None, 'agent_id': None, 'typ': None}, **filters)
+        for since in (None, datetime(2026, 1, 1)):
+            for after in (None, 0):
+                events.list(since_dt=since, limit=10, after=after, **args)
+
+    for store in (storage.agent_profiles, storage.agent_capabilities):
+        item = store.create({'id': 'plan-item', 'name': 'plan item'})
+        store.get(item['id'])
+        store.list()
+        store.list(enabled=True)
+        store.patch(item['id'], {'enabled': False})
+        store.delete(item['id'])
+
+    usage = storage.token_usage
+    usage.ingest_many([
+        {'id': 'plan-u1', 'ts': '2026-02-06T10:00:00', 'projectId': p1['id'], 'agentId': 'a1',
+         'workspace': 'w', 'source': 's', 'model': 'm', 'totalTokens': 10},
+        {'id': 'plan-u2', 'ts': '2026-02-07T10:00:00', 'totalTokens': 5},
+    ])
+    usage.ingest({'id': 'plan-u1'})
+    dims = ({}, {'project_id': p1['id']}, {'agent_id': 'a1'}, {'workspace': 'w'}, {'source': 's'})
+    windows = ({}, {'since': '2026-02-06T05:00:00'}, {'until': '2026-02-07T12:00:00'},
+               {'since': '2026-02-06', 'until': '2026-02-08T01:00:00'},
+               {'since': '2026-02-06T01:00:00', 'until': '2026-02-06T23:00:00'})
+    for d in dims:
+        for w in windows:
+            usage.list(limit=10, **d, **w)
+            usage.aggregate(**d, **w)
+    for granularity in ('hour', 'day', 'week', 'month'):
+        for d in dims:
+            usage.series(granularity=granularity, group_by=['model'],
+                         since='2026-02-06T05:00:00', until='2026-02-07T12:00:00', **d)
+        usage.series(granularity=granularity, since='2026-02-06', until='2026-02-08')
+    usage.rebuild_rollups()
+
+    storage.projects.delete(p2['id'])
+
+
+def check_storage(storage, *, verbose: bool = False) -> Dict[str, List[str]]:
+    """Exercise the stores on `storage`; return {statement: [bad plan steps]}."""
+    statements: List[str] = []
+    original_acquire, original_release = storage.acquire, storage.release
+
+    def acquire():
+        conn = original_acquire()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    def release(conn):
+        conn.set_trace_callback(None)
+        original_release(conn)
+
+    storage.acquire, storage.release = acquire, release
+    try:
+        _exercise(storage)
+    finally:
+        storage.acquire, storage.release = original_acquire, original_release
+
+    failures: Dict[str, List[str]] = {}
+    conn = storage.acquire()
+    try:
+        seen = set()
+        for sql in statements:
+            sql = ' '.join(sql.split())
+            if not re.match(r'^(SELECT|UPDATE|DELETE|INSERT INTO \w+\s*\([^)]*\)\s*SELECT)', sql, re.I):
+                continue
+            if sql in seen:
+                continue
+            seen.add(sql)
+            bad = _problems(conn, sql)
+            if bad:
+                failures[sql] = bad
+            if verbose:
+                print(('FAIL ' if bad else 'ok   ') + sql[:160])
+    finally:
+        storage.release(conn)
+    return failures
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description='Check store query plans for table scans / temp B-tree sorts')
+    p.add_argument('-v', '--verbose', action='store_true')
+    args = p.parse_args()
+
+    sys.path.insert(0, os.path.join(ROOT_DIR, 'server'))
+    from mypm.storage import StorageContext
+
+    with tempfile.TemporaryDirectory(prefix='pilotdeck-plans-') as tmp:
+        storage = StorageContext(os.path.join(tmp, 'pm.db'))
+        try:
+            failures = check_storage(storage, verbose=args.verbose)
+        finally:
+            storage.close()
+
+    for sql, bad in failures.items():
+        print(f'{sql}\n    -> {"; ".join(bad)}')
+    print(f'{len(failures)} statement(s) with table scans or temp B-tree sorts')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Write .gz (and .br, if the `brotli` module is installed) next to text
+assets in frontend/dist.
+
+The server (mypm.api.assets) serves these variants to clients that accept
+them, so bundles are compressed once at build time instead of never. Run
+after `npm run build`; deploy_pull_restart.sh does.
+
+Usage:
+    python scripts/precompress_frontend.py [--dist frontend/dist]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+_TEXT_EXTS = {'.html', '.js', '.mjs', '.css', '.json', '.svg', '.txt', '.xml', '.map', '.webmanifest', '.wasm'}
+_MIN_SIZE = 1024
+# Keep a variant only if it saves at least this fraction of the original.
+_MIN_SAVING = 0.1
+
+
+def _write_if_smaller(path: str, data: bytes, original: int) -> bool:
+    if len(data) > original * (1 - _MIN_SAVING):
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description='Precompress built frontend assets')
+    p.add_argument('--dist', default=os.path.join(ROOT_DIR, 'frontend', 'dist'),
+                   help='Vite output directory (default: frontend/dist)')
+    args = p.parse_args()
+
+    if not os.path.isdir(args.dist):
+        raise SystemExit(f"dist not found: {args.dist}")
+
+    files = gz = br = 0
+    bytes_in = bytes_gz = 0
+    for root, _dirs, names in os.walk(args.dist):
+        for name in names:
+            if os.path.splitext(name)[1].lower() not in _TEXT_EXTS:
+                continue
+            full = os.path.join(root, name)
+            with open(full, 'rb') as f:
+                body = f.read()
+            if len(body) < _MIN_SIZE:
+                continue
+            files += 1
+            bytes_in += len(body)
+            data = gzip.compress(body, compresslevel=9, mtime=0)
+            if _write_if_smaller(full + '.gz', data, len(body)):
+                gz += 1
+                bytes_gz += len(data)
+            if brotli is not None and _write_if_smaller(full + '.br', brotli.compress(body), len(body)):
+                br += 1
+
+    print(f"precompressed {files} files: {gz} .gz ({bytes_in} -> {bytes_gz} bytes), {br} .br"
+          + ('' if brotli is not None else ' (pip install brotli for .br)'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,12 +10,14 @@ from typing import Dict, Optional
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, os.path.join(ROOT_DIR, 'server'))
 
-from mypm.storage import ProjectsStore  # noqa: E402
+from mypm.storage import StorageContext  # noqa: E402
 
 class ProjectManager:
     def __init__(self, db_file: str = "data/pm.db"):
         self.db_file = db_file
-        self.store = ProjectsStore(db_file)
+        # Lazy: nothing is opened until the first command touches the DB.
+        self.storage = StorageContext(db_file, lazy=True)
+        self.store = self.storage.projects
     
     def list_projects(self, status: Optional[str] = None, priority: Optional[str] = None):
         """列出项目"""
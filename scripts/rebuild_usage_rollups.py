@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Rebuild the token usage daily rollups (token_usage_daily).
+
+The rollups are maintained on ingest and built once by the schema
+migration; run this after editing token_usage_records by hand or restoring
+a backup taken from an older build.
+
+Usage:
+    python scripts/rebuild_usage_rollups.py --db data/pm.db
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'server'))
+
+from mypm.storage import StorageContext  # noqa: E402
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description='Rebuild token usage daily rollups')
+    p.add_argument('--db', default=os.path.join(ROOT_DIR, 'data', 'pm.db'),
+                   help='SQLite DB path (default: data/pm.db)')
+    args = p.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"DB not found: {args.db}")
+
+    storage = StorageContext(args.db)
+    try:
+        t0 = time.perf_counter()
+        storage.token_usage.rebuild_rollups()
+        conn = storage.acquire()
+        try:
+            buckets = conn.execute('SELECT COUNT(1) FROM token_usage_daily').fetchone()[0]
+            records = conn.execute('SELECT COUNT(1) FROM token_usage_records').fetchone()[0]
+        finally:
+            storage.release(conn)
+        print(f"rebuilt {buckets} rollup rows from {records} records "
+              f"in {(time.perf_counter() - t0) * 1000:.1f}ms")
+    finally:
+        storage.close()
+
+
+if __name__ == '__main__':
+    main()
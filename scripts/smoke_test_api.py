@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import json
 import os
 import sys
 import tempfile
 import unittest
 
+from werkzeug.test import EnvironBuilder
+
 
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if ROOT_DIR not in sys.path:
@@ -27,6 +30,7 @@ class SmokeTestAPI(unittest.TestCase):
         self.client = self.app.test_client()
 
     def tearDown(self):
+        self.app.extensions['storage'].close()
         self._tmp.cleanup()
 
     def _create_project(self):
@@ -36,6 +40,12 @@ class SmokeTestAPI(unittest.TestCase):
         self.assertTrue(body.get('success'), body)
         return body['data']
 
+    def _admin_get(self, path, **kwargs):
+        from unittest import mock
+
+        with mock.patch.dict(os.environ, {'PM_ADMIN_TOKEN': 'smoke-admin'}):
+            return self.client.get(path, headers={'X-PM-Token': 'smoke-admin'}, **kwargs)
+
     def test_patch_concurrency(self):
         proj = self._create_project()
         pid = proj['id']
@@ -102,6 +112,736 @@ class SmokeTestAPI(unittest.TestCase):
         self.assertTrue(r0b.get('success'), r0b)
         self.assertEqual(r0b.get('message'), 'action exists')
 
+    def test_agent_actions_batch_isolation(self):
+        from unittest import mock
+
+        pid = self._create_project()['id']
+        events = self.app.extensions['action_service'].events_store
+        insert = events.insert
+
+        def failing_insert(conn, evt):
+            if evt['id'] == 'act-iso-2':
+                raise RuntimeError('disk full')
+            return insert(conn, evt)
+
+        actions = [
+            {'id': 'act-iso-1', 'projectId': pid, 'type': 'bump_progress', 'params': {'delta': 10}},
+            # Fails after its project change was planned: both are rolled back.
+            {'id': 'act-iso-2', 'projectId': pid, 'type': 'bump_progress', 'params': {'delta': 5}},
+            {'id': 'act-iso-3', 'projectId': pid, 'type': 'add_tag', 'params': {'tag': 'iso'}},
+            {'id': 'act-iso-4', 'projectId': pid, 'type': 'set_status', 'params': {'status': 'bogus'}},
+            {'id': 'act-iso-5', 'projectId': pid, 'type': 'bump_progress', 'params': {'delta': 1}},
+        ]
+        with mock.patch.object(events, 'insert', side_effect=failing_insert):
+            resp = self.client.post('/api/agent/actions', json={'agentId': 'smoke', 'actions': actions})
+        self.assertEqual(resp.status_code, 200, resp.get_data(as_text=True))
+        results = resp.get_json()['data']['results']
+        self.assertEqual([r['success'] for r in results], [True, False, True, False, True])
+        self.assertEqual(results[1]['error'], 'disk full')
+        self.assertEqual(results[4]['event']['data']['before']['progress'], 10)
+
+        project = self.client.get(f'/api/projects/{pid}').get_json()['data']
+        self.assertEqual(project['progress'], 11)
+        self.assertIn('iso', project['tags'])
+        stored = self.client.get(f'/api/agent/events?projectId={pid}').get_json()['data']
+        self.assertEqual(sorted(e['id'] for e in stored), ['act-iso-1', 'act-iso-3', 'act-iso-5'])
+
+    def test_agent_actions_fold_same_project(self):
+        from unittest import mock
+
+        pid = self._create_project()['id']
+        projects = self.app.extensions['action_service'].projects_store
+        actions = [
+            {'id': 'act-fold-1', 'projectId': pid, 'type': 'set_progress', 'params': {'progress': 30}},
+            {'id': 'act-fold-2', 'projectId': pid, 'type': 'add_tag', 'params': {'tag': 'fold'}},
+            {'id': 'act-fold-3', 'projectId': pid, 'type': 'bump_progress', 'params': {'delta': 5}},
+        ]
+        with mock.patch.object(projects, 'write', wraps=projects.write) as write:
+            resp = self.client.post('/api/agent/actions', json={'agentId': 'smoke', 'actions': actions})
+        self.assertEqual(resp.status_code, 200, resp.get_data(as_text=True))
+        self.assertEqual(write.call_count, 1)
+
+        results = resp.get_json()['data']['results']
+        # Each action sees the state left by the previous one.
+        self.assertEqual(results[2]['event']['data']['before']['progress'], 30)
+        self.assertEqual(results[2]['event']['data']['before']['tags'], ['fold'])
+        self.assertEqual((results[2]['project']['progress'], results[2]['project']['tags']), (35, ['fold']))
+        self.assertEqual(len({r['project']['updatedAt'] for r in results}), 1)
+
+        project = self.client.get(f'/api/projects/{pid}').get_json()['data']
+        self.assertEqual((project['progress'], project['tags']), (35, ['fold']))
+
+    def test_agent_actions_repeated_id_in_one_request(self):
+        pid = self._create_project()['id']
+        action = {'id': 'act-rep-1', 'projectId': pid, 'type': 'bump_progress', 'params': {'delta': 3}}
+        resp = self.client.post('/api/agent/actions', json={'agentId': 7, 'actions': [action, action]})
+        self.assertEqual(resp.status_code, 200, resp.get_data(as_text=True))
+        first, repeat = resp.get_json()['data']['results']
+        self.assertTrue(first['changed'])
+        self.assertEqual(repeat['message'], 'action exists')
+        self.assertEqual(repeat['project']['progress'], 3)
+
+        # Both carry the event as stored (normalized: agentId as a string),
+        # the same one a later request gets back.
+        replay = self.client.post('/api/agent/actions', json={'agentId': 7, 'actions': [action]})
+        stored = replay.get_json()['data']['results'][0]['event']
+        self.assertEqual(stored['agentId'], '7')
+        self.assertEqual(first['event'], stored)
+        self.assertEqual(repeat['event'], stored)
+
+    def test_agent_events_batch(self):
+        batch = {'events': [
+            {'id': 'evt-smoke-001', 'type': 'note', 'runId': 'run-smoke', 'message': 'one'},
+            {'id': 'evt-smoke-002', 'type': 'note', 'runId': 'run-smoke', 'message': 'two'},
+            {'id': 'evt-smoke-001', 'type': 'note', 'runId': 'run-smoke', 'message': 'dup'},
+        ]}
+        resp = self.client.post('/api/agent/events', json=batch)
+        self.assertEqual(resp.status_code, 201, resp.get_data(as_text=True))
+        data = resp.get_json()['data']
+        self.assertEqual(data['createdIds'], ['evt-smoke-001', 'evt-smoke-002'])
+        self.assertEqual(data['duplicateIds'], ['evt-smoke-001'])
+        self.assertEqual(data['results'][2]['data']['message'], 'one')
+
+        resp2 = self.client.post('/api/agent/events', json=batch)
+        self.assertEqual(resp2.status_code, 200, resp2.get_data(as_text=True))
+        self.assertEqual(resp2.get_json()['data']['created'], 0)
+
+        listed = self.client.get('/api/agent/events?runId=run-smoke').get_json()
+        self.assertEqual(len(listed['data']), 2)
+
+        # Concurrent batches with the same ids: each id is reported created once.
+        import threading
+        store = self.app.extensions['storage'].agent_events
+        same = [{'id': f'evt-race-{i}', 'type': 'note', 'runId': 'run-race'} for i in range(50)]
+        created = []
+
+        def ingest():
+            created.extend(evt['id'] for evt, was_created in store.append_many(same) if was_created)
+
+        threads = [threading.Thread(target=ingest) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(created), sorted(e['id'] for e in same))
+
+        # Incremental feed: only events stored after `nextAfter`.
+        self.client.post('/api/agent/events', json={'id': 'evt-smoke-003', 'type': 'note', 'runId': 'run-smoke'})
+        feed = self.client.get(f"/api/agent/events?runId=run-smoke&after={listed['nextAfter']}").get_json()
+        self.assertEqual([e['id'] for e in feed['data']], ['evt-smoke-003'])
+        again = self.client.get(f"/api/agent/events?runId=run-smoke&after={feed['nextAfter']}").get_json()
+        self.assertEqual(again['data'], [])
+        self.assertEqual(again['nextAfter'], feed['nextAfter'])
+
+    def test_agent_runs_cursor_pagination(self):
+        for i in range(5):
+            resp = self.client.post('/api/agent/runs', json={'id': f'run-page-{i}', 'createdAt': f'2026-02-06T10:00:0{i % 2}'})
+            self.assertTrue(resp.get_json().get('success'), resp.get_data(as_text=True))
+
+        first = self.client.get('/api/agent/runs?limit=2').get_json()
+        self.assertEqual(first['total'], 5)
+        ids = [r['id'] for r in first['data']]
+        cursor = first['nextCursor']
+        while cursor:
+            page = self.client.get(f'/api/agent/runs?limit=2&includeTotal=false&cursor={cursor}').get_json()
+            self.assertIsNone(page['total'])
+            ids.extend(r['id'] for r in page['data'])
+            cursor = page['nextCursor']
+        self.assertEqual(ids, ['run-page-3', 'run-page-1', 'run-page-4', 'run-page-2', 'run-page-0'])
+        self.assertEqual(self.client.get('/api/agent/runs?cursor=bogus').status_code, 400)
+
+        # Undated runs (older rows) come last and stay reachable by cursor.
+        storage = self.app.extensions['storage']
+        conn = storage.acquire()
+        try:
+            with conn:
+                conn.executemany("INSERT INTO agent_runs(id, payload_json) VALUES (?, '{}')",
+                                 [(f'run-undated-{i}',) for i in range(3)])
+        finally:
+            storage.release(conn)
+        ids, cursor = [], None
+        while True:
+            page = self.client.get('/api/agent/runs?limit=2' + (f'&cursor={cursor}' if cursor else '')).get_json()
+            ids.extend(r['id'] for r in page['data'])
+            cursor = page['nextCursor']
+            if not cursor:
+                break
+        self.assertEqual(ids, ['run-page-3', 'run-page-1', 'run-page-4', 'run-page-2', 'run-page-0',
+                               'run-undated-2', 'run-undated-1', 'run-undated-0'])
+        self.assertEqual(page['total'], 8)
+
+    def test_project_statistics(self):
+        for body in ({'name': 'A', 'budget': {'planned': 1000}, 'cost': {'total': 300}, 'revenue': {'total': 800}},
+                     {'name': 'B', 'budget': 200, 'cost': 50.5, 'revenue': 100, 'priority': 'high'},
+                     {'name': 'C', 'category': 'ops'}):
+            resp = self.client.post('/api/projects', json=body)
+            self.assertEqual(resp.status_code, 201, resp.get_data(as_text=True))
+        a = self.client.get('/api/projects').get_json()['data'][0]
+        self.client.patch(f"/api/projects/{a['id']}", json={'cost': {'total': 400}})
+
+        stats = self.client.get('/api/stats').get_json()['data']
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['byPriority'], {'medium': 2, 'high': 1})
+        self.assertEqual(stats['byCategory'], {'未分类': 2, 'ops': 1})
+        self.assertEqual(stats['financial'], {'totalBudget': 1200, 'totalCost': 450.5,
+                                              'totalRevenue': 900, 'netProfit': 449.5})
+
+        # A database from before v6: cost/revenue totals are backfilled from payload_json.
+        from server.mypm.storage import sqlite_db
+
+        db_file = os.path.join(self._tmp.name, 'v5.db')
+        conn = sqlite_db.connect(db_file)
+        try:
+            conn.execute('BEGIN')
+            for step in sqlite_db.MIGRATIONS[:5]:
+                step(conn)
+            sqlite_db.set_user_version(conn, 5)
+            payloads = [
+                {'id': 'p1', 'budget': {'planned': 1000}, 'cost': {'total': 300}, 'revenue': {'total': 800}},
+                {'id': 'p2', 'budget': 200, 'cost': 50.5, 'revenue': 100},
+                {'id': 'p3', 'cost': {'total': None}, 'revenue': 'n/a'},
+            ]
+            for i, payload in enumerate(payloads):
+                payload.update(name=payload['id'], status='planning', priority='medium')
+                conn.execute(
+                    'INSERT INTO projects(id, sort_order, name, status, priority, created_at, updated_at, '
+                    'budget, payload_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (payload['id'], i, payload['id'], 'planning', 'medium', '2026-01-01T00:00:00',
+                     '2026-01-01T00:00:00', [1000, 200, 0][i], json.dumps(payload)))
+            conn.commit()
+        finally:
+            conn.close()
+
+        cfg = Config()
+        cfg.DB_FILE = db_file
+        app = create_app(cfg)
+        try:
+            stats = app.test_client().get('/api/stats').get_json()['data']
+            self.assertEqual(stats['total'], 3)
+            self.assertEqual(stats['financial'], {'totalBudget': 1200, 'totalCost': 350.5,
+                                                  'totalRevenue': 900, 'netProfit': 549.5})
+        finally:
+            app.extensions['storage'].close()
+
+    def test_conditional_get(self):
+        project = self._create_project()
+        paths = ('/api/projects', f"/api/projects/{project['id']}", '/api/stats', '/api/meta')
+        etags = {}
+        for path in paths:
+            first = self.client.get(path)
+            self.assertEqual(first.status_code, 200, path)
+            etags[path] = first.headers.get('ETag')
+            self.assertTrue(etags[path], path)
+
+            cached = self.client.get(path, headers={'If-None-Match': etags[path]})
+            self.assertEqual(cached.status_code, 304, path)
+            self.assertEqual(cached.get_data(), b'')
+
+        # Same route and version, other resource: the tag must differ.
+        other = self._create_project()
+        tags = [self.client.get(f"/api/projects/{p['id']}").headers.get('ETag') for p in (project, other)]
+        self.assertNotEqual(tags[0], tags[1])
+        self.assertEqual(self.client.get(f"/api/projects/{other['id']}",
+                                         headers={'If-None-Match': tags[0]}).status_code, 200)
+
+        # /api/meta also reports auth flags from the environment: a change there
+        # (set across a restart, no project write) must not yield a 304.
+        from unittest import mock
+        meta_tag = self.client.get('/api/meta').headers.get('ETag')
+        with mock.patch.dict(os.environ, {'PM_ADMIN_TOKEN': 'smoke-admin'}):
+            fresh = self.client.get('/api/meta', headers={'If-None-Match': meta_tag})
+            self.assertEqual(fresh.status_code, 200)
+            self.assertTrue(fresh.get_json()['data']['auth']['adminTokenRequired'])
+
+        self.client.patch(f"/api/projects/{project['id']}", json={'progress': 5})
+        for path in paths:
+            self.assertEqual(self.client.get(path, headers={'If-None-Match': etags[path]}).status_code, 200, path)
+
+    def _read_stream(self, resp):
+        """Parse SSE frames until the server ends the stream."""
+        frames = []
+        for chunk in resp.response:
+            for block in chunk.decode('utf-8').split('\n\n'):
+                fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+                if 'event' in fields:
+                    frames.append(fields)
+        return frames
+
+    def test_change_stream(self):
+        self.app.config['STREAM_MAX_SECONDS'] = 1
+        self.app.config['STREAM_HEARTBEAT_SECONDS'] = 1
+        project = self._create_project()
+        pid = project['id']
+
+        resp = self.client.get(f'/api/stream?projectId={pid}&type=project.*,event.*', buffered=False)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.mimetype.startswith('text/event-stream'))
+        self._create_project()  # other project: filtered out
+        self.client.patch(f'/api/projects/{pid}', json={'progress': 7})
+        self.client.post('/api/agent/runs', json={'id': 'run-stream', 'projectId': pid})  # type filtered out
+        self.client.post('/api/agent/events', json={'id': 'evt-stream', 'type': 'note', 'projectId': pid})
+        frames = self._read_stream(resp)
+        self.assertEqual([f['event'] for f in frames], ['project.updated', 'event.created'])
+        self.assertEqual(json.loads(frames[0]['data'])['data']['progress'], 7)
+
+        # Resume: only what came after the given id is replayed.
+        resumed = self.client.get(f'/api/stream?projectId={pid}', headers={'Last-Event-ID': frames[0]['id']},
+                                  buffered=False)
+        self.assertEqual([f['event'] for f in self._read_stream(resumed)], ['run.created', 'event.created'])
+        stale = self.client.get('/api/stream', headers={'Last-Event-ID': 'other-boot-1'}, buffered=False)
+        self.assertEqual([f['event'] for f in self._read_stream(stale)], ['resync'])
+        self.assertEqual(self.app.extensions['change_broker'].stats()['subscribers'], 0)
+
+        # Closed before the first chunk is read (the test client would read
+        # it): the slot is still released.
+        for _ in range(3):
+            started = []
+            unread = self.app(EnvironBuilder(path='/api/stream').get_environ(),
+                              lambda status, headers, exc_info=None: started.append(status))
+            self.assertEqual(started, ['200 OK'])
+            self.assertEqual(self.app.extensions['change_broker'].stats()['subscribers'], 1)
+            unread.close()
+            self.assertEqual(self.app.extensions['change_broker'].stats()['subscribers'], 0)
+
+    def test_projects_fields_and_pagination(self):
+        for i in range(5):
+            self.client.post('/api/projects', json={'name': f'Page {i}', 'tags': [f't{i}'], 'notes': 'x' * 100})
+        full = self.client.get('/api/projects').get_json()['data']
+
+        first = self.client.get('/api/projects?fields=name,tags,progress&limit=2').get_json()
+        self.assertEqual(first['total'], 5)
+        self.assertEqual(first['data'][0], {k: full[0][k] for k in ('id', 'name', 'tags', 'progress')})
+        ids = [p['id'] for p in first['data']]
+        cursor = first['nextCursor']
+        while cursor:
+            page = self.client.get(f'/api/projects?fields=name&limit=2&cursor={cursor}').get_json()
+            self.assertEqual(set(page['data'][0]), {'id', 'name'})
+            ids.extend(p['id'] for p in page['data'])
+            cursor = page['nextCursor']
+        self.assertEqual(ids, [p['id'] for p in full])
+        self.assertEqual(self.client.get('/api/projects?limit=2&cursor=bogus').status_code, 400)
+        self.assertEqual(self.client.get("/api/projects?fields=name,$.x").status_code, 400)
+
+    def test_json_codecs_agree(self):
+        from server.mypm.jsoncodec import available, make_codec
+
+        sample = {'name': '项目', 'n': 2 ** 70, 'f': 1.5, 'tags': ['a'], 1: None, 'nested': {'b': [True, {}]}}
+        str_keys = {k: v for k, v in sample.items() if isinstance(k, str)}  # stdlib cannot sort mixed keys
+        stdlib = make_codec('stdlib')
+        for name in available():
+            codec = make_codec(name)
+            self.assertEqual(codec.loads(codec.dumps(sample)), stdlib.loads(stdlib.dumps(sample)), name)
+            self.assertEqual(codec.dumps(str_keys, sort_keys=True), stdlib.dumps(str_keys, sort_keys=True), name)
+
+    def test_response_compression(self):
+        import gzip
+        import zlib
+
+        for i in range(30):
+            self.client.post('/api/projects', json={'name': f'Compress {i}', 'notes': 'note ' * 50})
+        plain = self.client.get('/api/projects')
+        self.assertIsNone(plain.headers.get('Content-Encoding'))
+        expected = plain.get_json()
+
+        gz = self.client.get('/api/projects', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(gz.headers.get('Content-Encoding'), 'gzip')
+        self.assertIn('Accept-Encoding', gz.headers.get('Vary', ''))
+        self.assertEqual(json.loads(gzip.decompress(gz.get_data())), expected)
+        self.assertEqual(self.client.get('/api/projects', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': gz.headers['ETag']}).status_code, 304)
+
+        compressor = self.app.extensions['compressor']
+        compressor.stream_threshold = 1  # force the chunked path
+        df = self.client.get('/api/projects', headers={'Accept-Encoding': 'deflate, gzip;q=0.5'})
+        self.assertEqual(df.headers.get('Content-Encoding'), 'deflate')
+        self.assertIsNone(df.headers.get('Content-Length'))
+        self.assertEqual(json.loads(zlib.decompress(df.get_data())), expected)
+
+        small = self.client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+        self.assertIsNone(small.headers.get('Content-Encoding'))
+        stats = self._admin_get('/api/admin/compression').get_json()['data']
+        self.assertEqual(stats['encodings']['gzip']['responses'], 1)
+        self.assertEqual(stats['encodings']['deflate']['streamed'], 1)
+        self.assertLess(stats['encodings']['gzip']['ratio'], 0.5)
+
+    def test_spa_assets(self):
+        import gzip
+        import subprocess
+
+        dist = os.path.join(self._tmp.name, 'dist')
+        os.makedirs(os.path.join(dist, 'assets'))
+        bundle = 'console.log("pilotdeck");\n' * 100
+        files = {
+            'index.html': '<!doctype html><script src="/assets/index-Ab3_xY9z.js"></script>',
+            'assets/index-Ab3_xY9z.js': bundle,
+            'favicon.svg': '<svg/>',
+        }
+        for rel, text in files.items():
+            with open(os.path.join(dist, rel), 'w', encoding='utf-8') as f:
+                f.write(text)
+        subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'scripts', 'precompress_frontend.py'),
+                        '--dist', dist], check=True, capture_output=True)
+        self.assertTrue(os.path.exists(os.path.join(dist, 'assets', 'index-Ab3_xY9z.js.gz')))
+
+        cfg = Config()
+        cfg.DB_FILE = os.path.join(self._tmp.name, 'spa.db')
+        cfg.FRONTEND_DIST_DIR = dist
+        app = create_app(cfg)
+        client = app.test_client()
+        try:
+            js = client.get('/assets/index-Ab3_xY9z.js', headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(js.headers.get('Content-Encoding'), 'gzip')
+            self.assertIn('immutable', js.headers['Cache-Control'])
+            self.assertEqual(gzip.decompress(js.get_data()).decode('utf-8'), bundle)
+            js.close()
+            plain = client.get('/assets/index-Ab3_xY9z.js')
+            self.assertIsNone(plain.headers.get('Content-Encoding'))
+            self.assertEqual(plain.get_data(as_text=True), bundle)
+            plain.close()
+            icon = client.get('/favicon.svg')
+            self.assertEqual(icon.headers['Cache-Control'], 'no-cache')
+            icon.close()
+
+            # index.html comes from memory, also as the deep-link fallback.
+            index = client.get('/projects/abc')
+            self.assertEqual(index.get_data(as_text=True), files['index.html'])
+            self.assertEqual(index.headers['Cache-Control'], 'no-cache')
+            os.remove(os.path.join(dist, 'index.html'))
+            again = client.get('/', headers={'If-None-Match': index.headers['ETag']})
+            self.assertEqual(again.status_code, 304)
+        finally:
+            app.extensions['storage'].close()
+
+    def test_metrics(self):
+        project = self._create_project()
+        self.client.get(f'/api/projects/{project["id"]}')
+        self.client.patch(f'/api/projects/{project["id"]}', json={'progress': 3})
+        resp = self._admin_get('/api/admin/metrics')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('version=0.0.4', resp.headers['Content-Type'])
+        text = resp.get_data(as_text=True)
+        self.assertRegex(text, r'pm_http_requests_total\{route="/api/projects/<project_id>",method="GET",status="200"\} [1-9]')
+        self.assertRegex(text, r'pm_store_call_duration_seconds_bucket\{store="projects",method="create",le="\+Inf"\} [1-9]')
+        self.assertRegex(text, r'pm_json_encoded_bytes_total\{target="store"\} [1-9]')
+        # Only methods that run SQL are timed; in-memory helpers are not.
+        self.assertRegex(text, r'pm_store_call_duration_seconds_count\{store="projects",method="patch"\} [1-9]')
+        self.assertNotIn('method="merge_patch"', text)
+        self.assertIn('pm_sqlite_connections_opened_total ', text)
+        self.assertEqual(self.client.get('/api/admin/metrics').status_code, 503)
+
+        # Nested calls are not counted twice; a scalar result is not a row.
+        from server.mypm.metrics import STORE_ROWS, STORE_SECONDS, get_registry
+
+        def counts(method):
+            labels = (('store', 'projects'), ('method', method))
+            snap = get_registry().snapshot()
+            return snap.get((STORE_SECONDS, labels), [0])[0], snap.get((STORE_ROWS, labels), [0])[0]
+
+        projects = self.app.extensions['storage'].projects
+        before = counts('list'), counts('last_updated')
+        for _ in range(3):
+            projects.list()
+        projects.last_updated()
+        self.assertEqual(counts('list')[0], before[0][0] + 3)
+        self.assertEqual(counts('last_updated'), (before[1][0] + 1, before[1][1]))
+
+    def test_sql_trace(self):
+        from server.mypm.storage.sqlite_db import set_tracer
+
+        self.assertFalse(self._admin_get('/api/admin/sql').get_json()['data']['enabled'])
+        cfg = Config()
+        cfg.DB_FILE = os.path.join(self._tmp.name, 'trace.db')
+        cfg.SQL_TRACE = True
+        cfg.SQL_SLOW_MS = 0
+        cfg.SQL_SLOW_LOG = os.path.join(self._tmp.name, 'sql_slow.jsonl')
+        app = create_app(cfg)
+        try:
+            client = app.test_client()
+            client.post('/api/projects', json={'name': 'Traced'})
+            client.get('/api/projects')
+            self.client = client
+            data = self._admin_get('/api/admin/sql?limit=200&sort=count').get_json()['data']
+            self.assertTrue(data['enabled'])
+            by_sql = {s['sql']: s for s in data['statements']}
+            self.assertIn('ProjectsStore.create', by_sql['SELECT COALESCE(MAX(sort_order), ?) AS m FROM projects']['callers'])
+            with open(cfg.SQL_SLOW_LOG, encoding='utf-8') as f:
+                entry = json.loads(f.readline())
+            self.assertEqual(set(entry), {'ts', 'pid', 'ms', 'rows', 'caller', 'sql'})
+        finally:
+            set_tracer(None)
+            app.extensions['storage'].close()
+
+    def test_profiler(self):
+        import pstats
+        import time
+        from unittest import mock
+
+        headers = {'X-PM-Token': 'smoke-admin'}
+        with mock.patch.dict(os.environ, {'PM_ADMIN_TOKEN': 'smoke-admin'}):
+            resp = self.client.post('/api/admin/profile', json={'seconds': 5, 'intervalMs': 1, 'threads': 'all'}, headers=headers)
+            self.assertEqual(resp.status_code, 202, resp.get_data(as_text=True))
+            session_id = resp.get_json()['data']['id']
+            self.assertEqual(self.client.post('/api/admin/profile', headers=headers).status_code, 409)
+            time.sleep(0.2)
+            self.client.post('/api/admin/profile/stop', headers=headers)
+            for _ in range(100):
+                status = self._admin_get('/api/admin/profile').get_json()['data']
+                if not status['running']:
+                    break
+                time.sleep(0.02)
+            self.assertGreater(status['samples'], 0)
+
+        collapsed = self._admin_get(f'/api/admin/profile/{session_id}.collapsed')
+        self.assertEqual(collapsed.status_code, 200)
+        self.assertRegex(collapsed.get_data(as_text=True), r'test_profiler \(scripts/smoke_test_api\.py:\d+\)[^\n]* \d+\n')
+        path = os.path.join(self._tmp.name, 'profile.pstats')
+        with open(path, 'wb') as f:
+            f.write(self._admin_get(f'/api/admin/profile/{session_id}.pstats').data)
+        self.assertTrue(pstats.Stats(path).total_tt > 0)
+        self.assertEqual(self._admin_get('/api/admin/profile/unknown.pstats').status_code, 404)
+
+    def test_heap_diagnostics(self):
+        from unittest import mock
+
+        self.client.post('/api/agent/events', json={'events': [
+            {'id': f'evt-heap-{i:03d}', 'type': 'note', 'runId': 'run-heap', 'message': 'x' * 100} for i in range(50)
+        ]})
+        headers = {'X-PM-Token': 'smoke-admin'}
+        with mock.patch.dict(os.environ, {'PM_ADMIN_TOKEN': 'smoke-admin'}):
+            resp = self.client.post('/api/admin/heap/request', headers=headers,
+                                    json={'path': '/api/agent/events?limit=2000', 'repeat': 2})
+            self.assertEqual(resp.status_code, 200, resp.get_data(as_text=True))
+            data = resp.get_json()['data']
+            self.assertEqual([r['status'] for r in data['runs']], [200, 200])
+            self.assertGreater(data['peakBytes']['min'], data['runs'][0]['responseBytes'])
+            self.assertFalse(self._admin_get('/api/admin/heap').get_json()['data']['tracing'])
+
+            self.assertEqual(self.client.post('/api/admin/heap/snapshots', headers=headers).status_code, 409)
+            self.client.post('/api/admin/heap/start', headers=headers)
+            try:
+                self.client.post('/api/admin/heap/snapshots', headers=headers)
+                kept = [bytes(1000 + i) for i in range(200)]
+                self.client.post('/api/admin/heap/snapshots', headers=headers)
+                diff = self._admin_get('/api/admin/heap/diff?limit=5').get_json()['data']
+            finally:
+                self.client.post('/api/admin/heap/stop', headers=headers)
+        self.assertGreater(diff['tracedDiffBytes'], 0)
+        self.assertEqual(diff['top'][0]['file'], __file__)
+        self.assertGreaterEqual(diff['top'][0]['sizeDiffBytes'], sum(len(b) for b in kept))
+
+    def test_heap_measure_nested_in_request(self):
+        import threading
+        import tracemalloc
+        from flask import Flask
+        from server.mypm.heap import get_heap
+        from server.mypm.profiling import active_requests, track_request, untrack_request
+
+        heap = get_heap()
+        app = Flask('heap-nested')
+        app.before_request(track_request)
+        app.teardown_request(untrack_request)
+
+        @app.route('/api/inner')
+        def inner():
+            heap.start(1)  # an admin turns tracing on while the measurement runs
+            return 'ok'
+
+        @app.route('/outer')
+        def outer():
+            heap.measure_request(app, '/api/inner', {})
+            return active_requests().get(threading.get_ident(), '')
+
+        self.assertFalse(tracemalloc.is_tracing())
+        try:
+            resp = app.test_client().get('/outer')
+            # The replayed request did not clobber the outer one's entry...
+            self.assertEqual(resp.get_data(as_text=True), 'GET /outer')
+            self.assertNotIn(threading.get_ident(), active_requests())
+            # ...and the measurement left the admin's tracing on.
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            heap.stop()
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_project_cache(self):
+        project = self._create_project()
+        storage = self.app.extensions['storage']
+        cache = storage.project_cache
+        storage.projects.list()
+        before = cache.stats()
+        self.assertEqual(self.client.get('/api/projects').get_json()['total'], 1)
+        self.assertEqual(cache.stats()['hits'], before['hits'] + 1)
+
+        # A write from outside the store (CLI, another process) is seen via projects.lastUpdated.
+        conn = storage.acquire()
+        try:
+            with conn:
+                conn.execute("UPDATE projects SET name='Renamed' WHERE id=?", (project['id'],))
+                conn.execute("UPDATE meta SET value='external' WHERE key='projects.lastUpdated'")
+        finally:
+            storage.release(conn)
+        self.assertEqual(storage.projects.get(project['id'])['name'], 'Renamed')
+        self.assertEqual(storage.projects.list()[0][0]['name'], 'Renamed')
+
+        # The store's own writes clear it; callers get copies they may modify.
+        storage.projects.patch(project['id'], {'progress': 40}, if_updated_at=None)
+        got = storage.projects.get(project['id'])
+        self.assertEqual(got['progress'], 40)
+        got['progress'] = 99
+        self.assertEqual(storage.projects.get(project['id'])['progress'], 40)
+        self.assertTrue(self._admin_get('/api/admin/cache').get_json()['data']['enabled'])
+
+    def test_store_query_plans(self):
+        from check_query_plans import check_storage
+
+        failures = check_storage(self.app.extensions['storage'])
+        self.assertEqual(failures, {}, 'queries with table scans / temp B-tree sorts')
+
+    def test_connection_pool(self):
+        import sqlite3
+        import threading
+        from server.mypm.storage.context import StorageContext
+        from server.mypm.storage.sqlite_db import reset_pools
+
+        pool = self.app.extensions['storage'].pool
+        # Every request thread can hold a connection at once.
+        self.assertGreaterEqual(pool.max_size, Config.THREADS)
+
+        def hold_all(n):
+            barrier = threading.Barrier(n, timeout=10)
+            errors = []
+
+            def hold():
+                try:
+                    with pool.connection() as conn:
+                        conn.execute('SELECT 1').fetchone()
+                        barrier.wait()
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=hold) for _ in range(n)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(errors, [])
+
+        hold_all(Config.THREADS)
+
+        # A second context on the same file shares the pool; the largest size asked for wins.
+        size = pool.max_size
+        bigger = StorageContext(self.app.extensions['storage'].db_path, pool_size=size + 4, lazy=True)
+        self.assertIs(bigger.pool, pool)
+        self.assertEqual(pool.max_size, size + 4)
+        hold_all(size + 4)
+        StorageContext(self.app.extensions['storage'].db_path, pool_size=2, lazy=True)
+        self.assertEqual(pool.max_size, size + 4)
+
+        # Nested acquire on one thread returns the held connection; released ones are reused.
+        conn = pool.acquire()
+        self.assertIs(pool.acquire(), conn)
+        pool.release(conn)
+        pool.release(conn)
+        reused = pool.stats['reused']
+        with pool.connection() as again:
+            self.assertIs(again, conn)
+        self.assertEqual(pool.stats['reused'], reused + 1)
+
+        reset_pools()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+        with pool.connection() as fresh:
+            self.assertIsNot(fresh, conn)
+            self.assertEqual(fresh.execute('SELECT 1').fetchone()[0], 1)
+
+    def test_concurrent_migrate(self):
+        import threading
+        from unittest import mock
+        from server.mypm.storage import sqlite_db
+
+        db_file = os.path.join(self._tmp.name, 'race.db')
+        real = sqlite_db.get_user_version
+        barrier = threading.Barrier(2, timeout=10)
+        local = threading.local()
+
+        def racing(conn):
+            # Both processes read version 0 before either takes the write lock.
+            version = real(conn)
+            if not getattr(local, 'seen', False):
+                local.seen = True
+                barrier.wait()
+            return version
+
+        errors = []
+
+        def boot():
+            conn = sqlite_db.connect(db_file)
+            try:
+                sqlite_db.migrate(conn)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                conn.close()
+
+        with mock.patch.object(sqlite_db, 'get_user_version', racing):
+            threads = [threading.Thread(target=boot) for _ in range(2)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(errors, [])
+        conn = sqlite_db.connect(db_file)
+        try:
+            self.assertEqual(real(conn), len(sqlite_db.MIGRATIONS))
+        finally:
+            conn.close()
+
+    def test_migrations_are_atomic(self):
+        from unittest import mock
+        from server.mypm.storage import sqlite_db
+
+        db_file = os.path.join(self._tmp.name, 'v7.db')
+        conn = sqlite_db.connect(db_file)
+        try:
+            # A v7 database with an event the old schema let through (NULL id)
+            # and the copy table a non-atomic v8 run used to leave behind.
+            conn.execute('BEGIN')
+            for step in sqlite_db.MIGRATIONS[:7]:
+                step(conn)
+            sqlite_db.set_user_version(conn, 7)
+            conn.execute("INSERT INTO agent_events(id, ts, type, payload_json) "
+                         "VALUES (NULL, '2024-01-01T00:00:00', 'note', '{\"type\": \"note\"}')")
+            conn.execute("INSERT INTO agent_events(id, ts, type, payload_json) "
+                         "VALUES ('evt-1', '2024-01-02T00:00:00', 'note', '{\"id\": \"evt-1\", \"type\": \"note\"}')")
+            conn.execute('CREATE TABLE agent_events_v8 (seq INTEGER PRIMARY KEY)')
+            conn.commit()
+
+            def boom(_conn):
+                raise RuntimeError('boom')
+
+            with mock.patch.object(sqlite_db, 'MIGRATIONS', sqlite_db.MIGRATIONS[:8] + [boom]):
+                with self.assertRaises(RuntimeError):
+                    sqlite_db.migrate(conn)
+            self.assertEqual(sqlite_db.get_user_version(conn), 7)
+            columns = [r['name'] for r in conn.execute('PRAGMA table_info(agent_events)')]
+            self.assertNotIn('seq', columns)
+
+            sqlite_db.migrate(conn)
+            self.assertEqual(sqlite_db.get_user_version(conn), len(sqlite_db.MIGRATIONS))
+            tables = {r['name'] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            self.assertNotIn('agent_events_v8', tables)
+        finally:
+            conn.close()
+
+        cfg = Config()
+        cfg.DB_FILE = db_file
+        app = create_app(cfg)
+        try:
+            events = app.test_client().get('/api/agent/events?after=0').get_json()['data']
+            self.assertEqual([(e['seq'], e['id']) for e in events], [(1, 'legacy-1'), (2, 'evt-1')])
+        finally:
+            app.extensions['storage'].close()
+
     def test_agent_profiles_and_token_usage_stats(self):
         # Agent profile CRUD-lite
         resp_create = self.client.post('/api/agent/profiles', json={
@@ -169,6 +909,64 @@ class SmokeTestAPI(unittest.TestCase):
         totals = token_data['totals']
         self.assertEqual(int(totals.get('records') or 0), 2)
         self.assertEqual(int(totals.get('totalTokens') or 0), 220)
+        self.assertEqual([d['day'] for d in token_data['byDay']], ['2026-02-06'])
+
+        # Partial-day window: only the 11:00 record falls inside.
+        resp_window = self.client.get('/api/stats/tokens?projectId=proj-smoke&since=2026-02-06T10:30:00')
+        window_totals = resp_window.get_json()['data']['totals']
+        self.assertEqual(int(window_totals.get('records') or 0), 1)
+        self.assertEqual(int(window_totals.get('totalTokens') or 0), 80)
+
+        resp_series = self.client.get(
+            '/api/stats/tokens/series?granularity=hour&groupBy=model'
+            '&since=2026-02-06T09:00:00&until=2026-02-06T12:00:00'
+        )
+        self.assertEqual(resp_series.status_code, 200, resp_series.get_data(as_text=True))
+        series = resp_series.get_json()['data']
+        self.assertEqual(series['buckets'], ['2026-02-06T09:00', '2026-02-06T10:00', '2026-02-06T11:00', '2026-02-06T12:00'])
+        self.assertEqual([p['totalTokens'] for p in series['series'][0]['points']], [0, 140, 80, 0])
+        self.assertEqual(series['series'][0]['key'], {'model': 'gpt-5.3-codex'})
+        self.assertEqual(self.client.get('/api/stats/tokens/series?granularity=year').status_code, 400)
+
+    def test_token_series_open_window(self):
+        from datetime import datetime, timedelta
+
+        now = datetime.now()
+        records = [{'id': f'u-open-{i}', 'projectId': 'proj-open', 'totalTokens': tokens,
+                    'ts': (now + timedelta(hours=hours)).isoformat(timespec='seconds')}
+                   for i, (hours, tokens) in enumerate(((-1, 10), (2, 1000)))]
+        self.client.post('/api/agent/usage', json={'records': records})
+
+        # since without until ends at now for every granularity: the record 2h ahead is out.
+        since = (now - timedelta(hours=3)).isoformat(timespec='seconds')
+        for granularity in ('hour', 'day', 'week', 'month'):
+            series = self.client.get(f'/api/stats/tokens/series?projectId=proj-open&granularity={granularity}'
+                                     f'&since={since}').get_json()['data']
+            self.assertEqual(series['totals']['totalTokens'], 10, granularity)
+
+    def test_token_usage_ingest_is_idempotent(self):
+        def record(rid, tokens):
+            return {'id': rid, 'projectId': 'proj-usage-replay', 'model': 'gpt-5.3-codex',
+                    'totalTokens': tokens, 'ts': '2026-02-07T10:00:00'}
+
+        first = self.client.post('/api/agent/usage', json={'records': [record('u-1', 100), record('u-2', 50)]})
+        self.assertEqual(first.status_code, 200, first.get_data(as_text=True))
+        self.assertEqual(first.get_json()['data']['created'], 2)
+
+        # Stored ids and an id repeated in the batch come back as the stored record, created=False.
+        replay = self.client.post('/api/agent/usage', json={'records': [
+            record('u-1', 999), record('u-2', 50), 'junk', record('u-3', 30), record('u-3', 777),
+        ]})
+        self.assertEqual(replay.status_code, 200, replay.get_data(as_text=True))
+        data = replay.get_json()['data']
+        self.assertEqual(data['created'], 1)
+        self.assertEqual([r.get('created') for r in data['results']], [False, False, None, True, False])
+        self.assertFalse(data['results'][2]['success'])
+        self.assertEqual([r['data']['totalTokens'] for r in data['results'] if r['success']], [100, 50, 30, 30])
+
+        totals = self.client.get('/api/stats/tokens?projectId=proj-usage-replay').get_json()['data']['totals']
+        self.assertEqual(int(totals.get('records') or 0), 3)
+        self.assertEqual(int(totals.get('totalTokens') or 0), 180)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""gunicorn settings, all taken from mypm.config.Config (PM_* variables).
+
+    python server/main.py                      # PM_SERVER=auto picks gunicorn on Linux
+    gunicorn -c server/gunicorn.conf.py        # same thing, by hand
+
+- gthread workers: PM_WORKERS processes x PM_THREADS threads. One SQLite
+  file has one writer at a time, so extra processes mostly add isolation.
+  The default is 1 x 16; see docs/DEPLOYMENT.md before raising PM_WORKERS.
+- PM_PRELOAD=1 (default): the app is built in the master, so migrations run
+  once before workers fork. Pooled SQLite connections are closed before
+  each fork (storage.sqlite_db.reset_pools).
+- Graceful reload: `kill -HUP <master>` (or `systemctl reload pilotdeck`)
+  starts new workers, then stops the old ones after they finish in-flight
+  requests (up to PM_GRACEFUL_TIMEOUT). With preload the workers are
+  forked from the already-loaded master, so new *code* needs a restart.
+"""
+
+import os
+import sys
+
+_SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _SERVER_DIR)
+
+from mypm.config import Config  # noqa: E402
+
+_config = Config()
+
+wsgi_app = 'wsgi:app'
+chdir = _SERVER_DIR
+bind = [f"0.0.0.0:{_config.PORT}"]
+
+worker_class = 'gthread'
+workers = _config.WORKERS
+threads = _config.THREADS
+keepalive = _config.KEEPALIVE
+graceful_timeout = _config.GRACEFUL_TIMEOUT
+# gthread workers heartbeat from their main loop, so long SSE streams do not trip this.
+timeout = max(30, _config.GRACEFUL_TIMEOUT)
+preload_app = _config.PRELOAD
+max_requests = _config.MAX_REQUESTS
+max_requests_jitter = _config.MAX_REQUESTS // 10 if _config.MAX_REQUESTS else 0
+
+accesslog = '-'
+errorlog = '-'
+proc_name = 'pilotdeck'
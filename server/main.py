@@ -5,28 +5,50 @@
 
 Usage:
     python server/main.py
-    
+
 Environment variables:
     PM_PORT: Server port (default: 8689)
     PM_DEBUG: Debug mode (default: 0)
     PM_ADMIN_TOKEN: Admin API token
     PM_AGENT_TOKEN: Agent API token
+    PM_SERVER: auto | gunicorn | waitress | dev (default: auto)
+    PM_WORKERS / PM_THREADS / PM_KEEPALIVE / PM_GRACEFUL_TIMEOUT / PM_PRELOAD:
+        production server sizing (see server/docs/DEPLOYMENT.md)
+
+PM_SERVER=auto uses gunicorn (pre-fork, gthread workers) on Linux/macOS
+and waitress (threaded) elsewhere, whichever is installed. In debug mode,
+or if neither is installed, it falls back to Flask's development server.
 """
 
+import importlib.util
 import sys
 import os
 
 # Add server directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SERVER_DIR)
 
 from mypm import create_app, Config  # noqa: E402
 
 
-def main():
-    """Application entry point."""
-    config = Config()
-    app = create_app(config)
-    
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def _pick_server(config: Config) -> str:
+    name = config.SERVER
+    if name != 'auto':
+        return name
+    if config.DEBUG:
+        return 'dev'
+    if os.name == 'posix' and _installed('gunicorn'):
+        return 'gunicorn'
+    if _installed('waitress'):
+        return 'waitress'
+    return 'dev'
+
+
+def _banner(config: Config, server: str) -> None:
     print("=" * 60)
     print("项目管理系统 API 服务")
     print("=" * 60)
@@ -34,12 +56,50 @@ def main():
     print(f"API地址: http://localhost:{config.PORT}/api")
     print(f"Web界面: http://localhost:{config.PORT}")
     print(f"调试模式: {'开启' if config.DEBUG else '关闭'}")
+    if server == 'gunicorn':
+        print(f"服务器: gunicorn ({config.WORKERS} workers x {config.THREADS} threads)")
+    elif server == 'waitress':
+        print(f"服务器: waitress ({config.THREADS} threads)")
+    else:
+        print("服务器: Flask 开发服务器（生产环境请安装 gunicorn / waitress）")
     print("=" * 60)
-    
+    sys.stdout.flush()
+
+
+def main():
+    """Application entry point."""
+    config = Config()
+    server = _pick_server(config)
+    _banner(config, server)
+
+    if server == 'gunicorn':
+        # Replace this process, so the gunicorn master keeps our PID
+        # (systemd `reload` -> SIGHUP reaches it directly).
+        conf = os.path.join(SERVER_DIR, 'gunicorn.conf.py')
+        os.execv(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', conf])
+
+    app = create_app(config)
+
+    if server == 'waitress':
+        from waitress import serve
+        serve(
+            app,
+            host='0.0.0.0',
+            port=config.PORT,
+            threads=config.THREADS,
+            channel_timeout=max(config.KEEPALIVE, 30),
+            ident='PilotDeck',
+        )
+        return
+
+    if server != 'dev':
+        raise SystemExit(f"Unknown PM_SERVER: {server} (auto | gunicorn | waitress | dev)")
+
     app.run(
         host='0.0.0.0',
         port=config.PORT,
-        debug=config.DEBUG
+        debug=config.DEBUG,
+        threaded=True,
     )
 
 
@@ -6,17 +6,23 @@ Notes:
 - Backup/restore endpoints are kept as placeholders for future object storage integration.
 """
 
+import io
 import os
 import subprocess
 import sqlite3
 import tempfile
 import threading
 import shutil
+import tracemalloc
 from datetime import datetime
-from flask import Blueprint, jsonify, request, current_app, send_file, after_this_request
+from flask import Blueprint, Response, jsonify, request, current_app, send_file, after_this_request
 
 from ..domain.auth import require_admin
+from ..heap import GROUPS as HEAP_GROUPS, HeapBusy, get_heap
+from ..metrics import get_registry
+from ..profiling import ProfilerBusy, get_profiler
 from ..storage.common import read_last_lines
+from ..storage.sqlite_db import get_tracer
 
 
 bp = Blueprint('admin_ops', __name__)
@@ -129,6 +135,14 @@ def admin_restore_from_upload():
             "error": "DB file path not configured",
         }), 500
 
+    # The restore lock and maintenance flag live in this process only; other
+    # workers would keep writing to the old file through their pools.
+    if int(current_app.config.get('WORKERS', 1) or 1) > 1:
+        return jsonify({
+            "success": False,
+            "error": "Online restore needs PM_WORKERS=1; stop the service and use restore_db_snapshot.sh",
+        }), 409
+
     up = request.files.get('file')
     if not up:
         return jsonify({
@@ -166,7 +180,11 @@ def admin_restore_from_upload():
             # Best-effort: mark restore in progress so other requests can be blocked.
             current_app.extensions.setdefault('maintenance', {})
             current_app.extensions['maintenance']['restoring_db'] = True
+            storage = current_app.extensions['storage']
             try:
+                # Pooled connections still point at the old file; retire them.
+                storage.reset()
+
                 ts = _now_utc_compact()
                 backup_old = f"{db_file}.bak.{ts}"
                 if os.path.exists(db_file):
@@ -183,6 +201,10 @@ def admin_restore_from_upload():
                     except Exception:
                         pass
 
+                # Drop anything opened against the old file while we swapped;
+                # the restored snapshot is migrated on next use.
+                storage.reset()
+
                 return jsonify({
                     "success": True,
                     "data": {
@@ -272,3 +294,352 @@ def admin_deploy_status():
         'success': True,
         'data': status
     })
+
+
+@bp.route('/cache', methods=['GET'])
+def admin_cache_stats():
+    """Project read cache counters (per server process)."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    cache = current_app.extensions['storage'].project_cache
+    return jsonify({
+        'success': True,
+        'data': {
+            'enabled': cache is not None,
+            **(cache.stats() if cache is not None else {}),
+        }
+    })
+
+
+@bp.route('/compression', methods=['GET'])
+def admin_compression_stats():
+    """Response compression counters: bytes in/out, ratio, CPU seconds (per process)."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    compressor = current_app.extensions.get('compressor')
+    return jsonify({
+        'success': True,
+        'data': {
+            'enabled': compressor is not None,
+            **(compressor.stats() if compressor is not None else {}),
+        }
+    })
+
+
+def _stats_families():
+    """Counters kept by the pool, cache, compressor and broker, as metric families."""
+    ext = current_app.extensions
+    storage = ext['storage']
+    pool = storage.pool.stats
+    families = [
+        ('pm_sqlite_connections_opened_total', 'counter', 'SQLite connections opened by the pool.',
+         [((), pool['opened'])]),
+        ('pm_sqlite_connections_reused_total', 'counter', 'Pooled SQLite connections handed out again.',
+         [((), pool['reused'])]),
+        ('pm_sqlite_connections_discarded_total', 'counter', 'Pooled SQLite connections closed (stale, broken, reset).',
+         [((), pool['discarded'])]),
+        ('pm_sqlite_pool_waits_total', 'counter', 'Acquires that found the pool exhausted and had to wait.',
+         [((), pool['waits'])]),
+        ('pm_sqlite_pool_wait_seconds_total', 'counter', 'Time spent waiting for a free pooled connection.',
+         [((), pool['wait_seconds'])]),
+        ('pm_sqlite_pool_max_size', 'gauge', 'Connection pool size (PM_DB_POOL_SIZE).',
+         [((), storage.pool.max_size)]),
+    ]
+    cache = storage.project_cache
+    if cache is not None:
+        c = cache.stats()
+        families += [
+            (f'pm_project_cache_{key}_total', 'counter', f'Project read cache {key}.', [((), c[key])])
+            for key in ('hits', 'misses', 'evictions', 'invalidations')
+        ]
+        families.append(('pm_project_cache_entries', 'gauge', 'Entries in the project read cache.',
+                         [((), c['entries'])]))
+    compressor = ext.get('compressor')
+    if compressor is not None:
+        encodings = compressor.stats()['encodings']
+        for key, name, help in (
+            ('responses', 'pm_compression_responses_total', 'Compressed /api responses.'),
+            ('bytesIn', 'pm_compression_bytes_in_total', 'Response bytes before compression.'),
+            ('bytesOut', 'pm_compression_bytes_out_total', 'Response bytes after compression.'),
+            ('cpuSeconds', 'pm_compression_cpu_seconds_total', 'Thread CPU time spent compressing.'),
+        ):
+            families.append((name, 'counter', help,
+                             [((('encoding', enc),), c[key]) for enc, c in sorted(encodings.items())]))
+    broker = ext.get('change_broker')
+    if broker is not None:
+        b = broker.stats()
+        families += [
+            ('pm_stream_subscribers', 'gauge', 'Open /api/stream connections.', [((), b['subscribers'])]),
+            ('pm_stream_published_total', 'counter', 'Changes published to the stream.', [((), b['published'])]),
+            ('pm_stream_dropped_total', 'counter', 'Stream subscribers dropped for falling behind.',
+             [((), b['dropped'])]),
+        ]
+    return families
+
+
+@bp.route('/metrics', methods=['GET'])
+def admin_metrics():
+    """Prometheus text exposition of request, store and SQLite metrics (per process)."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    body = get_registry().render(_stats_families())
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8',
+                    headers={'Cache-Control': 'no-store'})
+
+
+@bp.route('/sql', methods=['GET'])
+def admin_sql_top():
+    """Top-N SQL statements by total time (needs PM_SQL_TRACE=1; per process).
+
+    Query: limit (default 20, max 200), sort = total | max | count | rows.
+    """
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    tracer = get_tracer()
+    if tracer is None:
+        return jsonify({
+            'success': True,
+            'data': {'enabled': False, 'hint': 'Set PM_SQL_TRACE=1 and restart to trace SQL statements.'},
+        })
+    try:
+        limit = max(1, min(200, int(request.args.get('limit', '20'))))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    sort = request.args.get('sort', 'total')
+    if sort not in ('total', 'max', 'count', 'rows'):
+        return jsonify({'success': False, 'error': 'sort must be one of total, max, count, rows'}), 400
+    return jsonify({
+        'success': True,
+        'data': {
+            'enabled': True,
+            **tracer.stats(),
+            'statements': tracer.top(limit, sort),
+        }
+    })
+
+
+@bp.route('/sql/reset', methods=['POST'])
+def admin_sql_reset():
+    """Clear the SQL statement aggregates (the slow-query log is kept)."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.reset()
+    return jsonify({'success': True, 'data': {'enabled': tracer is not None}})
+
+
+@bp.route('/profile', methods=['POST'])
+def admin_profile_start():
+    """Start a sampling profiler session (per process; one at a time).
+
+    Body or query: seconds (default 10, max PM_PROFILE_MAX_SECONDS),
+    intervalMs (default 10, 1-1000), threads = requests | all.
+    """
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    body = request.get_json(silent=True) or {}
+    params = {**request.args.to_dict(), **body}
+    max_seconds = float(current_app.config.get('PROFILE_MAX_SECONDS', 60))
+    try:
+        seconds = float(params.get('seconds', 10))
+        interval_ms = float(params.get('intervalMs', 10))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'seconds and intervalMs must be numbers'}), 400
+    if not 0 < seconds <= max_seconds:
+        return jsonify({'success': False, 'error': f'seconds must be in (0, {max_seconds:g}]'}), 400
+    if not 1 <= interval_ms <= 1000:
+        return jsonify({'success': False, 'error': 'intervalMs must be between 1 and 1000'}), 400
+    threads = params.get('threads', 'requests')
+    if threads not in ('requests', 'all'):
+        return jsonify({'success': False, 'error': 'threads must be requests or all'}), 400
+
+    try:
+        session = get_profiler().start(seconds, interval_ms / 1000.0, all_threads=(threads == 'all'))
+    except ProfilerBusy as e:
+        return jsonify({'success': False, 'error': f'Profiler session {e} is still running'}), 409
+    return jsonify({'success': True, 'data': session.status()}), 202
+
+
+@bp.route('/profile', methods=['GET'])
+def admin_profile_status():
+    """Status of the running or last profiler session in this process."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    session = get_profiler().current()
+    return jsonify({'success': True, 'data': session.status() if session is not None else None})
+
+
+@bp.route('/profile/stop', methods=['POST'])
+def admin_profile_stop():
+    """End the running session early; its results become downloadable."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    session = get_profiler().stop()
+    return jsonify({'success': True, 'data': session.status() if session is not None else None})
+
+
+@bp.route('/profile/<session_id>.<any(pstats, collapsed):fmt>', methods=['GET'])
+def admin_profile_download(session_id, fmt):
+    """Download a finished session as pstats or collapsed stacks (flame graph input)."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    session = get_profiler().current()
+    if session is None or session.id != session_id:
+        return jsonify({'success': False, 'error': 'Profile not found in this process (only the last session is kept)'}), 404
+    if session.running:
+        return jsonify({'success': False, 'error': 'Profiler session is still running'}), 409
+
+    if fmt == 'pstats':
+        data, mimetype = session.pstats, 'application/octet-stream'
+    else:
+        data, mimetype = session.collapsed, 'text/plain; charset=utf-8'
+    resp = send_file(io.BytesIO(data or b''), mimetype=mimetype, as_attachment=True,
+                     download_name=f'profile-{session.id}.{fmt}')
+    resp.headers['Cache-Control'] = 'no-store'
+    return resp
+
+
+@bp.route('/heap', methods=['GET'])
+def admin_heap_status():
+    """tracemalloc state, traced/peak bytes, RSS and kept snapshots (per process)."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    return jsonify({'success': True, 'data': get_heap().status()})
+
+
+@bp.route('/heap/start', methods=['POST'])
+def admin_heap_start():
+    """Start tracing allocations. Body: frames (traceback depth, 1-25, default 1)."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    body = request.get_json(silent=True) or {}
+    try:
+        frames = int(body.get('frames', request.args.get('frames', 1)))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'frames must be an integer'}), 400
+    if not 1 <= frames <= 25:
+        return jsonify({'success': False, 'error': 'frames must be between 1 and 25'}), 400
+    heap = get_heap()
+    heap.start(frames)
+    return jsonify({'success': True, 'data': heap.status()})
+
+
+@bp.route('/heap/stop', methods=['POST'])
+def admin_heap_stop():
+    """Stop tracing allocations; kept snapshots can still be diffed."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    heap = get_heap()
+    heap.stop()
+    return jsonify({'success': True, 'data': heap.status()})
+
+
+@bp.route('/heap/snapshots', methods=['POST'])
+def admin_heap_snapshot():
+    """Take a snapshot (tracing must be on). Query: limit (top lines, default 20, max 200)."""
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    if not tracemalloc.is_tracing():
+        return jsonify({'success': False, 'error': 'Allocation tracing is off; POST /api/admin/heap/start first'}), 409
+    try:
+        limit = max(1, min(200, int(request.args.get('limit', '20'))))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    return jsonify({'success': True, 'data': get_heap().take_snapshot(limit)}), 201
+
+
+@bp.route('/heap/diff', methods=['GET'])
+def admin_heap_diff():
+    """Compare two snapshots (default: the last two).
+
+    Query: from, to (snapshot ids), group = lineno | filename | traceback,
+    limit (default 30, max 200).
+    """
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    heap = get_heap()
+    group = request.args.get('group', 'lineno')
+    if group not in HEAP_GROUPS:
+        return jsonify({'success': False, 'error': 'group must be one of lineno, filename, traceback'}), 400
+    try:
+        limit = max(1, min(200, int(request.args.get('limit', '30'))))
+        ids = [int(request.args[k]) if request.args.get(k) else None for k in ('from', 'to')]
+    except ValueError:
+        return jsonify({'success': False, 'error': 'from, to and limit must be integers'}), 400
+    if ids == [None, None]:
+        pair = heap.latest(2)
+        if len(pair) < 2:
+            return jsonify({'success': False, 'error': 'Need two snapshots; POST /api/admin/heap/snapshots'}), 409
+        old, new = pair
+    else:
+        old, new = (heap.get(i) if i is not None else None for i in ids)
+        if old is None or new is None:
+            return jsonify({'success': False, 'error': 'Snapshot not found (give both from and to; only the last 8 are kept)'}), 404
+    return jsonify({'success': True, 'data': heap.diff(old, new, group, limit)})
+
+
+@bp.route('/heap/request', methods=['POST'])
+def admin_heap_request():
+    """Peak allocation of one GET, replayed in this process.
+
+    Body: path (e.g. "/api/agent/events?limit=2000"), repeat (1-20,
+    default 3), limit (retained lines, default 10), headers (extra request
+    headers, e.g. Accept-Encoding). Auth headers of this request are
+    forwarded.
+    """
+    ok, err = require_admin()
+    if not ok:
+        return err
+
+    body = request.get_json(silent=True) or {}
+    path = str(body.get('path') or '').strip()
+    if not path.startswith('/api/') or path.startswith(('/api/admin/heap', '/api/stream')):
+        return jsonify({'success': False, 'error': 'path must be an /api/ GET route (not /api/stream or /api/admin/heap)'}), 400
+    try:
+        repeat = int(body.get('repeat', 3))
+        limit = max(1, min(200, int(body.get('limit', 10))))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'repeat and limit must be integers'}), 400
+    if not 1 <= repeat <= 20:
+        return jsonify({'success': False, 'error': 'repeat must be between 1 and 20'}), 400
+    extra = body.get('headers') or {}
+    if not isinstance(extra, dict):
+        return jsonify({'success': False, 'error': 'headers must be an object'}), 400
+
+    headers = {k: v for k, v in request.headers.items()
+               if k.lower() in ('x-pm-token', 'x-pm-agent-token', 'authorization', 'cookie')}
+    headers.update({str(k): str(v) for k, v in extra.items()})
+    try:
+        data = get_heap().measure_request(current_app._get_current_object(), path, headers, repeat, limit)
+    except HeapBusy:
+        return jsonify({'success': False, 'error': 'Another heap measurement is running'}), 409
+    return jsonify({'success': True, 'data': data})
@@ -195,13 +195,15 @@ def ingest_usage():
 
         body = request.get_json(silent=True) or {}
         records = body.get('records') if isinstance(body.get('records'), list) else [body]
+        # One transaction for the whole batch; results keep input order.
+        ingested = iter(store.ingest_many([r for r in records if isinstance(r, dict)]))
         results = []
         created = 0
         for r in records:
             if not isinstance(r, dict):
                 results.append({"success": False, "error": "record must be an object", "record": r})
                 continue
-            rec, was_created = store.ingest(r)
+            rec, was_created = next(ingested)
             results.append({"success": True, "created": was_created, "data": rec})
             if was_created:
                 created += 1
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""In-memory manifest of the built SPA (frontend/dist).
+
+Built once at startup instead of stat-ing the dist directory on every
+request:
+
+- Vite puts content-hashed bundles under `assets/` (`index-B1x2y3z4.js`).
+  Their name changes whenever their content does, so they are served
+  `Cache-Control: public, max-age=31536000, immutable`. Other files
+  (favicon, public/*) are revalidated by ETag.
+- `app.js.gz` / `app.js.br` next to a file are served instead of it when
+  the client accepts that encoding (see scripts/precompress_frontend.py,
+  run by deploy_pull_restart.sh after `npm run build`).
+- index.html (and its compressed variants) is held in memory with a
+  precomputed ETag. The deep-link fallback and its 304 revalidation never
+  touch the disk.
+
+A rebuilt dist is picked up lazily: a request for a file name that is not
+in the manifest, or whose file disappeared, compares index.html's mtime
+and rescans if it changed. Deploys restart the service anyway.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from flask import Response, request, send_file
+
+
+# Encodings in server preference order, with the suffix of their variant file.
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# Vite's default assetsDir + `[name]-[hash].[ext]` (hash: 8 url-safe chars).
+_HASHED_RE = re.compile(r'^assets/.+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+@dataclass
+class Asset:
+    path: str                     # absolute path of the identity file
+    mimetype: str
+    etag: str
+    mtime: float
+    immutable: bool
+    variants: Dict[str, str] = field(default_factory=dict)   # encoding -> absolute path
+
+
+@dataclass
+class _Index:
+    mtime_ns: int
+    etag: str
+    bodies: Dict[str, bytes]      # 'identity' / 'br' / 'gzip' -> bytes
+
+
+def _digest(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()[:20]
+
+
+class AssetManifest:
+    """Path -> Asset map for one dist directory, shared by all request threads."""
+
+    def __init__(self, dist_dir: str):
+        self.dist_dir = os.path.abspath(dist_dir)
+        self._assets: Dict[str, Asset] = {}
+        self._index: Optional[_Index] = None
+        self.scan()
+
+    def scan(self) -> None:
+        """(Re)build the manifest from disk."""
+        assets: Dict[str, Asset] = {}
+        index: Optional[_Index] = None
+        if os.path.isdir(self.dist_dir):
+            for root, _dirs, files in os.walk(self.dist_dir):
+                names = set(files)
+                for name in files:
+                    if any(name.endswith(sfx) and name[:-len(sfx)] in names for _, sfx in _ENCODINGS):
+                        continue  # a variant, attached to its original below
+                    full = os.path.join(root, name)
+                    rel = os.path.relpath(full, self.dist_dir).replace(os.sep, '/')
+                    if rel == 'index.html':
+                        index = self._load_index(full, names)
+                        continue
+                    st = os.stat(full)
+                    assets[rel] = Asset(
+                        path=full,
+                        mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                        etag=_digest(full),
+                        mtime=st.st_mtime,
+                        immutable=bool(_HASHED_RE.match(rel)),
+                        variants={enc: full + sfx for enc, sfx in _ENCODINGS if name + sfx in names},
+                    )
+        # Swapped as a whole: concurrent readers see the old or the new build.
+        self._assets = assets
+        self._index = index
+
+    @staticmethod
+    def _load_index(full: str, names) -> _Index:
+        with open(full, 'rb') as f:
+            body = f.read()
+        bodies = {'identity': body}
+        for enc, sfx in _ENCODINGS:
+            if 'index.html' + sfx in names:
+                with open(full + sfx, 'rb') as f:
+                    bodies[enc] = f.read()
+        if 'gzip' not in bodies:
+            bodies['gzip'] = gzip.compress(body, mtime=0)
+        return _Index(
+            mtime_ns=os.stat(full).st_mtime_ns,
+            etag=hashlib.sha1(body).hexdigest()[:20],
+            bodies=bodies,
+        )
+
+    def _refresh_if_rebuilt(self) -> bool:
+        try:
+            mtime_ns = os.stat(os.path.join(self.dist_dir, 'index.html')).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        current = self._index.mtime_ns if self._index else None
+        if mtime_ns == current:
+            return False
+        self.scan()
+        return True
+
+    def get(self, path: str) -> Optional[Asset]:
+        asset = self._assets.get(path)
+        # Only file-like misses check for a rebuild; SPA routes (/projects/x) don't.
+        if asset is None and '.' in path.rsplit('/', 1)[-1] and self._refresh_if_rebuilt():
+            asset = self._assets.get(path)
+        return asset
+
+    def serve(self, path: str) -> Response:
+        """Response for a dist file, or index.html when `path` is not one."""
+        asset = self.get(path) if path != 'index.html' else None
+        if asset is not None:
+            try:
+                return self._send(asset)
+            except FileNotFoundError:
+                # dist was rebuilt under us: retry once against the new build.
+                asset = self.get(path) if self._refresh_if_rebuilt() else None
+                if asset is not None:
+                    return self._send(asset)
+        return self.serve_index()
+
+    @staticmethod
+    def _send(asset: Asset) -> Response:
+        encoding = request.accept_encodings.best_match(list(asset.variants))
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+        resp = send_file(
+            asset.variants[encoding] if encoding else asset.path,
+            mimetype=asset.mimetype,
+            download_name=os.path.basename(asset.path),
+            etag=etag,
+            last_modified=asset.mtime,
+            max_age=None,
+            conditional=True,
+        )
+        if encoding and resp.status_code != 304:
+            resp.headers['Content-Encoding'] = encoding
+        if asset.variants:
+            resp.vary.add('Accept-Encoding')
+        resp.headers['Cache-Control'] = IMMUTABLE if asset.immutable else REVALIDATE
+        return resp
+
+    def serve_index(self) -> Response:
+        if self._index is None:
+            self._refresh_if_rebuilt()
+        index = self._index
+        if index is None:
+            return Response(
+                "<h2>Frontend not built</h2>"
+                "<p>Run <code>npm install</code> and <code>npm run build</code> in <code>frontend/</code>.</p>",
+                200,
+                {'Content-Type': 'text/html; charset=utf-8'},
+            )
+        encoding = request.accept_encodings.best_match([e for e in index.bodies if e != 'identity'])
+        etag = f"{index.etag}-{encoding}" if encoding else index.etag
+        if request.if_none_match.contains_weak(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(index.bodies[encoding or 'identity'], mimetype='text/html')
+            if encoding:
+                resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(etag)
+        resp.vary.add('Accept-Encoding')
+        # Cache but always revalidate: a new build changes the bundle names it links.
+        resp.headers['Cache-Control'] = REVALIDATE
+        return resp
@@ -4,7 +4,7 @@
 import hashlib
 from datetime import datetime, timezone
 from flask import Blueprint, request, jsonify, session
-from ..storage.sqlite_db import connect
+from ..storage.sqlite_db import get_pool
 
 bp = Blueprint('auth', __name__)
 
@@ -16,7 +16,8 @@ def _verify_password(password: str, password_hash: str) -> bool:
 
 def _get_user_by_username(db_path: str, username: str):
     """Get user by username."""
-    conn = connect(db_path)
+    pool = get_pool(db_path)
+    conn = pool.acquire()
     try:
         row = conn.execute(
             'SELECT id, username, password_hash, role, created_at, updated_at, last_login_at FROM users WHERE username = ?',
@@ -34,12 +35,13 @@ def _get_user_by_username(db_path: str, username: str):
             'last_login_at': row['last_login_at'],
         }
     finally:
-        conn.close()
+        pool.release(conn)
 
 
 def _update_last_login(db_path: str, user_id: str):
     """Update user's last login timestamp."""
-    conn = connect(db_path)
+    pool = get_pool(db_path)
+    conn = pool.acquire()
     try:
         now = datetime.now(timezone.utc).isoformat()
         conn.execute(
@@ -48,7 +50,7 @@ def _update_last_login(db_path: str, user_id: str):
         )
         conn.commit()
     finally:
-        conn.close()
+        pool.release(conn)
 
 
 @bp.route('/login', methods=['POST'])
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Negotiated gzip/deflate compression for /api responses.
+
+Runs as an after_request hook. A response is compressed when the client
+accepts gzip or deflate, the body is JSON or text, and the body is at
+least COMPRESS_MIN_SIZE bytes. Smaller bodies fit in a packet or two
+anyway, so compressing them only costs CPU. SSE streams and file
+downloads are left alone.
+
+Bodies up to COMPRESS_STREAM_THRESHOLD are compressed in one call and get
+a Content-Length. Larger or already-streamed bodies are compressed chunk
+by chunk as the server writes them, so the client sees the first bytes
+without waiting for the whole body.
+
+A compressed response carries a weak ETag: the representation differs
+per encoding, but If-None-Match still matches because weak comparison is
+used (see conditional.py).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+from flask import request
+
+
+# wbits per content-coding: gzip wrapper (RFC 1952) / zlib wrapper (RFC 1950).
+_WBITS = {'gzip': 31, 'deflate': 15}
+
+
+class ResponseCompressor:
+    """after_request hook plus per-encoding counters."""
+
+    def __init__(self, *, min_size: int = 1024, level: int = 6,
+                 stream_threshold: int = 256 * 1024, chunk_size: int = 64 * 1024):
+        self.min_size = max(0, int(min_size))
+        self.level = max(1, min(9, int(level)))
+        self.stream_threshold = max(1, int(stream_threshold))
+        self.chunk_size = max(1024, int(chunk_size))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._skipped_small = 0
+
+    def _record(self, encoding: str, bytes_in: int, bytes_out: int, cpu: float, streamed: bool) -> None:
+        with self._lock:
+            c = self._counters.setdefault(encoding, {
+                'responses': 0, 'streamed': 0, 'bytesIn': 0, 'bytesOut': 0, 'cpuSeconds': 0.0,
+            })
+            c['responses'] += 1
+            c['streamed'] += 1 if streamed else 0
+            c['bytesIn'] += bytes_in
+            c['bytesOut'] += bytes_out
+            c['cpuSeconds'] += cpu
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            by_encoding = {}
+            for enc, c in self._counters.items():
+                by_encoding[enc] = dict(c, ratio=round(c['bytesOut'] / c['bytesIn'], 4) if c['bytesIn'] else None)
+            return {
+                'minSize': self.min_size,
+                'level': self.level,
+                'streamThreshold': self.stream_threshold,
+                'skippedSmall': self._skipped_small,
+                'encodings': by_encoding,
+            }
+
+    def _compressible(self, response) -> bool:
+        if not str(request.path or '').startswith('/api'):
+            return False
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        mimetype = response.mimetype or ''
+        if mimetype == 'text/event-stream':
+            return False
+        return mimetype == 'application/json' or mimetype.startswith('text/')
+
+    def after_request(self, response):
+        if not self._compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(['gzip', 'deflate'])
+        if encoding not in _WBITS:
+            return response
+
+        if response.is_streamed:
+            body: Optional[bytes] = None
+            chunks: Iterable[bytes] = response.iter_encoded()
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                with self._lock:
+                    self._skipped_small += 1
+                return response
+
+        if body is not None and len(body) <= self.stream_threshold:
+            t0 = time.thread_time()
+            c = zlib.compressobj(self.level, zlib.DEFLATED, _WBITS[encoding])
+            data = c.compress(body) + c.flush()
+            self._record(encoding, len(body), len(data), time.thread_time() - t0, False)
+            response.set_data(data)
+        else:
+            if body is not None:
+                chunks = (body[i:i + self.chunk_size] for i in range(0, len(body), self.chunk_size))
+            response.response = self._stream(chunks, encoding)
+            response.headers.pop('Content-Length', None)
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _stream(self, chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+        c = zlib.compressobj(self.level, zlib.DEFLATED, _WBITS[encoding])
+        bytes_in = bytes_out = 0
+        cpu = 0.0
+        try:
+            for chunk in chunks:
+                t0 = time.thread_time()
+                out = c.compress(chunk)
+                cpu += time.thread_time() - t0
+                bytes_in += len(chunk)
+                if out:
+                    bytes_out += len(out)
+                    yield out
+            t0 = time.thread_time()
+            out = c.flush()
+            cpu += time.thread_time() - t0
+            bytes_out += len(out)
+            yield out
+        finally:
+            self._record(encoding, bytes_in, bytes_out, cpu, True)
+            if hasattr(chunks, 'close'):
+                chunks.close()
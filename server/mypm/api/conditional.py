@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Conditional GET (ETag / If-None-Match) for reads derived from projects.
+
+Everything these endpoints return is a function of the projects table, and
+every project write bumps `projects.lastUpdated` in the meta table. So the
+ETag only needs that version (one primary-key read) and the URL: path and
+query string, since one route serves many resources (/api/projects/<id>).
+When it matches what the client holds, we answer 304 before running the
+handler: no list query and no JSON encoding.
+"""
+
+import hashlib
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import Response, current_app, make_response, request
+
+
+def projects_version() -> str:
+    store = current_app.extensions.get('projects_store')
+    return (store.last_updated() if store else None) or ''
+
+
+def _etag(kind: str, version: str, extra: str = '') -> str:
+    from .. import __version__
+
+    raw = f"{__version__}|{kind}|{version}|{extra}|{request.path}|{request.query_string.decode('latin-1')}"
+    return f"{kind}-{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]}"
+
+
+def conditional_on_projects(kind: str, vary: Optional[Callable[[], str]] = None):
+    """Decorator: strong ETag from projects.lastUpdated, 304 when unchanged.
+
+    `vary` returns anything else the body depends on (e.g. settings read
+    from the environment); it is hashed into the tag too.
+
+    The version is read before the handler runs. If a write lands in
+    between, the body is newer than its tag, and the client's next
+    request simply gets a 200 again. A tag can never be newer than its body.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            etag = _etag(kind, projects_version(), vary() if vary is not None else '')
+            if request.if_none_match.contains_weak(etag):
+                resp = Response(status=304)
+            else:
+                resp = make_response(f(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag)
+            # Session/agent-token protected: browsers may keep it, but must revalidate.
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
+        return wrapper
+    return decorator
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Flask JSON provider backed by the process-wide codec (see jsoncodec).
+
+Responses keep Flask's defaults: sorted keys, and the same `default` hook
+for dates, UUIDs and dataclasses. The compact body is written as bytes in
+one step. Non-ASCII characters are sent as UTF-8 instead of \\u escapes.
+Debug / non-compact output (indented) still goes through the stdlib
+provider.
+"""
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+from ..jsoncodec import get_codec
+from ..metrics import count_json_bytes
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    ensure_ascii = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # indent, cls, ensure_ascii=True, ...: only stdlib json knows those.
+        if set(kwargs) - {'default', 'sort_keys', 'separators', 'ensure_ascii'} or kwargs.get('ensure_ascii'):
+            return super().dumps(obj, **kwargs)
+        return get_codec().dumps(
+            obj,
+            sort_keys=kwargs.get('sort_keys', self.sort_keys),
+            default=kwargs.get('default', self.default),
+        )
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return get_codec().loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = get_codec().dumps_bytes(obj, sort_keys=self.sort_keys, default=self.default)
+        count_json_bytes('response', body)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
@@ -6,6 +6,7 @@ from datetime import datetime
 from flask import Blueprint, jsonify, current_app
 
 from ..domain.enums import PROJECT_STATUSES, PROJECT_PRIORITIES
+from .conditional import conditional_on_projects
 
 
 bp = Blueprint('meta', __name__)
@@ -21,12 +22,22 @@ def health_check():
     })
 
 
+def _auth_flags():
+    """Which tokens are required; read from the environment, not the DB."""
+    return (
+        bool(os.environ.get('PM_AGENT_TOKEN', '').strip()),
+        bool(os.environ.get('PM_ADMIN_TOKEN', '').strip()),
+    )
+
+
 @bp.route('/meta', methods=['GET'])
+@conditional_on_projects('meta', vary=lambda: repr(_auth_flags()))
 def api_meta():
     """Lightweight, agent-friendly metadata about the service."""
     try:
         store = current_app.extensions.get('projects_store')
         projects, meta = store.list() if store else ([], {})
+        agent_token_required, admin_token_required = _auth_flags()
         
         return jsonify({
             "success": True,
@@ -40,8 +51,8 @@ def api_meta():
                     "priority": PROJECT_PRIORITIES,
                 },
                 "auth": {
-                    "agentTokenRequired": bool(os.environ.get('PM_AGENT_TOKEN', '').strip()),
-                    "adminTokenRequired": bool(os.environ.get('PM_ADMIN_TOKEN', '').strip()),
+                    "agentTokenRequired": agent_token_required,
+                    "adminTokenRequired": admin_token_required,
                     "agentHeader": "X-PM-Agent-Token",
                     "adminHeader": "X-PM-Token",
                 },
@@ -6,6 +6,7 @@ from typing import Dict
 
 from ..domain.errors import ProjectNotFoundError, ValidationError, ConcurrencyConflictError
 from ..domain.auth import require_login_or_agent
+from .conditional import conditional_on_projects
 
 
 bp = Blueprint('projects', __name__)
@@ -18,6 +19,7 @@ def _get_project_service():
 
 @bp.route('', methods=['GET'])
 @require_login_or_agent
+@conditional_on_projects('projects')
 def list_projects():
     """Get all projects (supports filtering)."""
     try:
@@ -27,25 +29,47 @@ def list_projects():
         status = request.args.get('status')
         priority = request.args.get('priority')
         category = request.args.get('category')
+        fields = request.args.get('fields')
+        limit = request.args.get('limit')
+        cursor = request.args.get('cursor') or None
+
+        field_list = None
+        if fields:
+            field_list = [f.strip() for f in fields.split(',') if f.strip()]
+        lim = None
+        if limit:
+            try:
+                lim = max(1, min(1000, int(limit)))
+            except Exception:
+                lim = None
+        if cursor and lim is None:
+            lim = 100
         
         projects, metadata = service.list_projects(
             status=status,
             priority=priority,
-            category=category
+            category=category,
+            fields=field_list,
+            limit=lim,
+            cursor=cursor,
         )
         
         return jsonify({
             "success": True,
             "data": projects,
             "total": metadata["total"],
-            "lastUpdated": metadata.get("lastUpdated")
+            "lastUpdated": metadata.get("lastUpdated"),
+            "nextCursor": metadata.get("nextCursor"),
         })
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @bp.route('/<project_id>', methods=['GET'])
 @require_login_or_agent
+@conditional_on_projects('project')
 def get_project(project_id: str):
     """Get single project by ID."""
     try:
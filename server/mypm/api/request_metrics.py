@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Per-route request counters and latency histograms (see mypm.metrics).
+
+The route label is the URL rule template (`/api/projects/<project_id>`),
+not the path, so label cardinality stays bounded. Requests that match no
+rule are counted under `<unmatched>`.
+
+Latency runs from before_request to after_request. That includes the view
+and the after_request hooks registered after this one (compression), since
+Flask runs after_request hooks in reverse registration order. A streamed
+body (SSE, chunked compression) is produced after that point and is not
+included.
+"""
+
+import time
+
+from flask import g, request
+
+from ..metrics import HTTP_REQUESTS, HTTP_SECONDS, get_registry
+
+
+def before_request():
+    g._metrics_t0 = time.perf_counter()
+
+
+def after_request(response):
+    t0 = g.pop('_metrics_t0', None)
+    if t0 is None:
+        return response
+    rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    registry = get_registry()
+    registry.observe(HTTP_SECONDS, (('route', rule), ('method', request.method)), time.perf_counter() - t0)
+    registry.inc(HTTP_REQUESTS, (('route', rule), ('method', request.method), ('status', str(response.status_code))))
+    return response
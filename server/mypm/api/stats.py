@@ -4,6 +4,7 @@
 from flask import Blueprint, jsonify, current_app, request
 
 from ..domain.auth import require_login_or_agent
+from .conditional import conditional_on_projects
 
 
 bp = Blueprint("stats", __name__)
@@ -21,6 +22,7 @@ def _get_token_usage_store():
 
 @bp.route("", methods=["GET"])
 @require_login_or_agent
+@conditional_on_projects("stats")
 def get_statistics():
     """Get project statistics."""
     try:
@@ -56,3 +58,38 @@ def get_token_statistics():
         return jsonify({"success": True, "data": data})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route("/tokens/series", methods=["GET"])
+@require_login_or_agent
+def get_token_series():
+    """Zero-filled token/cost time series (granularity, groupBy, top-N limit)."""
+    try:
+        store = _get_token_usage_store()
+        if not store:
+            return jsonify({"success": False, "error": "stores not configured"}), 500
+
+        group_by = []
+        for value in request.args.getlist("groupBy"):
+            group_by.extend(v.strip() for v in value.split(",") if v.strip())
+        try:
+            limit = max(1, min(50, int(request.args.get("limit") or 10)))
+        except Exception:
+            limit = 10
+
+        data = store.series(
+            granularity=request.args.get("granularity") or "day",
+            group_by=group_by,
+            limit=limit,
+            project_id=request.args.get("projectId"),
+            agent_id=request.args.get("agentId"),
+            workspace=request.args.get("workspace"),
+            source=request.args.get("source"),
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+        )
+        return jsonify({"success": True, "data": data})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Change stream (Server-Sent Events).
+
+GET /api/stream pushes project changes, run updates and new agent events
+as they commit, instead of making the UI and agents poll. Filters:
+projectId, runId, type (comma-separated, `project.*` style prefixes).
+Resume with the Last-Event-ID header (sent automatically by EventSource) or
+the `lastEventId` query parameter.
+
+A sync WSGI server spends one thread on each open stream. Streams are
+capped (STREAM_MAX_SUBSCRIBERS) and end after STREAM_MAX_SECONDS. The
+`retry:` hint makes the browser reconnect, and Last-Event-ID fills the
+gap. A heartbeat comment every STREAM_HEARTBEAT_SECONDS finds dead
+clients, so their thread is freed at the next write.
+"""
+
+import json
+import time
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from ..domain.auth import require_login_or_agent
+from ..jsoncodec import get_codec
+from ..storage.changes import BrokerFull
+
+
+bp = Blueprint("stream", __name__)
+
+_RETRY_MS = 3000
+
+
+def _frame(change) -> str:
+    data = get_codec().dumps(change)
+    return f"id: {change['id']}\nevent: {change['type']}\ndata: {data}\n\n"
+
+
+@bp.route("", methods=["GET"])
+@require_login_or_agent
+def stream_changes():
+    """Open an SSE stream of committed changes."""
+    broker = current_app.extensions.get("change_broker")
+    if broker is None:
+        return jsonify({"success": False, "error": "change_broker not configured"}), 500
+
+    types = [t for t in (request.args.get("type") or "").split(",") if t.strip()]
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("lastEventId")
+    try:
+        sub = broker.subscribe(
+            project_id=request.args.get("projectId"),
+            run_id=request.args.get("runId"),
+            types=types,
+            last_event_id=last_event_id,
+        )
+    except BrokerFull as e:
+        resp = jsonify({"success": False, "error": str(e)})
+        resp.headers["Retry-After"] = "10"
+        return resp, 503
+
+    cfg = current_app.config
+    heartbeat = max(1.0, float(cfg.get("STREAM_HEARTBEAT_SECONDS", 15)))
+    deadline = time.monotonic() + max(1.0, float(cfg.get("STREAM_MAX_SECONDS", 300)))
+
+    def generate():
+        try:
+            yield f"retry: {_RETRY_MS}\n\n"
+            while True:
+                if sub.resync:
+                    # Missed changes cannot be replayed: reload over REST.
+                    yield f"event: resync\ndata: {json.dumps({'reason': 'gap'})}\n\n"
+                    if sub.closed:
+                        return
+                    sub.resync = False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                change = sub.get(min(heartbeat, remaining))
+                if change is not None:
+                    yield _frame(change)
+                elif not sub.resync:
+                    yield ": keep-alive\n\n"
+        finally:
+            sub.close()
+
+    resp = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream.
+            "X-Accel-Buffering": "no",
+        },
+    )
+    # generate() may never start (client gone before the first chunk, HEAD,
+    # an error in between); its finally would not run then.
+    resp.call_on_close(sub.close)
+    return resp
@@ -2,19 +2,15 @@
 """Application factory."""
 
 import os
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 
 from .config import Config
-from .storage import (
-    ProjectsStore,
-    AgentRunsStore,
-    AgentEventsStore,
-    AgentProfilesStore,
-    AgentCapabilitiesStore,
-    TokenUsageStore,
-)
-from .services import ProjectService, AgentService, DeployService
+from .jsoncodec import set_codec
+from .metrics import get_registry
+from .storage import StorageContext
+from .storage.changes import ChangeBroker
+from .services import ProjectService, AgentService, DeployService, ActionService
 from .domain.auth import require_admin, require_agent, generate_secret_key
 
 
@@ -36,6 +32,11 @@ def create_app(config: Config = None) -> Flask:
         static_folder=config.STATIC_FOLDER,
         static_url_path=config.STATIC_URL_PATH
     )
+
+    # One JSON codec for stored payloads and responses.
+    from .api.json_provider import CodecJSONProvider
+    set_codec(config.JSON_CODEC)
+    app.json = CodecJSONProvider(app)
     
     # Configure session
     app.config['SECRET_KEY'] = os.environ.get('PM_SECRET_KEY') or generate_secret_key()
@@ -52,17 +53,41 @@ def create_app(config: Config = None) -> Flask:
     app.config['ROOT_DIR'] = config.ROOT_DIR
     app.config['DB_FILE'] = config.DB_FILE
     
-    # Initialize storage layer (SQLite)
-    projects_store = ProjectsStore(config.DB_FILE)
-    agent_runs_store = AgentRunsStore(config.DB_FILE)
-    agent_events_store = AgentEventsStore(config.DB_FILE)
-    agent_profiles_store = AgentProfilesStore(config.DB_FILE)
-    agent_capabilities_store = AgentCapabilitiesStore(config.DB_FILE)
-    token_usage_store = TokenUsageStore(config.DB_FILE)
+    # Opt-in SQL tracing; installed before the pool opens its first connection.
+    from .storage.sqlite_db import set_tracer
+    if config.SQL_TRACE:
+        from .storage.sqltrace import SqlTracer
+        set_tracer(SqlTracer(
+            slow_ms=config.SQL_SLOW_MS,
+            slow_log=config.SQL_SLOW_LOG,
+            max_bytes=config.SQL_SLOW_LOG_MAX_BYTES,
+            backups=config.SQL_SLOW_LOG_BACKUPS,
+        ))
+    else:
+        set_tracer(None)
+
+    # Initialize storage layer (SQLite): one pool, migrations run once here.
+    changes = ChangeBroker(
+        buffer_size=config.STREAM_BUFFER_SIZE,
+        max_subscribers=config.STREAM_MAX_SUBSCRIBERS,
+    )
+    storage = StorageContext(
+        config.DB_FILE,
+        pool_size=config.DB_POOL_SIZE,
+        changes=changes,
+        project_cache_size=config.PROJECT_CACHE_SIZE if config.PROJECT_CACHE else 0,
+    )
+    projects_store = storage.projects
+    agent_runs_store = storage.agent_runs
+    agent_events_store = storage.agent_events
+    agent_profiles_store = storage.agent_profiles
+    agent_capabilities_store = storage.agent_capabilities
+    token_usage_store = storage.token_usage
     
     # Initialize services
     project_service = ProjectService(projects_store)
     agent_service = AgentService(agent_runs_store)
+    action_service = ActionService(storage)
     deploy_service = DeployService(
         root_dir=config.ROOT_DIR,
         state_file=config.DEPLOY_STATE_FILE,
@@ -71,6 +96,8 @@ def create_app(config: Config = None) -> Flask:
     )
     
     # Register in app extensions
+    app.extensions['storage'] = storage
+    app.extensions['change_broker'] = changes
     app.extensions.setdefault('stores', {})
     app.extensions['stores']['projects_store'] = projects_store
     app.extensions['stores']['agent_runs_store'] = agent_runs_store
@@ -82,6 +109,7 @@ def create_app(config: Config = None) -> Flask:
     app.extensions['projects_store'] = projects_store
     app.extensions['project_service'] = project_service
     app.extensions['agent_service'] = agent_service
+    app.extensions['action_service'] = action_service
     app.extensions['deploy_service'] = deploy_service
     app.extensions['require_agent'] = require_agent
     app.extensions['require_admin'] = require_admin
@@ -90,6 +118,20 @@ def create_app(config: Config = None) -> Flask:
     app.extensions.setdefault('maintenance', {})
     app.extensions['maintenance'].setdefault('restoring_db', False)
 
+    # Request/store metrics (GET /api/admin/metrics). Registered first, so the
+    # timer starts before other hooks and stops after compression.
+    get_registry().enabled = config.METRICS
+    if config.METRICS:
+        from .api import request_metrics
+        app.before_request(request_metrics.before_request)
+        app.after_request(request_metrics.after_request)
+
+    # Request threads announce themselves to the sampling profiler
+    # (POST /api/admin/profile); a dict store per request.
+    from .profiling import track_request, untrack_request
+    app.before_request(track_request)
+    app.teardown_request(untrack_request)
+
     @app.before_request
     def _block_during_restore():
         # Keep admin endpoints available to complete restore request.
@@ -111,7 +153,7 @@ def create_app(config: Config = None) -> Flask:
         }), 503
     
     # Register blueprints
-    from .api import projects, stats, meta, agent, agent_ops, admin_ops, auth
+    from .api import projects, stats, meta, agent, agent_ops, admin_ops, auth, stream
     
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(projects.bp, url_prefix='/api/projects')
@@ -120,8 +162,23 @@ def create_app(config: Config = None) -> Flask:
     app.register_blueprint(agent.bp, url_prefix='/api/agent')
     app.register_blueprint(agent_ops.bp, url_prefix='/api/agent')
     app.register_blueprint(admin_ops.bp, url_prefix='/api/admin')
+    app.register_blueprint(stream.bp, url_prefix='/api/stream')
+
+    if config.COMPRESS:
+        from .api.compression import ResponseCompressor
+        compressor = ResponseCompressor(
+            min_size=config.COMPRESS_MIN_SIZE,
+            level=config.COMPRESS_LEVEL,
+            stream_threshold=config.COMPRESS_STREAM_THRESHOLD,
+        )
+        app.extensions['compressor'] = compressor
+        app.after_request(compressor.after_request)
     
-    # Register static routes
+    # Register static routes (served from an in-memory manifest of frontend/dist)
+    from .api.assets import AssetManifest
+    assets = AssetManifest(config.FRONTEND_DIST_DIR)
+    app.extensions['assets'] = assets
+
     @app.route('/')
     @app.route('/<path:filename>')
     def index_app_root(filename: str = 'index.html'):
@@ -135,27 +192,8 @@ def create_app(config: Config = None) -> Flask:
             from flask import abort
             abort(404)
 
-        if not os.path.isdir(config.FRONTEND_DIST_DIR):
-            return (
-                "<h2>Frontend not built</h2>"
-                "<p>Run <code>npm install</code> and <code>npm run build</code> in <code>frontend/</code>.</p>",
-                200,
-                {'Content-Type': 'text/html; charset=utf-8'}
-            )
-
         path = str(filename or '').strip() or 'index.html'
-
-        # If a static file exists in dist, serve it.
-        full = os.path.join(config.FRONTEND_DIST_DIR, path)
-        if path != 'index.html' and os.path.exists(full):
-            return send_from_directory(config.FRONTEND_DIST_DIR, path)
-
-        # Otherwise serve SPA index.html (deep-link fallback).
-        response = send_from_directory(config.FRONTEND_DIST_DIR, 'index.html')
-        # Cache but always revalidate with server (ETag).
-        # Browser will send If-None-Match, server responds 304 if unchanged.
-        response.headers['Cache-Control'] = 'no-cache'
-        return response
+        return assets.serve(path)
     
     # Error handlers
     @app.errorhandler(404)
@@ -13,6 +13,48 @@ class Config:
 
     # SQLite runtime storage
     DB_FILE = os.environ.get('PM_DB_FILE') or os.path.join(DATA_DIR, 'pm.db')
+    # Max open SQLite connections per process (see storage.sqlite_db.ConnectionPool).
+    # Defaults to PM_THREADS: a smaller pool makes the extra request threads
+    # wait, then fail with "connection pool exhausted".
+    DB_POOL_SIZE = max(1, int(os.environ.get('PM_DB_POOL_SIZE') or os.environ.get('PM_THREADS') or '16'))
+    # Decoded-project read cache (storage.cache.VersionedCache); PM_PROJECT_CACHE=0 turns it off.
+    PROJECT_CACHE = bool(int(os.environ.get('PM_PROJECT_CACHE', '1')))
+    PROJECT_CACHE_SIZE = int(os.environ.get('PM_PROJECT_CACHE_SIZE', '256'))
+
+    # JSON backend for payload_json and responses: auto | orjson | stdlib (see jsoncodec).
+    JSON_CODEC = os.environ.get('PM_JSON_CODEC', 'auto')
+
+    # Counters/histograms for GET /api/admin/metrics (mypm.metrics); PM_METRICS=0 turns them off.
+    METRICS = bool(int(os.environ.get('PM_METRICS', '1')))
+
+    # Opt-in SQL statement tracing (storage.sqltrace): top-N at GET /api/admin/sql,
+    # statements slower than SQL_SLOW_MS go to a rotating JSONL file.
+    SQL_TRACE = bool(int(os.environ.get('PM_SQL_TRACE', '0')))
+    SQL_SLOW_MS = float(os.environ.get('PM_SQL_SLOW_MS', '100'))
+    SQL_SLOW_LOG = os.environ.get('PM_SQL_SLOW_LOG') or os.path.join(DATA_DIR, 'sql_slow.jsonl')
+    SQL_SLOW_LOG_MAX_BYTES = int(os.environ.get('PM_SQL_SLOW_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    SQL_SLOW_LOG_BACKUPS = int(os.environ.get('PM_SQL_SLOW_LOG_BACKUPS', '3'))
+
+    # On-demand sampling profiler (POST /api/admin/profile): longest session allowed.
+    PROFILE_MAX_SECONDS = float(os.environ.get('PM_PROFILE_MAX_SECONDS', '60'))
+
+    # gzip/deflate for /api responses (api.compression); PM_COMPRESS=0 turns it off.
+    COMPRESS = bool(int(os.environ.get('PM_COMPRESS', '1')))
+    COMPRESS_MIN_SIZE = int(os.environ.get('PM_COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_LEVEL = int(os.environ.get('PM_COMPRESS_LEVEL', '6'))
+    COMPRESS_STREAM_THRESHOLD = int(os.environ.get('PM_COMPRESS_STREAM_THRESHOLD', str(256 * 1024)))
+
+    # Change stream (GET /api/stream). Each open stream holds one server
+    # thread, so streams are capped (default: half of PM_THREADS) and end
+    # after STREAM_MAX_SECONDS (the browser reconnects with Last-Event-ID
+    # and misses nothing).
+    STREAM_MAX_SUBSCRIBERS = int(os.environ.get(
+        'PM_STREAM_MAX_SUBSCRIBERS',
+        str(max(1, int(os.environ.get('PM_THREADS', '16')) // 2)),
+    ))
+    STREAM_MAX_SECONDS = float(os.environ.get('PM_STREAM_MAX_SECONDS', '300'))
+    STREAM_HEARTBEAT_SECONDS = float(os.environ.get('PM_STREAM_HEARTBEAT_SECONDS', '15'))
+    STREAM_BUFFER_SIZE = int(os.environ.get('PM_STREAM_BUFFER_SIZE', '1000'))
     
     DEPLOY_LOG_FILE = os.path.join(ROOT_DIR, 'deploy_run.log')
     DEPLOY_STATE_FILE = os.path.join(ROOT_DIR, 'deploy_state.json')
@@ -23,6 +65,15 @@ class Config:
     # Server
     PORT = int(os.environ.get('PM_PORT', '8689'))
     DEBUG = bool(int(os.environ.get('PM_DEBUG', '0')))
+
+    # Serving (server/main.py): auto | gunicorn | waitress | dev. See docs/DEPLOYMENT.md.
+    SERVER = os.environ.get('PM_SERVER', 'auto').strip().lower()
+    WORKERS = max(1, int(os.environ.get('PM_WORKERS', '1')))
+    THREADS = max(1, int(os.environ.get('PM_THREADS', '16')))
+    KEEPALIVE = int(os.environ.get('PM_KEEPALIVE', '5'))
+    GRACEFUL_TIMEOUT = int(os.environ.get('PM_GRACEFUL_TIMEOUT', '30'))
+    PRELOAD = bool(int(os.environ.get('PM_PRELOAD', '1')))
+    MAX_REQUESTS = int(os.environ.get('PM_MAX_REQUESTS', '0'))
     
     # Auth tokens
     ADMIN_TOKEN = os.environ.get('PM_ADMIN_TOKEN', '').strip()
@@ -23,6 +23,7 @@ from .models import (
     normalize_agent_run,
     normalize_agent_event,
     project_get_tags,
+    project_money_total,
 )
 
 __all__ = [
@@ -46,4 +47,5 @@ __all__ = [
     'normalize_agent_run',
     'normalize_agent_event',
     'project_get_tags',
+    'project_money_total',
 ]
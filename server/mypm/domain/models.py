@@ -330,6 +330,19 @@ def project_get_tags(project: Project) -> List[str]:
     return out
 
 
+def project_money_total(project: Project, key: str) -> float:
+    """Numeric total of a cost/revenue field ({'total': x} or a bare number)."""
+    v = project.get(key)
+    try:
+        if isinstance(v, dict):
+            return float(v.get('total') or 0)
+        if isinstance(v, (int, float)):
+            return float(v)
+    except Exception:
+        pass
+    return 0.0
+
+
 def normalize_agent_profile(obj: Any) -> Tuple[AgentProfile, bool]:
     changed = False
     now = datetime.now().isoformat()
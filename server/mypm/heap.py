@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""Heap diagnostics on top of tracemalloc (/api/admin/heap).
+
+Tracing is off until an admin turns it on. While it is on, every live
+allocation carries its file and line (`frames` deep). That slows
+allocation-heavy code and adds memory per block
+(`tracemallocBytes` in the status). So the usual flow is: start,
+reproduce, take snapshots, diff them, stop.
+
+- Snapshots are kept in memory, the last `_MAX_SNAPSHOTS` of them.
+  tracemalloc's own frames and import machinery are filtered out.
+- A diff groups two snapshots by line, file or traceback and lists what
+  grew the most.
+- measure_request() replays one GET in-process and reports the peak
+  allocated while it ran: rows decoded, dicts built, the JSON string
+  and the compressed body. tracemalloc's peak is process-wide, so other
+  requests served at the same time inflate it; the result says how many
+  there were.
+
+Everything is per process.
+"""
+
+from __future__ import annotations
+
+import gc
+import linecache
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from .profiling import active_requests
+
+_MAX_SNAPSHOTS = 8
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+GROUPS = ('lineno', 'filename', 'traceback')
+
+
+class HeapBusy(RuntimeError):
+    """Another measurement is running."""
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux), else None."""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _stat(stat, diff: bool, group: str = 'lineno') -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    out = {
+        'file': frame.filename,
+        'line': frame.lineno if group != 'filename' else None,
+        'sizeBytes': stat.size,
+        'count': stat.count,
+    }
+    if diff:
+        out['sizeDiffBytes'] = stat.size_diff
+        out['countDiff'] = stat.count_diff
+    if len(stat.traceback) > 1:
+        out['traceback'] = [f'{f.filename}:{f.lineno}' for f in stat.traceback]
+    return out
+
+
+class _Snapshot:
+    __slots__ = ('id', 'taken_at', 'snapshot', 'traced', 'peak', 'rss')
+
+    def __init__(self, id: int, snapshot, traced: int, peak: int):
+        self.id = id
+        self.taken_at = datetime.now().isoformat()
+        self.snapshot = snapshot
+        self.traced = traced
+        self.peak = peak
+        self.rss = rss_bytes()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'takenAt': self.taken_at,
+            'tracedBytes': self.traced,
+            'peakBytes': self.peak,
+            'rssBytes': self.rss,
+            'traces': len(self.snapshot.traces),
+        }
+
+
+class HeapDiagnostics:
+    """tracemalloc switch, kept snapshots and per-request peaks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Who needs tracing on: 'admin' (start/stop) and/or 'measure'.
+        # Tracing stops when the last one lets go.
+        self._trace_lock = threading.Lock()
+        self._holders: Set[str] = set()
+        self._snapshots: List[_Snapshot] = []
+        self._next_id = 1
+
+    def _hold(self, who: str, frames: int) -> None:
+        with self._trace_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            elif not self._holders:
+                # Already on (PYTHONTRACEMALLOC): only an admin stop ends it.
+                self._holders.add('admin')
+            self._holders.add(who)
+
+    def _unhold(self, who: str) -> None:
+        with self._trace_lock:
+            self._holders.discard(who)
+            if not self._holders and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        traced, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            'pid': os.getpid(),
+            'tracing': tracing,
+            'frames': tracemalloc.get_traceback_limit() if tracing else None,
+            'tracedBytes': traced,
+            'peakBytes': peak,
+            'tracemallocBytes': tracemalloc.get_tracemalloc_memory() if tracing else 0,
+            'rssBytes': rss_bytes(),
+            'snapshots': [s.summary() for s in self._snapshots],
+        }
+
+    def start(self, frames: int = 1) -> None:
+        """Turn tracing on (no-op if already on, `frames` then unchanged)."""
+        self._hold('admin', frames)
+
+    def stop(self) -> None:
+        """Stop tracing; snapshots already taken are kept.
+
+        A measure_request() in progress keeps it on until it finishes.
+        """
+        self._unhold('admin')
+
+    def take_snapshot(self, limit: int = 20) -> Dict[str, Any]:
+        """Snapshot now (tracing must be on); returns its summary and top lines."""
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        traced, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            snap = _Snapshot(self._next_id, snapshot, traced, peak)
+            self._next_id += 1
+            self._snapshots.append(snap)
+            del self._snapshots[:-_MAX_SNAPSHOTS]
+        top = snapshot.statistics('lineno')[:max(1, limit)]
+        return {**snap.summary(), 'top': [_stat(s, diff=False) for s in top]}
+
+    def get(self, snapshot_id: int) -> Optional[_Snapshot]:
+        for snap in self._snapshots:
+            if snap.id == snapshot_id:
+                return snap
+        return None
+
+    def latest(self, n: int = 2) -> List[_Snapshot]:
+        return list(self._snapshots[-n:])
+
+    def diff(self, old: _Snapshot, new: _Snapshot, group: str = 'lineno',
+             limit: int = 30) -> Dict[str, Any]:
+        """What grew between two snapshots, largest size difference first."""
+        stats = new.snapshot.compare_to(old.snapshot, group)
+        return {
+            'from': old.summary(),
+            'to': new.summary(),
+            'group': group,
+            'tracedDiffBytes': new.traced - old.traced,
+            'rssDiffBytes': (new.rss - old.rss) if new.rss is not None and old.rss is not None else None,
+            'top': [_stat(s, diff=True, group=group) for s in stats[:max(1, limit)]],
+        }
+
+    def measure_request(self, app, path: str, headers: Dict[str, str], repeat: int = 1,
+                        limit: int = 10) -> Dict[str, Any]:
+        """Replay GET `path` `repeat` times; peak and retained bytes per run.
+
+        Tracing is turned on for the measurement if it was off, and turned
+        off afterwards unless an admin started it meanwhile. The process-wide
+        peak is reset per run. Retained bytes are counted after a
+        gc.collect(), with the response body still referenced. The last run
+        also lists the lines that hold them (the body itself, caches, leaks).
+        """
+        if not self._lock.acquire(blocking=False):
+            raise HeapBusy()
+        try:
+            self._hold('measure', 1)
+            me = threading.get_ident()
+            client = app.test_client()
+            runs = []
+            top: List[Dict[str, Any]] = []
+            for i in range(repeat):
+                last = i == repeat - 1
+                gc.collect()
+                before = tracemalloc.take_snapshot().filter_traces(_FILTERS) if last else None
+                concurrent = sum(1 for ident in active_requests() if ident != me)
+                base = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                t0 = time.perf_counter()
+                resp = client.get(path, headers=headers)
+                body = resp.get_data()
+                elapsed = time.perf_counter() - t0
+                peak = tracemalloc.get_traced_memory()[1]
+                gc.collect()
+                traced = tracemalloc.get_traced_memory()[0]
+                if last:
+                    after = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+                    top = [_stat(s, diff=True) for s in after.compare_to(before, 'lineno')[:max(1, limit)]]
+                runs.append({
+                    'status': resp.status_code,
+                    'responseBytes': len(body),
+                    'contentEncoding': resp.headers.get('Content-Encoding'),
+                    'peakBytes': peak - base,
+                    'retainedBytes': traced - base,
+                    'ms': round(elapsed * 1000.0, 3),
+                    'concurrentRequests': concurrent,
+                })
+                resp.close()
+                del resp, body
+            peaks = sorted(r['peakBytes'] for r in runs)
+            return {
+                'path': path,
+                'pid': os.getpid(),
+                'runs': runs,
+                'peakBytes': {'min': peaks[0], 'median': peaks[len(peaks) // 2], 'max': peaks[-1]},
+                'retainedTop': top,
+            }
+        finally:
+            self._unhold('measure')
+            self._lock.release()
+
+    def after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._trace_lock = threading.Lock()
+        self._holders.discard('measure')
+        self._snapshots = []
+
+
+_heap = HeapDiagnostics()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_heap.after_fork)
+
+
+def get_heap() -> HeapDiagnostics:
+    return _heap
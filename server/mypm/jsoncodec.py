@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""JSON codec used by the stores (payload_json) and by HTTP responses.
+
+Two backends with the same output contract (compact, UTF-8, non-ASCII kept):
+
+- `stdlib`: the `json` module; always available.
+- `orjson`: optional (`pip install orjson`), several times faster on both
+  encode and decode.
+
+PM_JSON_CODEC picks one: `auto` (default: orjson if installed, else
+stdlib), `orjson` or `stdlib`. The orjson backend falls back to stdlib
+for the inputs it rejects: encoding integers beyond 64 bits, decoding
+NaN/Infinity literals. So switching backends never changes what can be
+stored. Known differences: orjson writes NaN/Infinity as null (json
+writes non-standard literals), and it decodes integers beyond 64 bits
+as floats.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:  # optional accelerator
+    orjson = None
+
+
+class StdlibCodec:
+    name = 'stdlib'
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False,
+              default: Optional[Callable[[Any], Any]] = None) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'),
+                          sort_keys=sort_keys, default=default)
+
+    def dumps_bytes(self, obj: Any, *, sort_keys: bool = False,
+                    default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        return self.dumps(obj, sort_keys=sort_keys, default=default).encode('utf-8')
+
+    def loads(self, s: Any) -> Any:
+        return json.loads(s)
+
+
+class OrjsonCodec:
+    name = 'orjson'
+
+    def __init__(self):
+        self._stdlib = StdlibCodec()
+        # Non-str dict keys become strings (as with json); datetimes go through
+        # `default` so callers keep control of their format.
+        self._options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps_bytes(self, obj: Any, *, sort_keys: bool = False,
+                    default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        option = self._options | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # orjson.JSONEncodeError: big ints, unsupported types... stdlib
+            # either encodes it or raises the error callers expect.
+            return self._stdlib.dumps_bytes(obj, sort_keys=sort_keys, default=default)
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False,
+              default: Optional[Callable[[Any], Any]] = None) -> str:
+        return self.dumps_bytes(obj, sort_keys=sort_keys, default=default).decode('utf-8')
+
+    def loads(self, s: Any) -> Any:
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            return self._stdlib.loads(s)
+
+
+def available() -> list:
+    """Backend names usable in this environment."""
+    return ['stdlib'] + (['orjson'] if orjson is not None else [])
+
+
+def make_codec(name: Optional[str] = None):
+    """Build a codec by name (`auto`, `orjson`, `stdlib`).
+
+    Raises:
+        ValueError: For an unknown name, or `orjson` when it is not installed
+    """
+    name = (name or 'auto').strip().lower()
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name == 'stdlib':
+        return StdlibCodec()
+    if name == 'orjson':
+        if orjson is None:
+            raise ValueError("PM_JSON_CODEC=orjson but orjson is not installed")
+        return OrjsonCodec()
+    raise ValueError(f"unknown JSON codec: {name}")
+
+
+_codec = make_codec(os.environ.get('PM_JSON_CODEC'))
+
+
+def get_codec():
+    """The process-wide codec (store helpers and the Flask JSON provider)."""
+    return _codec
+
+
+def set_codec(name: Optional[str]):
+    """Switch the process-wide codec; returns the new one."""
+    global _codec
+    _codec = make_codec(name)
+    return _codec
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Process-wide counters and histograms (GET /api/admin/metrics).
+
+Recording takes no lock. Each thread writes to its own shard, a plain dict
+that only that thread mutates, so the hot path is a thread-local lookup
+plus a few list updates. A scrape sums the shards under a lock that
+writers only take once, to register a new thread. Shards of finished
+threads are folded into one `retired` shard at scrape time. The dev
+server starts a thread per request, so this keeps the shard list short.
+
+Values are per process. With several gunicorn workers, a scrape shows only
+the worker that answered it. PM_METRICS=0 turns recording off.
+
+What is recorded where:
+- HTTP requests per route: api/request_metrics.py
+- Store method time, records returned, busy errors: @instrument_store on
+  the classes in storage/sqlite_store.py (the methods that run SQL)
+- Write-lock wait: StorageContext.transaction
+- JSON bytes encoded: store payloads (_json_dumps) and API responses
+  (CodecJSONProvider)
+- Pool, cache, compression and stream counters are read from their own
+  stats() at scrape time (see admin_ops.admin_metrics).
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import math
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+# (name, type, help, [(labels, value), ...]) for values read at scrape time.
+Family = Tuple[str, str, str, List[Tuple[Labels, float]]]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = 'pm_http_requests_total'
+HTTP_SECONDS = 'pm_http_request_duration_seconds'
+STORE_SECONDS = 'pm_store_call_duration_seconds'
+STORE_ROWS = 'pm_store_rows_returned_total'
+SQLITE_BUSY = 'pm_sqlite_busy_errors_total'
+SQLITE_LOCK_WAIT = 'pm_sqlite_write_lock_wait_seconds'
+JSON_BYTES = 'pm_json_encoded_bytes_total'
+
+
+def _merge(into: Dict[Any, List[float]], shard: Dict[Any, List[float]]) -> None:
+    for key, cell in shard.items():
+        acc = into.get(key)
+        if acc is None:
+            into[key] = list(cell)
+        else:
+            for i, v in enumerate(cell):
+                acc[i] += v
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return '+Inf'
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+class Registry:
+    """Counters and histograms sharded per thread."""
+
+    def __init__(self):
+        self.enabled = True
+        self._families: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all recorded values (families stay declared)."""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict[Any, List[float]]]] = []
+        self._retired: Dict[Any, List[float]] = {}
+
+    def counter(self, name: str, help: str) -> str:
+        self._families[name] = ('counter', help, ())
+        return name
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> str:
+        self._families[name] = ('histogram', help, tuple(sorted(buckets)))
+        return name
+
+    def _shard(self) -> Dict[Any, List[float]]:
+        data = getattr(self._local, 'data', None)
+        if data is None:
+            data = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), data))
+            self._local.data = data
+        return data
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1) -> None:
+        if not self.enabled:
+            return
+        data = self._shard()
+        cell = data.get((name, labels))
+        if cell is None:
+            data[(name, labels)] = [value]
+        else:
+            cell[0] += value
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        """Histogram sample. Cell layout: [count, sum, bucket_0 .. bucket_n, +Inf]."""
+        if not self.enabled:
+            return
+        buckets = self._families[name][2]
+        data = self._shard()
+        cell = data.get((name, labels))
+        if cell is None:
+            cell = data[(name, labels)] = [0, 0.0] + [0] * (len(buckets) + 1)
+        cell[0] += 1
+        cell[1] += value
+        cell[2 + bisect_left(buckets, value)] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, Labels], List[float]]:
+        """Sum of all shards: {(name, labels): cell}."""
+        totals: Dict[Any, List[float]] = {}
+        with self._lock:
+            live = []
+            for thread, data in self._shards:
+                if thread.is_alive():
+                    live.append((thread, data))
+                    # dict() copies atomically under the GIL; cells may be a
+                    # few increments ahead of each other, which is fine for metrics.
+                    _merge(totals, dict(data))
+                else:
+                    _merge(self._retired, data)
+            self._shards = live
+            _merge(totals, self._retired)
+        return totals
+
+    def render(self, extra: Iterable[Family] = ()) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        by_name: Dict[str, List[Tuple[Labels, List[float]]]] = {}
+        for (name, labels), cell in self.snapshot().items():
+            by_name.setdefault(name, []).append((labels, cell))
+
+        lines: List[str] = []
+        for name, (typ, help, buckets) in self._families.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {typ}')
+            for labels, cell in sorted(by_name.get(name, ())):
+                if typ == 'histogram':
+                    cumulative = 0
+                    for le, n in zip(buckets + (math.inf,), cell[2:]):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", _fmt(le)),))} {_fmt(cumulative)}')
+                    lines.append(f'{name}_sum{_labels(labels)} {_fmt(cell[1])}')
+                    lines.append(f'{name}_count{_labels(labels)} {_fmt(cell[0])}')
+                else:
+                    lines.append(f'{name}{_labels(labels)} {_fmt(cell[0])}')
+        for name, typ, help, samples in extra:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {typ}')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(labels)} {_fmt(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+_registry = Registry()
+_registry.counter(HTTP_REQUESTS, 'HTTP requests by route template, method and status.')
+_registry.histogram(HTTP_SECONDS, 'Time until the view returned a response (streamed bodies excluded).')
+_registry.histogram(STORE_SECONDS, 'Wall time of store methods (SQLite plus payload decoding).')
+_registry.counter(STORE_ROWS, 'Records returned by store methods.')
+_registry.counter(SQLITE_BUSY, 'Store calls that failed with "database is locked/busy".')
+_registry.histogram(SQLITE_LOCK_WAIT, 'Time to take the write lock (BEGIN IMMEDIATE).')
+_registry.counter(JSON_BYTES, 'UTF-8 bytes of JSON encoded, by target (store payload or API response).')
+
+if hasattr(os, 'register_at_fork'):
+    # Pre-fork servers: a worker starts from zero, not from the master's counts.
+    os.register_at_fork(after_in_child=_registry.reset)
+
+
+def get_registry() -> Registry:
+    return _registry
+
+
+def _rows(result: Any) -> int:
+    if result is None or isinstance(result, (str, bytes, int, float)):
+        return 0                    # scalars (versions, counts) are not rows
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])       # (items, meta) pages
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def _is_busy(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return 'locked' in msg or 'busy' in msg
+
+
+def _timed(store: str, method: str, fn: Callable) -> Callable:
+    labels: Labels = (('store', store), ('method', method))
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _registry.enabled:
+            return fn(*args, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if _is_busy(e):
+                _registry.inc(SQLITE_BUSY, labels)
+            raise
+        finally:
+            _registry.observe(STORE_SECONDS, labels, time.perf_counter() - t0)
+        _registry.inc(STORE_ROWS, labels, _rows(result))
+        return result
+    return wrapper
+
+
+def instrument_store(store: str, methods: Sequence[str]):
+    """Class decorator: time the named methods, each a store call that runs SQL.
+
+    The list is explicit. Methods on a caller's connection (counted in the
+    call that owns it), in-memory helpers and thin wrappers around another
+    timed method stay out, so the histograms show SQLite work only.
+    """
+    def decorate(cls):
+        for name in methods:
+            fn = vars(cls).get(name)
+            if not inspect.isfunction(fn):
+                raise TypeError(f'{cls.__name__}.{name} is not a method')
+            setattr(cls, name, _timed(store, name, fn))
+        return cls
+    return decorate
+
+
+def count_json_bytes(target: str, data: Any) -> None:
+    """Add len(data) in UTF-8 bytes; str.isascii() is O(1) for the common case."""
+    if not _registry.enabled:
+        return
+    if isinstance(data, str):
+        n = len(data) if data.isascii() else len(data.encode('utf-8'))
+    else:
+        n = len(data)
+    _registry.inc(JSON_BYTES, (('target', target),), n)
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""On-demand sampling profiler (POST /api/admin/profile).
+
+A session runs for a fixed number of seconds. One background thread wakes
+every `interval` and reads the stack of every thread that is handling a
+request (sys._current_frames()). Other threads are skipped unless the
+session asks for all of them. Request threads register themselves in
+before_request/teardown_request, which costs a dict store per request.
+
+cProfile is not used. It only sees the thread that enabled it, and it
+slows every function call. The sampler costs nothing between sessions.
+During a session its cost is one stack walk per thread per tick. If a
+tick takes longer than 5% of the wall time, the next sleep is stretched
+to bring it back under 5%, so a busy server is sampled less often rather
+than slowed.
+
+A finished session produces two downloads:
+- `.collapsed`: one line per distinct stack, `route;frame;frame... count`,
+  the input format of flamegraph.pl, speedscope and inferno;
+- `.pstats`: the same samples as a marshal'ed pstats table, for
+  `python -m pstats` or snakeviz. Times there are sampled wall time; call
+  counts are numbers of samples, not calls.
+
+Sessions are per process. Only one runs at a time and only the last
+result is kept.
+"""
+
+from __future__ import annotations
+
+import io
+import marshal
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Frames walked per stack; deeper stacks keep their leaf end.
+_MAX_DEPTH = 256
+# Distinct stacks kept per session; further ones are counted as truncated.
+_MAX_STACKS = 50000
+# Share of wall time the sampler thread may spend walking stacks.
+_MAX_OVERHEAD = 0.05
+
+# Thread ident -> "METHOD /rule" for threads currently inside a request.
+_requests: Dict[int, str] = {}
+
+
+def track_request() -> None:
+    """before_request hook: mark this thread as serving a request.
+
+    A request dispatched in-process from inside another one (the heap
+    endpoint replays GETs through the test client) runs on the same
+    thread; the outer entry is kept in its environ and put back.
+    """
+    from flask import request
+    ident = threading.get_ident()
+    outer = _requests.get(ident)
+    if outer is not None:
+        request.environ['pm.outer_request'] = outer
+    rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    _requests[ident] = f'{request.method} {rule}'
+
+
+def untrack_request(exc=None) -> None:
+    """teardown_request hook."""
+    from flask import request
+    outer = request.environ.get('pm.outer_request')
+    if outer is not None:
+        _requests[threading.get_ident()] = outer
+    else:
+        _requests.pop(threading.get_ident(), None)
+
+
+def active_requests() -> Dict[int, str]:
+    """Copy of {thread ident: route} for requests in flight."""
+    return dict(_requests)
+
+
+class ProfilerBusy(RuntimeError):
+    """A session is already running."""
+
+
+def _short_file(filename: str) -> str:
+    parts = filename.replace('\\', '/').rsplit('/', 2)
+    return '/'.join(parts[-2:])
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({_short_file(code.co_filename)}:{code.co_firstlineno})'
+
+
+def _func_key(code) -> Tuple[str, int, str]:
+    return (code.co_filename, code.co_firstlineno, getattr(code, 'co_qualname', code.co_name))
+
+
+class ProfileSession:
+    """Samples for one run; results are rendered when it finishes."""
+
+    def __init__(self, seconds: float, interval: float, all_threads: bool):
+        self.id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.seconds = seconds
+        self.interval = interval
+        self.all_threads = all_threads
+        self.started_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self.ticks = 0
+        self.samples = 0
+        self.truncated = 0
+        self.sampler_cpu = 0.0
+        self.wall = 0.0
+        # (route, (code, ...) root first) -> [samples, seconds]
+        self.stacks: Dict[Tuple[str, tuple], List[float]] = {}
+        self.collapsed: Optional[bytes] = None
+        self.pstats: Optional[bytes] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'pid': os.getpid(),
+            'running': self.running,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+            'seconds': self.seconds,
+            'intervalMs': round(self.interval * 1000.0, 3),
+            'threads': 'all' if self.all_threads else 'requests',
+            'ticks': self.ticks,
+            'samples': self.samples,
+            'stacks': len(self.stacks),
+            'truncated': self.truncated,
+            'wallSeconds': round(self.wall, 3),
+            'samplerCpuSeconds': round(self.sampler_cpu, 4),
+            'overhead': round(self.sampler_cpu / self.wall, 4) if self.wall else 0.0,
+        }
+
+    # -- sampling ---------------------------------------------------------
+
+    def _sample(self, weight: float) -> None:
+        me = threading.get_ident()
+        frames = sys._current_frames()
+        if self.all_threads:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            targets = [(ident, _requests.get(ident) or f'<thread {names.get(ident, ident)}>')
+                       for ident in frames if ident != me]
+        else:
+            targets = [(ident, route) for ident, route in list(_requests.items()) if ident != me]
+        for ident, route in targets:
+            f = frames.get(ident)
+            if f is None:
+                continue
+            codes = []
+            while f is not None and len(codes) < _MAX_DEPTH:
+                codes.append(f.f_code)
+                f = f.f_back
+            codes.reverse()
+            key = (route, tuple(codes))
+            cell = self.stacks.get(key)
+            if cell is None:
+                if len(self.stacks) >= _MAX_STACKS:
+                    self.truncated += 1
+                    continue
+                cell = self.stacks[key] = [0, 0.0]
+            cell[0] += 1
+            cell[1] += weight
+            self.samples += 1
+
+    def run(self) -> None:
+        cpu0 = time.thread_time()
+        t0 = last = time.perf_counter()
+        deadline = t0 + self.seconds
+        try:
+            while not self._stop.is_set():
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                c0 = time.thread_time()
+                self._sample(now - last if self.ticks else self.interval)
+                cost = time.thread_time() - c0
+                self.ticks += 1
+                last = now
+                pause = max(self.interval - (time.perf_counter() - now),
+                            cost * (1.0 - _MAX_OVERHEAD) / _MAX_OVERHEAD)
+                self._stop.wait(min(pause, max(0.0, deadline - time.perf_counter())))
+        finally:
+            self.wall = time.perf_counter() - t0
+            self.sampler_cpu = time.thread_time() - cpu0
+            self.collapsed = self._render_collapsed()
+            self.pstats = self._render_pstats()
+            self.finished_at = datetime.now().isoformat()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # -- output -----------------------------------------------------------
+
+    def _render_collapsed(self) -> bytes:
+        labels: Dict[Any, str] = {}
+        lines = []
+        for (route, codes), (count, _) in self.stacks.items():
+            parts = [route.replace(';', ':')]
+            for code in codes:
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code).replace(';', ':')
+                parts.append(label)
+            lines.append(f"{';'.join(parts)} {int(count)}")
+        lines.sort()
+        return ('\n'.join(lines) + '\n').encode('utf-8') if lines else b''
+
+    def _render_pstats(self) -> bytes:
+        """pstats table: {func: (cc, nc, tt, ct, {caller: (cc, nc, tt, ct)})}."""
+        funcs: Dict[Tuple[str, int, str], List[Any]] = {}
+        keys: Dict[Any, Tuple[str, int, str]] = {}
+
+        def entry(func):
+            cell = funcs.get(func)
+            if cell is None:
+                cell = funcs[func] = [0, 0, 0.0, 0.0, {}]
+            return cell
+
+        for (route, codes), (count, seconds) in self.stacks.items():
+            chain = [('~', 0, f'<{route}>')]
+            for code in codes:
+                func = keys.get(code)
+                if func is None:
+                    func = keys[code] = _func_key(code)
+                chain.append(func)
+            last = len(chain) - 1
+            seen = set()
+            for i, func in enumerate(chain):
+                cell = entry(func)
+                if i == last:
+                    cell[2] += seconds
+                if func in seen:
+                    continue            # recursion: count the outermost frame once
+                seen.add(func)
+                cell[0] += count
+                cell[1] += count
+                cell[3] += seconds
+                if i:
+                    edge = cell[4].setdefault(chain[i - 1], [0, 0, 0.0, 0.0])
+                    edge[0] += count
+                    edge[1] += count
+                    edge[2] += seconds if i == last else 0.0
+                    edge[3] += seconds
+        table = {
+            func: (cc, nc, tt, ct, {caller: tuple(v) for caller, v in callers.items()})
+            for func, (cc, nc, tt, ct, callers) in funcs.items()
+        }
+        buf = io.BytesIO()
+        marshal.dump(table, buf)
+        return buf.getvalue()
+
+
+class Profiler:
+    """At most one running session per process; the last one is kept."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session: Optional[ProfileSession] = None
+
+    def start(self, seconds: float, interval: float, all_threads: bool = False) -> ProfileSession:
+        with self._lock:
+            if self._session is not None and self._session.running:
+                raise ProfilerBusy(self._session.id)
+            session = ProfileSession(seconds, interval, all_threads)
+            self._session = session
+        threading.Thread(target=session.run, name='pm-profiler', daemon=True).start()
+        return session
+
+    def stop(self) -> Optional[ProfileSession]:
+        session = self._session
+        if session is not None:
+            session.stop()
+        return session
+
+    def current(self) -> Optional[ProfileSession]:
+        return self._session
+
+    def after_fork(self) -> None:
+        """A forked child has no sampler thread and serves no requests yet."""
+        self._lock = threading.Lock()
+        self._session = None
+        _requests.clear()
+
+
+_profiler = Profiler()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_profiler.after_fork)
+
+
+def get_profiler() -> Profiler:
+    return _profiler
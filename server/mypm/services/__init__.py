@@ -4,9 +4,11 @@
 from .project_service import ProjectService
 from .agent_service import AgentService
 from .deploy_service import DeployService
+from .action_service import ActionService
 
 __all__ = [
     'ProjectService',
     'AgentService',
     'DeployService',
+    'ActionService',
 ]
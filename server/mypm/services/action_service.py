@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""Semantic agent actions (/api/agent/actions) executor."""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import uuid
+
+from ..domain.enums import PROJECT_STATUSES, PROJECT_PRIORITIES
+from ..domain.models import Project, project_get_tags
+from ..storage import StorageContext
+
+
+def _clamp_int(v, lo: int, hi: int) -> int:
+    try:
+        iv = int(v)
+    except Exception:
+        iv = lo
+    if iv < lo:
+        return lo
+    if iv > hi:
+        return hi
+    return iv
+
+
+def _build_action_event(action_id: str, *, project_id: str, run_id: Optional[str], agent_id: Optional[str],
+                        typ: str, level: str, title: str, message: str, data: Dict) -> Dict:
+    now = datetime.now().isoformat()
+    return {
+        'id': action_id,
+        'ts': now,
+        'type': typ,
+        'level': level,
+        'projectId': project_id,
+        'runId': run_id,
+        'agentId': agent_id,
+        'title': title,
+        'message': message,
+        'data': data,
+    }
+
+
+def _plan_action(action_type: str, params: Dict, project: Project,
+                 agent_id: Optional[str]) -> Tuple[Dict[str, Any], str]:
+    """Translate one semantic action into (patch, event_message).
+
+    Raises:
+        ValueError: On unknown action types or invalid params
+    """
+    patch: Dict[str, Any] = {}
+    event_message = ''
+
+    if action_type == 'set_status':
+        status = str(params.get('status') or '').strip()
+        if status not in PROJECT_STATUSES:
+            raise ValueError(f"invalid status: {status}")
+        if project.get('status') != status:
+            patch['status'] = status
+        event_message = f"set status -> {status}"
+    elif action_type == 'set_priority':
+        pr = str(params.get('priority') or '').strip()
+        if pr not in PROJECT_PRIORITIES:
+            raise ValueError(f"invalid priority: {pr}")
+        if project.get('priority') != pr:
+            patch['priority'] = pr
+        event_message = f"set priority -> {pr}"
+    elif action_type == 'set_progress':
+        nv = _clamp_int(params.get('progress'), 0, 100)
+        if int(project.get('progress') or 0) != nv:
+            patch['progress'] = nv
+        event_message = f"set progress -> {nv}%"
+    elif action_type == 'bump_progress':
+        delta = params.get('delta')
+        try:
+            d = int(delta)
+        except Exception:
+            raise ValueError('delta must be an integer')
+        cur = int(project.get('progress') or 0)
+        nv = _clamp_int(cur + d, 0, 100)
+        if cur != nv:
+            patch['progress'] = nv
+        event_message = f"bump progress {d} -> {nv}%"
+    elif action_type == 'append_note':
+        note = str(params.get('note') or '').strip()
+        if not note:
+            raise ValueError('note is required')
+        also_write = bool(params.get('alsoWriteToProjectNotes'))
+        if also_write:
+            cur_notes = str(project.get('notes') or '').rstrip()
+            prefix = datetime.now().strftime('%Y-%m-%d %H:%M')
+            who = str(agent_id or 'agent')
+            line = f"[{prefix}] ({who}) {note}"
+            patch['notes'] = (cur_notes + "\n" + line).lstrip() if cur_notes else line
+        event_message = note
+    elif action_type == 'add_tag':
+        tag = str(params.get('tag') or '').strip()
+        if not tag:
+            raise ValueError('tag is required')
+        tags = project_get_tags(project)
+        if tag not in tags:
+            tags.append(tag)
+            patch['tags'] = tags
+        event_message = f"add tag: {tag}"
+    elif action_type == 'remove_tag':
+        tag = str(params.get('tag') or '').strip()
+        if not tag:
+            raise ValueError('tag is required')
+        tags = project_get_tags(project)
+        if tag in tags:
+            tags = [t for t in tags if t != tag]
+            patch['tags'] = tags
+        event_message = f"remove tag: {tag}"
+    else:
+        raise ValueError(f"unknown action type: {action_type}")
+
+    return patch, event_message
+
+
+class ActionService:
+    """Runs a list of semantic actions in a single SQLite transaction.
+
+    Referenced projects and already-recorded action ids are loaded with one
+    query each; every action runs inside its own SAVEPOINT so a failing
+    action is rolled back without affecting the others; the transaction
+    commits once at the end.
+
+    Project changes are folded in memory: each action sees (and its audit
+    event records) the state left by the previous ones, but every touched
+    project row is written once, after the last action. All changes made
+    by one request share a single updatedAt.
+    """
+
+    def __init__(self, storage: StorageContext):
+        self.storage = storage
+        self.projects_store = storage.projects
+        self.events_store = storage.agent_events
+
+    def execute(
+        self,
+        actions: List[Any],
+        *,
+        agent_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        default_project_id: Optional[str] = None,
+    ) -> Tuple[List[Dict], bool]:
+        """Execute actions in order.
+
+        Returns:
+            (results, changed) with one result per action (status 200/400/404/409)
+        """
+        action_ids = []
+        for a in actions:
+            action_id = str(a.get('id') or '').strip() if isinstance(a, dict) else ''
+            action_ids.append(action_id or f"act-{str(uuid.uuid4())[:8]}")
+
+        results: List[Dict] = []
+        changed = False
+        now = datetime.now().isoformat()
+        dirty: Dict[str, None] = {}  # insertion-ordered set of project ids to write
+
+        with self.storage.transaction() as conn:
+            recorded = self.events_store.load_many(conn, action_ids)
+            already_recorded = set(recorded)
+
+            project_ids = set()
+            for a in actions:
+                if isinstance(a, dict):
+                    pid = a.get('projectId') or default_project_id
+                    if pid:
+                        project_ids.add(str(pid))
+            for evt in recorded.values():
+                if evt.get('projectId'):
+                    project_ids.add(str(evt['projectId']))
+            projects = self.projects_store.load_many(conn, list(project_ids))
+
+            for a, action_id in zip(actions, action_ids):
+                snapshot = dict(projects)
+                conn.execute("SAVEPOINT agent_action")
+                try:
+                    result, wrote = self._execute_one(
+                        conn, a, action_id, projects, recorded, now,
+                        agent_id=agent_id, run_id=run_id, default_project_id=default_project_id,
+                    )
+                    conn.execute("RELEASE agent_action")
+                    if wrote:
+                        dirty[result["projectId"]] = None
+                except Exception as e:
+                    conn.execute("ROLLBACK TO agent_action")
+                    conn.execute("RELEASE agent_action")
+                    projects.clear()
+                    projects.update(snapshot)
+                    result, wrote = {
+                        "success": False,
+                        "status": 400,
+                        "error": str(e),
+                        "action": a,
+                    }, False
+                results.append(result)
+                changed = changed or wrote
+
+            # One UPDATE per touched project, however many actions hit it.
+            for project_id in dirty:
+                self.projects_store.write(conn, projects[project_id])
+            if changed:
+                self.projects_store.mark_updated(conn)
+
+        # Announce only after the commit above.
+        for project_id in dirty:
+            self.projects_store.publish("project.updated", projects[project_id])
+        self.events_store.publish(
+            [evt for eid, evt in recorded.items() if eid not in already_recorded]
+        )
+        return results, changed
+
+    def _execute_one(
+        self,
+        conn,
+        a: Any,
+        action_id: str,
+        projects: Dict[str, Project],
+        recorded: Dict[str, Dict],
+        now: str,
+        *,
+        agent_id: Optional[str],
+        run_id: Optional[str],
+        default_project_id: Optional[str],
+    ) -> Tuple[Dict, bool]:
+        if not isinstance(a, dict):
+            raise ValueError('action must be an object')
+
+        existing = recorded.get(action_id)
+        if existing:
+            pid = existing.get('projectId') or (a.get('projectId') or default_project_id)
+            return {
+                "id": action_id,
+                "success": True,
+                "status": 200,
+                "projectId": pid,
+                "event": existing,
+                "project": projects.get(str(pid)) if pid else None,
+                "message": "action exists",
+            }, False
+
+        project_id = a.get('projectId') or default_project_id
+        if not project_id or not isinstance(project_id, str):
+            raise ValueError('projectId is required')
+
+        project = projects.get(project_id)
+        if project is None:
+            return {
+                "id": action_id,
+                "success": False,
+                "status": 404,
+                "projectId": project_id,
+                "error": f"项目未找到: {project_id}",
+            }, False
+
+        if_updated_at = a.get('ifUpdatedAt')
+        if if_updated_at and str(project.get('updatedAt') or '') != str(if_updated_at):
+            return {
+                "id": action_id,
+                "success": False,
+                "status": 409,
+                "projectId": project_id,
+                "error": "Conflict: updatedAt mismatch",
+                "data": {
+                    "expectedUpdatedAt": if_updated_at,
+                    "actualUpdatedAt": project.get('updatedAt'),
+                }
+            }, False
+
+        action_type = str(a.get('type') or '').strip()
+        params = a.get('params') if isinstance(a.get('params'), dict) else {}
+        record_only = bool(a.get('recordOnly'))
+
+        before = {
+            "status": project.get('status'),
+            "priority": project.get('priority'),
+            "progress": project.get('progress'),
+            "tags": project_get_tags(project),
+        }
+        patch, event_message = _plan_action(action_type, params, project, agent_id)
+        after = {
+            "status": patch.get('status', project.get('status')),
+            "priority": patch.get('priority', project.get('priority')),
+            "progress": patch.get('progress', project.get('progress')),
+            "tags": patch.get('tags', project_get_tags(project)),
+        }
+
+        wrote = (not record_only) and bool(patch)
+        if wrote:
+            project = self.projects_store.merge_patch(project, patch, now=now)
+            projects[project_id] = project
+
+        evt = _build_action_event(
+            action_id,
+            project_id=project_id,
+            run_id=run_id,
+            agent_id=agent_id,
+            typ=f"action.{action_type}",
+            level='info',
+            title=action_type,
+            message=event_message,
+            data={
+                "action": {
+                    "type": action_type,
+                    "params": params,
+                    "recordOnly": record_only,
+                    "ifUpdatedAt": if_updated_at,
+                },
+                "before": before,
+                "after": after,
+                "projectUpdatedAt": project.get('updatedAt'),
+            }
+        )
+        # The stored (normalized) event: what a repeat of this id returns.
+        evt = self.events_store.insert(conn, evt)
+        recorded[action_id] = evt
+
+        return {
+            "id": action_id,
+            "success": True,
+            "status": 200,
+            "projectId": project_id,
+            "changed": wrote,
+            "project": project,
+            "event": evt,
+        }, wrote
@@ -6,7 +6,7 @@ from typing import Dict, List, Optional, Tuple
 import uuid
 
 from ..domain.models import AgentRun
-from ..domain.errors import AgentRunNotFoundError
+from ..domain.errors import AgentRunNotFoundError, ValidationError
 from ..storage import AgentRunsStore
 
 
@@ -30,20 +30,30 @@ class AgentService:
         agent_id: Optional[str] = None,
         status: Optional[str] = None,
         limit: int = 50,
-        offset: int = 0
-    ) -> Tuple[List[AgentRun], int]:
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+    ) -> Tuple[List[AgentRun], Optional[int], Optional[str]]:
         """List agent runs with filtering and pagination.
         
         Returns:
-            (runs, total_count)
+            (runs, total_count or None, next_cursor or None)
+
+        Raises:
+            ValidationError: If the cursor is malformed
         """
-        return self.store.list(
-            project_id=project_id,
-            agent_id=agent_id,
-            status=status,
-            limit=limit,
-            offset=offset,
-        )
+        try:
+            return self.store.list(
+                project_id=project_id,
+                agent_id=agent_id,
+                status=status,
+                limit=limit,
+                offset=offset,
+                cursor=cursor,
+                include_total=include_total,
+            )
+        except ValueError as e:
+            raise ValidationError(str(e))
     
     def get_run(self, run_id: str) -> AgentRun:
         """Get single run by ID.
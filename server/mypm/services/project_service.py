@@ -20,14 +20,30 @@ class ProjectService:
         self,
         status: Optional[str] = None,
         priority: Optional[str] = None,
-        category: Optional[str] = None
+        category: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
     ) -> Tuple[List[Project], Dict]:
-        """Get all projects with optional filtering.
+        """Get projects with optional filtering, projection and pagination.
         
         Returns:
-            (projects, metadata)
+            (projects, metadata); metadata has nextCursor when limit is given
+
+        Raises:
+            ValidationError: If a field name or the cursor is malformed
         """
-        return self.store.list(status=status, priority=priority, category=category)
+        try:
+            return self.store.list(
+                status=status,
+                priority=priority,
+                category=category,
+                fields=fields,
+                limit=limit,
+                cursor=cursor,
+            )
+        except ValueError as e:
+            raise ValidationError(str(e))
     
     def get_project(self, project_id: str) -> Project:
         """Get single project by ID.
@@ -6,6 +6,7 @@ from .locks import file_lock
 from .common import read_last_lines
 
 # Default runtime storage: SQLite
+from .context import StorageContext
 from .sqlite_store import (
     ProjectsStore,
     AgentRunsStore,
@@ -18,6 +19,7 @@ from .sqlite_store import (
 __all__ = [
     'write_json_atomic',
     'file_lock',
+    'StorageContext',
     'ProjectsStore',
     'AgentRunsStore',
     'AgentEventsStore',
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Version-keyed read cache for decoded projects.
+
+Every entry is stored with the `projects.lastUpdated` value it was read
+under. A lookup passes the current value (one primary-key read of the
+meta table) and only hits when both match. Writes from the CLI, a
+restore or another server process bump that value too, so they are
+noticed without any explicit invalidation. The store's own write paths
+clear the cache after commit as well, which frees memory right away.
+
+Bounded LRU; `max_entries=0` means "no cache" (StorageContext then does
+not create one at all).
+"""
+
+from __future__ import annotations
+
+import collections
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class VersionedCache:
+    """Thread-safe LRU of (version, value) pairs with hit/miss counters."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries: 'collections.OrderedDict[Hashable, Tuple[str, Any]]' = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable, version: Optional[str]) -> Optional[Any]:
+        """Cached value for `key` if it was stored under `version`, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == (version or ''):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def put(self, key: Hashable, version: Optional[str], value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (version or '', value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""In-process change broker behind GET /api/stream (Server-Sent Events).
+
+Stores publish one change per committed write (never inside the
+transaction, so subscribers cannot see a write that later rolls back). The
+broker hands it to every subscriber whose filters match. Publishing never
+blocks: each subscriber has a bounded queue, and a subscriber that falls
+too far behind is dropped and told to resync.
+
+Change ids look like `<boot>-<n>`: `boot` changes every time the process
+starts and `n` counts up. The last `buffer_size` changes are kept, so a
+client that reconnects with Last-Event-ID gets the changes it missed. If
+those changes are gone (other boot, or the buffer has already moved past
+them), the client gets a single `resync` instead and reloads over REST.
+
+The broker only sees writes made by its own process. With several server
+processes each one has its own broker (see the deployment notes).
+"""
+
+from __future__ import annotations
+
+import collections
+import queue
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+
+class BrokerFull(RuntimeError):
+    """Raised by subscribe() when max_subscribers streams are already open."""
+
+
+def _type_matches(patterns: List[str], typ: str) -> bool:
+    for p in patterns:
+        if p == typ or (p.endswith('*') and typ.startswith(p[:-1])):
+            return True
+    return False
+
+
+class Subscription:
+    """One open stream: a bounded queue plus the filters it was opened with."""
+
+    def __init__(self, broker: 'ChangeBroker', *, project_id: Optional[str], run_id: Optional[str],
+                 types: Iterable[str], queue_size: int):
+        self._broker = broker
+        self.project_id = project_id or None
+        self.run_id = run_id or None
+        self.types = [t for t in (str(t).strip() for t in types or []) if t]
+        self.queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=queue_size)
+        # Set when the subscriber missed changes and must reload state over REST.
+        self.resync = False
+        self.closed = False
+
+    def matches(self, change: Dict[str, Any]) -> bool:
+        if self.project_id and change.get('projectId') != self.project_id:
+            return False
+        if self.run_id and change.get('runId') != self.run_id:
+            return False
+        if self.types and not _type_matches(self.types, str(change.get('type') or '')):
+            return False
+        return True
+
+    def offer(self, change: Dict[str, Any]) -> bool:
+        """Queue a change without blocking; False when the queue is full."""
+        try:
+            self.queue.put_nowait(change)
+            return True
+        except queue.Full:
+            return False
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next change, or None after `timeout` seconds (or once dropped)."""
+        if self.closed:
+            return None
+        try:
+            return self.queue.get(timeout=max(0.0, timeout))
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self._broker.unsubscribe(self)
+
+
+class ChangeBroker:
+    """Fan-out of committed store writes to open SSE subscribers."""
+
+    def __init__(self, *, buffer_size: int = 1000, max_subscribers: int = 32, queue_size: int = 256):
+        self.boot = uuid.uuid4().hex[:8]
+        self.max_subscribers = max(1, int(max_subscribers))
+        self.queue_size = max(1, int(queue_size))
+        self._lock = threading.Lock()
+        self._n = 0
+        self._buffer: Deque[Dict[str, Any]] = collections.deque(maxlen=max(1, int(buffer_size)))
+        self._subs: Set[Subscription] = set()
+        self._published = 0
+        self._dropped = 0
+
+    def publish(
+        self,
+        typ: str,
+        *,
+        project_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        data: Any = None,
+    ) -> Dict[str, Any]:
+        """Record one committed change and hand it to matching subscribers."""
+        with self._lock:
+            self._n += 1
+            change = {
+                'id': f"{self.boot}-{self._n}",
+                'type': typ,
+                'ts': datetime.now().isoformat(),
+                'projectId': project_id,
+                'runId': run_id,
+                'data': data,
+            }
+            self._buffer.append(change)
+            self._published += 1
+            for sub in list(self._subs):
+                if sub.matches(change) and not sub.offer(change):
+                    self._drop(sub)
+        return change
+
+    def _drop(self, sub: Subscription) -> None:
+        # Caller holds the lock. The stream notices `resync` on its next get().
+        sub.resync = True
+        sub.closed = True
+        self._subs.discard(sub)
+        self._dropped += 1
+
+    def subscribe(
+        self,
+        *,
+        project_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        types: Iterable[str] = (),
+        last_event_id: Optional[str] = None,
+    ) -> Subscription:
+        """Open a subscription, pre-filled with the changes after `last_event_id`.
+
+        Raises:
+            BrokerFull: If max_subscribers streams are already open
+        """
+        sub = Subscription(self, project_id=project_id, run_id=run_id, types=types,
+                           queue_size=self.queue_size)
+        with self._lock:
+            if len(self._subs) >= self.max_subscribers:
+                raise BrokerFull(f"too many open streams (max {self.max_subscribers})")
+            if last_event_id:
+                missed = self._since(last_event_id)
+                if missed is None:
+                    sub.resync = True
+                else:
+                    for change in missed:
+                        if sub.matches(change) and not sub.offer(change):
+                            sub.resync = True
+                            break
+            if sub.resync:
+                # Whatever was queued is moot; the client reloads everything.
+                sub.queue = queue.Queue(maxsize=self.queue_size)
+            self._subs.add(sub)
+        return sub
+
+    def _since(self, last_event_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Buffered changes after `last_event_id`; None if they are not all still buffered."""
+        boot, _, n = str(last_event_id).partition('-')
+        try:
+            n_int = int(n)
+        except ValueError:
+            return None
+        if boot != self.boot or n_int > self._n:
+            return None
+        oldest = self._n - len(self._buffer) + 1
+        if n_int + 1 < oldest:
+            return None
+        return [c for c in self._buffer if int(c['id'].rsplit('-', 1)[1]) > n_int]
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            sub.closed = True
+            self._subs.discard(sub)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'subscribers': len(self._subs),
+                'published': self._published,
+                'dropped': self._dropped,
+                'buffered': len(self._buffer),
+            }
+
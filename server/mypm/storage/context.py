@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Storage bootstrap: one DB file, one connection pool, migrations run once.
+
+The app builds a single StorageContext at start-up and hands it to every
+store. CLI tools and tests can pass lazy=True so nothing is opened (and no
+migration runs) until a store actually touches the database.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Union
+
+from ..metrics import SQLITE_LOCK_WAIT, get_registry
+from .cache import VersionedCache
+from .changes import ChangeBroker
+from .sqlite_db import ConnectionPool, get_pool, migrate
+
+
+class StorageContext:
+    """Shared storage state for all stores backed by one SQLite file."""
+
+    def __init__(self, db_path: str, *, pool_size: int = 8, lazy: bool = False,
+                 changes: Optional[ChangeBroker] = None, project_cache_size: int = 256):
+        self.db_path = db_path
+        # Shared by every context on this file; grows to the largest pool_size asked for.
+        self.pool: ConnectionPool = get_pool(db_path, max_size=pool_size)
+        # Decoded ProjectsStore.list/get results; None disables caching.
+        self.project_cache: Optional[VersionedCache] = (
+            VersionedCache(project_cache_size) if project_cache_size > 0 else None
+        )
+        # Stores publish committed writes here (GET /api/stream).
+        self.changes = changes or ChangeBroker()
+        self._migrated = False
+        self._lock = threading.Lock()
+        self._stores: Dict[str, Any] = {}
+        if not lazy:
+            self.migrate()
+
+    @property
+    def migrated(self) -> bool:
+        return self._migrated
+
+    def migrate(self) -> None:
+        """Apply schema migrations (idempotent, once per context)."""
+        if self._migrated:
+            return
+        with self._lock:
+            if self._migrated:
+                return
+            with self.pool.connection() as conn:
+                migrate(conn)
+            self._migrated = True
+
+    def acquire(self) -> sqlite3.Connection:
+        if not self._migrated:
+            self.migrate()
+        return self.pool.acquire()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        self.pool.release(conn)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """One write transaction (BEGIN IMMEDIATE ... COMMIT) on a pooled connection.
+
+        Callers may nest SAVEPOINTs inside it; rolls back on exception.
+        """
+        conn = self.acquire()
+        try:
+            t0 = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            get_registry().observe(SQLITE_LOCK_WAIT, (), time.perf_counter() - t0)
+            with conn:
+                yield conn
+        finally:
+            self.release(conn)
+
+    @contextlib.contextmanager
+    def snapshot(self) -> Iterator[sqlite3.Connection]:
+        """One read transaction on a pooled connection.
+
+        Every SELECT inside sees the same WAL snapshot, so e.g. a page and
+        its COUNT(1) agree even while writers commit.
+        """
+        conn = self.acquire()
+        try:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.execute("COMMIT")
+        finally:
+            self.release(conn)
+
+    def reset(self) -> None:
+        """Drop pooled connections and re-check migrations on next use.
+
+        Call after the DB file was replaced underneath us (restore).
+        """
+        with self._lock:
+            self._migrated = False
+        if self.project_cache is not None:
+            self.project_cache.clear()
+        self.pool.reset()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def _store(self, name: str, cls) -> Any:
+        store = self._stores.get(name)
+        if store is None:
+            store = self._stores.setdefault(name, cls(self))
+        return store
+
+    # Stores are created on first access and cached per context.
+
+    @property
+    def projects(self):
+        from .sqlite_store import ProjectsStore
+        return self._store('projects', ProjectsStore)
+
+    @property
+    def agent_runs(self):
+        from .sqlite_store import AgentRunsStore
+        return self._store('agent_runs', AgentRunsStore)
+
+    @property
+    def agent_events(self):
+        from .sqlite_store import AgentEventsStore
+        return self._store('agent_events', AgentEventsStore)
+
+    @property
+    def agent_profiles(self):
+        from .sqlite_store import AgentProfilesStore
+        return self._store('agent_profiles', AgentProfilesStore)
+
+    @property
+    def agent_capabilities(self):
+        from .sqlite_store import AgentCapabilitiesStore
+        return self._store('agent_capabilities', AgentCapabilitiesStore)
+
+    @property
+    def token_usage(self):
+        from .sqlite_store import TokenUsageStore
+        return self._store('token_usage', TokenUsageStore)
+
+
+def as_storage(storage: Union[StorageContext, str]) -> StorageContext:
+    """Accept a StorageContext or a bare DB path (legacy store constructors)."""
+    if isinstance(storage, StorageContext):
+        return storage
+    return StorageContext(str(storage))
@@ -6,14 +6,22 @@ Design goals:
 - Single-file deployment (data/pm.db)
 - Stronger concurrency than JSON (WAL + busy_timeout)
 - Zero new dependencies (stdlib sqlite3)
+- Connections are pooled and reused; PRAGMAs run once per connection
 """
 
 from __future__ import annotations
 
+import atexit
+import contextlib
 import json
 import os
 import sqlite3
-from typing import Callable, List
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from .sqltrace import SqlTracer
 
 
 MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = []
@@ -24,11 +32,45 @@ def migration(fn: Callable[[sqlite3.Connection], None]) -> Callable[[sqlite3.Con
     return fn
 
 
-def connect(db_path: str) -> sqlite3.Connection:
+# Opt-in statement tracing (storage.sqltrace); None = plain connections.
+_TRACER: Optional["SqlTracer"] = None
+
+
+def set_tracer(tracer: Optional["SqlTracer"]) -> None:
+    """Install (or remove, with None) the process-wide SQL tracer.
+
+    Pooled connections are retired, so every connection opened from now
+    on matches the new setting.
+    """
+    global _TRACER
+    if tracer is _TRACER:
+        return
+    old, _TRACER = _TRACER, tracer
+    reset_pools()
+    if old is not None:
+        old.close()
+
+
+def get_tracer() -> Optional["SqlTracer"]:
+    return _TRACER
+
+
+def connect(
+    db_path: str,
+    *,
+    check_same_thread: bool = True,
+    factory: type = sqlite3.Connection,
+) -> sqlite3.Connection:
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
+    tracer = _TRACER
+    if tracer is not None:
+        factory = tracer.connection_class(factory)
+
     # timeout is in seconds (float). This controls how long sqlite3 waits on database locks.
-    conn = sqlite3.connect(db_path, timeout=5.0)
+    conn = sqlite3.connect(
+        db_path, timeout=5.0, check_same_thread=check_same_thread, factory=factory
+    )
     conn.row_factory = sqlite3.Row
 
     # Pragmas: applied per-connection.
@@ -40,6 +82,238 @@ def connect(db_path: str) -> sqlite3.Connection:
     return conn
 
 
+class PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection carrying pool bookkeeping."""
+
+    generation: int = 0
+    last_used: float = 0.0
+
+
+class ConnectionPool:
+    """Bounded, thread-aware pool of SQLite connections for one database file.
+
+    - Connections are opened lazily (PRAGMAs applied once, in connect()).
+    - A thread that already holds a connection gets the same one back on a
+      nested acquire(), so store methods may call each other without
+      deadlocking on a small pool. Nested `with conn:` blocks still commit
+      on exit, so do not nest write transactions.
+    - Idle connections are health-checked (SELECT 1) before reuse when they
+      have been idle for longer than `health_check_after` seconds.
+    - reset() retires every connection (used after the DB file is replaced
+      by a restore); close() shuts the pool down.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        max_size: int = 8,
+        timeout: float = 5.0,
+        health_check_after: float = 30.0,
+    ):
+        self.db_path = db_path
+        self.max_size = max(1, int(max_size))
+        self.timeout = float(timeout)
+        self.health_check_after = float(health_check_after)
+
+        self._lock = threading.Lock()
+        # Plain Semaphore: grow() adds slots after construction.
+        self._slots = threading.Semaphore(self.max_size)
+        self._idle: List[PooledConnection] = []
+        self._local = threading.local()
+        self._generation = 0
+        self._closed = False
+        self.stats: Dict[str, float] = {
+            "opened": 0,
+            "reused": 0,
+            "discarded": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+        }
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _open(self) -> PooledConnection:
+        conn = connect(self.db_path, check_same_thread=False, factory=PooledConnection)
+        conn.generation = self._generation
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self.stats["opened"] += 1
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self.stats["discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        if time.monotonic() - conn.last_used < self.health_check_after:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _checkout(self) -> PooledConnection:
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                stale = conn is not None and conn.generation != self._generation
+            if conn is None:
+                return self._open()
+            if not stale and self._healthy(conn):
+                with self._lock:
+                    self.stats["reused"] += 1
+                return conn
+            self._discard(conn)
+
+    def acquire(self) -> sqlite3.Connection:
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        if self._closed:
+            raise sqlite3.OperationalError("connection pool is closed")
+        if not self._slots.acquire(blocking=False):
+            t0 = time.monotonic()
+            got = self._slots.acquire(timeout=self.timeout)
+            with self._lock:
+                self.stats["waits"] += 1
+                self.stats["wait_seconds"] += time.monotonic() - t0
+            if not got:
+                raise sqlite3.OperationalError(
+                    f"connection pool exhausted (max_size={self.max_size})"
+                )
+        try:
+            conn = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if getattr(self._local, "conn", None) is conn:
+            self._local.depth -= 1
+            if self._local.depth > 0:
+                return
+            self._local.conn = None
+
+        try:
+            # Never hand out a connection with a dangling transaction.
+            if conn.in_transaction:
+                conn.rollback()
+            ok = True
+        except sqlite3.Error:
+            ok = False
+
+        try:
+            with self._lock:
+                keep = ok and not self._closed and conn.generation == self._generation
+                if keep:
+                    conn.last_used = time.monotonic()
+                    self._idle.append(conn)
+            if not keep:
+                self._discard(conn)
+        finally:
+            self._slots.release()
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def grow(self, max_size: int) -> None:
+        """Raise max_size to at least `max_size`; a pool never shrinks."""
+        with self._lock:
+            extra = int(max_size) - self.max_size
+            if extra <= 0:
+                return
+            self.max_size += extra
+        self._slots.release(extra)
+
+    def _drain(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def reset(self) -> None:
+        """Retire all connections; in-use ones are closed when released."""
+        with self._lock:
+            self._generation += 1
+        self._drain()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        self._drain()
+
+
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(db_path: str, *, max_size: int = 8) -> ConnectionPool:
+    """Return the process-wide pool for db_path, creating it on first use.
+
+    Every StorageContext on one file shares this pool. Its size is the
+    largest `max_size` any caller asked for: a later, larger request grows
+    it, and a smaller one leaves it as is.
+    """
+    key = os.path.abspath(db_path)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None or pool.closed:
+            pool = ConnectionPool(db_path, max_size=max_size)
+            _POOLS[key] = pool
+        else:
+            pool.grow(max_size)
+        return pool
+
+
+def close_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+def reset_pools() -> None:
+    """Retire every pooled connection in this process (pools stay usable)."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    for pool in pools:
+        pool.reset()
+
+
+def _tracer_after_fork() -> None:
+    # The tracer's lock may have been held by another thread of the parent.
+    if _TRACER is not None:
+        _TRACER.after_fork()
+
+
+atexit.register(close_pools)
+# A SQLite connection must not cross fork(). A pre-forking server that
+# loads the app in its master (gunicorn preload: migrations run there)
+# closes the master's idle connections first. Each worker then opens its own.
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=reset_pools, after_in_child=_tracer_after_fork)
+
+
 def get_user_version(conn: sqlite3.Connection) -> int:
     row = conn.execute('PRAGMA user_version;').fetchone()
     if not row:
@@ -55,9 +329,14 @@ def set_user_version(conn: sqlite3.Connection, v: int) -> None:
 
 
 def migrate(conn: sqlite3.Connection) -> None:
-    """Apply schema migrations up to latest."""
-    current = get_user_version(conn)
+    """Apply schema migrations up to latest.
+
+    Safe to run from several processes at once (PM_PRELOAD=0 with several
+    workers): the version is read again once the write lock is held, so a
+    process that waited for another one's migration finds nothing to do.
+    """
     target = len(MIGRATIONS)
+    current = get_user_version(conn)
     if current > target:
         raise RuntimeError(f"DB user_version ({current}) is newer than code migrations ({target})")
 
@@ -65,15 +344,43 @@ def migrate(conn: sqlite3.Connection) -> None:
         return
 
     # Apply migrations sequentially; each migration bumps user_version by 1.
-    with conn:
+    # One explicit transaction: the sqlite3 module does not open one for DDL,
+    # so a failed step would otherwise leave half a schema change committed.
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        current = get_user_version(conn)
+        if current > target:
+            raise RuntimeError(f"DB user_version ({current}) is newer than code migrations ({target})")
         for idx in range(current, target):
             MIGRATIONS[idx](conn)
             set_user_version(conn, idx + 1)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _execute_script(conn: sqlite3.Connection, script: str) -> None:
+    """Run `script` statement by statement inside the caller's transaction.
+
+    conn.executescript() commits any pending transaction first and then
+    autocommits each statement, so migrations must not use it. Statements
+    are split at the line where they end.
+    """
+    stmt = ''
+    for line in script.splitlines(keepends=True):
+        stmt += line
+        if sqlite3.complete_statement(stmt):
+            conn.execute(stmt)
+            stmt = ''
+    if stmt.strip():
+        conn.execute(stmt)
 
 
 @migration
 def _v1_init(conn: sqlite3.Connection) -> None:
-    conn.executescript(
+    _execute_script(
+        conn,
         """
         CREATE TABLE IF NOT EXISTS meta (
           key TEXT PRIMARY KEY,
@@ -203,7 +510,8 @@ def _v2_add_project_budget_fields(conn: sqlite3.Connection) -> None:
 
 @migration
 def _v3_add_agentops_and_usage(conn: sqlite3.Connection) -> None:
-    conn.executescript(
+    _execute_script(
+        conn,
         """
         CREATE TABLE IF NOT EXISTS agent_profiles (
           id TEXT PRIMARY KEY,
@@ -263,7 +571,8 @@ def _v4_add_users_table(conn: sqlite3.Connection) -> None:
     from datetime import datetime, timezone
     import secrets
     
-    conn.executescript(
+    _execute_script(
+        conn,
         """
         CREATE TABLE IF NOT EXISTS users (
           id TEXT PRIMARY KEY,
@@ -297,3 +606,214 @@ def _v4_add_users_table(conn: sqlite3.Connection) -> None:
         """,
         (admin_id, "admin", password_hash, "admin", now, now)
     )
+
+
+def rebuild_token_usage_rollups(conn: sqlite3.Connection) -> None:
+    """Recompute token_usage_daily from token_usage_records (caller commits)."""
+    conn.execute('DELETE FROM token_usage_daily')
+    conn.execute(
+        """
+        INSERT INTO token_usage_daily(
+          day, project_id, agent_id, workspace, model, source,
+          records, prompt_tokens, completion_tokens, total_tokens, cost
+        )
+        SELECT substr(ts, 1, 10), COALESCE(project_id, ''), COALESCE(agent_id, ''),
+               COALESCE(workspace, ''), COALESCE(model, ''), COALESCE(source, ''),
+               COUNT(1), SUM(prompt_tokens), SUM(completion_tokens), SUM(total_tokens), SUM(cost)
+        FROM token_usage_records
+        GROUP BY 1, 2, 3, 4, 5, 6
+        """
+    )
+
+
+@migration
+def _v5_add_token_usage_rollups(conn: sqlite3.Connection) -> None:
+    """Daily token usage rollups, maintained on ingest (NULL dimensions stored as '')."""
+    _execute_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS token_usage_daily (
+          day TEXT NOT NULL,
+          project_id TEXT NOT NULL DEFAULT '',
+          agent_id TEXT NOT NULL DEFAULT '',
+          workspace TEXT NOT NULL DEFAULT '',
+          model TEXT NOT NULL DEFAULT '',
+          source TEXT NOT NULL DEFAULT '',
+          records INTEGER NOT NULL DEFAULT 0,
+          prompt_tokens INTEGER NOT NULL DEFAULT 0,
+          completion_tokens INTEGER NOT NULL DEFAULT 0,
+          total_tokens INTEGER NOT NULL DEFAULT 0,
+          cost REAL NOT NULL DEFAULT 0,
+          PRIMARY KEY (day, project_id, agent_id, workspace, model, source)
+        ) WITHOUT ROWID;
+
+        CREATE INDEX IF NOT EXISTS idx_usage_daily_project ON token_usage_daily(project_id, day);
+        CREATE INDEX IF NOT EXISTS idx_usage_daily_agent ON token_usage_daily(agent_id, day);
+        CREATE INDEX IF NOT EXISTS idx_usage_daily_workspace ON token_usage_daily(workspace, day);
+        CREATE INDEX IF NOT EXISTS idx_usage_daily_source ON token_usage_daily(source, day);
+        """
+    )
+    rebuild_token_usage_rollups(conn)
+
+
+@migration
+def _v6_add_project_cost_revenue_totals(conn: sqlite3.Connection) -> None:
+    """Promote cost.total / revenue.total to columns so /api/stats is pure SQL."""
+    conn.execute('ALTER TABLE projects ADD COLUMN cost_total REAL NOT NULL DEFAULT 0')
+    conn.execute('ALTER TABLE projects ADD COLUMN revenue_total REAL NOT NULL DEFAULT 0')
+
+    rows = conn.execute('SELECT id, payload_json FROM projects').fetchall()
+    for row in rows:
+        try:
+            payload = json.loads(row['payload_json'])
+        except Exception:
+            payload = {}
+        if not isinstance(payload, dict):
+            payload = {}
+
+        totals = []
+        for key in ('cost', 'revenue'):
+            v = payload.get(key)
+            try:
+                if isinstance(v, dict):
+                    totals.append(float(v.get('total') or 0))
+                elif isinstance(v, (int, float)):
+                    totals.append(float(v))
+                else:
+                    totals.append(0.0)
+            except Exception:
+                totals.append(0.0)
+
+        conn.execute(
+            'UPDATE projects SET cost_total=?, revenue_total=? WHERE id=?',
+            (totals[0], totals[1], row['id'])
+        )
+
+
+@migration
+def _v7_add_runs_keyset_index(conn: sqlite3.Connection) -> None:
+    """(created_at, id) index for keyset pagination of agent runs."""
+    _execute_script(
+        conn,
+        """
+        CREATE INDEX IF NOT EXISTS idx_runs_created_at_id ON agent_runs(created_at, id);
+        DROP INDEX IF EXISTS idx_runs_created_at;
+        """
+    )
+
+
+@migration
+def _v8_add_event_seq(conn: sqlite3.Connection) -> None:
+    """Give agent_events a monotonic `seq` (INTEGER PRIMARY KEY AUTOINCREMENT).
+
+    Rebuilds the table: a rowid alias keeps seq stable across VACUUM, and
+    AUTOINCREMENT never hands out a seq twice. Existing events are numbered
+    in (ts, insertion) order. The old `id TEXT PRIMARY KEY` allowed NULL;
+    such rows get `legacy-<rowid>` so the NOT NULL copy does not fail.
+    """
+    _execute_script(
+        conn,
+        """
+        DROP TABLE IF EXISTS agent_events_v8;
+
+        CREATE TABLE agent_events_v8 (
+          seq INTEGER PRIMARY KEY AUTOINCREMENT,
+          id TEXT NOT NULL UNIQUE,
+          ts TEXT,
+          type TEXT,
+          level TEXT,
+          project_id TEXT,
+          run_id TEXT,
+          agent_id TEXT,
+          title TEXT,
+          message TEXT,
+          payload_json TEXT NOT NULL
+        );
+
+        INSERT INTO agent_events_v8(id, ts, type, level, project_id, run_id, agent_id, title, message, payload_json)
+        SELECT COALESCE(id, 'legacy-' || rowid), ts, type, level, project_id, run_id, agent_id, title, message,
+               CASE WHEN id IS NULL AND json_valid(payload_json)
+                    THEN json_set(payload_json, '$.id', 'legacy-' || rowid) ELSE payload_json END
+        FROM agent_events ORDER BY ts, rowid;
+
+        DROP TABLE agent_events;
+        ALTER TABLE agent_events_v8 RENAME TO agent_events;
+
+        CREATE INDEX IF NOT EXISTS idx_events_ts ON agent_events(ts);
+        CREATE INDEX IF NOT EXISTS idx_events_project_id ON agent_events(project_id);
+        CREATE INDEX IF NOT EXISTS idx_events_run_id ON agent_events(run_id);
+        CREATE INDEX IF NOT EXISTS idx_events_agent_id ON agent_events(agent_id);
+        CREATE INDEX IF NOT EXISTS idx_events_type ON agent_events(type);
+        """
+    )
+
+
+@migration
+def _v9_add_composite_indexes(conn: sqlite3.Connection) -> None:
+    """Composite indexes matching the store query shapes (filter column, then sort/range column).
+
+    Single-column indexes that became a prefix of a composite one are dropped.
+    The agent_events single-column indexes stay: they order by seq (rowid)
+    within a filter value, which is what `?after=` polls need.
+    See scripts/check_query_plans.py.
+    """
+    _execute_script(
+        conn,
+        """
+        CREATE INDEX IF NOT EXISTS idx_projects_sort ON projects(sort_order, created_at);
+        CREATE INDEX IF NOT EXISTS idx_projects_status_sort ON projects(status, sort_order, created_at);
+        CREATE INDEX IF NOT EXISTS idx_projects_priority_sort ON projects(priority, sort_order, created_at);
+        CREATE INDEX IF NOT EXISTS idx_projects_category_sort ON projects(category, sort_order, created_at);
+        CREATE INDEX IF NOT EXISTS idx_projects_financials ON projects(budget, cost_total, revenue_total);
+        DROP INDEX IF EXISTS idx_projects_sort_order;
+        DROP INDEX IF EXISTS idx_projects_status;
+        DROP INDEX IF EXISTS idx_projects_priority;
+        DROP INDEX IF EXISTS idx_projects_category;
+
+        CREATE INDEX IF NOT EXISTS idx_runs_project_created ON agent_runs(project_id, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_runs_agent_created ON agent_runs(agent_id, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_runs_status_created ON agent_runs(status, created_at, id);
+        DROP INDEX IF EXISTS idx_runs_project_id;
+        DROP INDEX IF EXISTS idx_runs_agent_id;
+        DROP INDEX IF EXISTS idx_runs_status;
+
+        CREATE INDEX IF NOT EXISTS idx_events_project_ts ON agent_events(project_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_events_run_ts ON agent_events(run_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_events_agent_ts ON agent_events(agent_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_events_type_ts ON agent_events(type, ts);
+
+        CREATE INDEX IF NOT EXISTS idx_usage_project_ts ON token_usage_records(project_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_usage_agent_ts ON token_usage_records(agent_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_usage_workspace_ts ON token_usage_records(workspace, ts);
+        CREATE INDEX IF NOT EXISTS idx_usage_source_ts ON token_usage_records(source, ts);
+        DROP INDEX IF EXISTS idx_usage_project;
+        DROP INDEX IF EXISTS idx_usage_agent;
+        DROP INDEX IF EXISTS idx_usage_workspace;
+        DROP INDEX IF EXISTS idx_usage_source;
+
+        CREATE INDEX IF NOT EXISTS idx_agent_profiles_enabled_updated ON agent_profiles(enabled, updated_at);
+        CREATE INDEX IF NOT EXISTS idx_agent_capabilities_enabled_updated ON agent_capabilities(enabled, updated_at);
+        """
+    )
+
+
+@migration
+def _v10_project_sort_indexes_with_id(conn: sqlite3.Connection) -> None:
+    """Append `id` to the project sort indexes.
+
+    GET /api/projects?cursor= seeks on (sort_order, created_at, id); with the
+    id in the index the page comes straight off it, tie-break included.
+    """
+    _execute_script(
+        conn,
+        """
+        DROP INDEX IF EXISTS idx_projects_sort;
+        DROP INDEX IF EXISTS idx_projects_status_sort;
+        DROP INDEX IF EXISTS idx_projects_priority_sort;
+        DROP INDEX IF EXISTS idx_projects_category_sort;
+        CREATE INDEX IF NOT EXISTS idx_projects_sort ON projects(sort_order, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_projects_status_sort ON projects(status, sort_order, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_projects_priority_sort ON projects(priority, sort_order, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_projects_category_sort ON projects(category, sort_order, created_at, id);
+        """
+    )
@@ -8,9 +8,11 @@ We also store a handful of indexed columns for fast filtering/sorting.
 
 from __future__ import annotations
 
+import base64
 import json
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from ..domain.models import (
     normalize_project,
@@ -19,6 +21,7 @@ from ..domain.models import (
     normalize_agent_profile,
     normalize_agent_capability,
     normalize_token_usage_record,
+    project_money_total,
     Project,
     AgentRun,
     AgentEvent,
@@ -26,7 +29,14 @@ from ..domain.models import (
     AgentCapability,
     TokenUsageRecord,
 )
-from .sqlite_db import connect, migrate
+from ..jsoncodec import get_codec
+from ..metrics import count_json_bytes, instrument_store
+from .context import StorageContext, as_storage
+from .sqlite_db import rebuild_token_usage_rollups
+
+
+# Max ids per "IN (...)" list; stays well under SQLITE_MAX_VARIABLE_NUMBER.
+_SQL_IN_CHUNK = 500
 
 
 def _now() -> str:
@@ -34,11 +44,213 @@ def _now() -> str:
 
 
 def _json_dumps(obj: Any) -> str:
-    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=False)
+    s = get_codec().dumps(obj)
+    count_json_bytes('store', s)
+    return s
 
 
 def _json_loads(s: str) -> Any:
-    return json.loads(s)
+    return get_codec().loads(s)
+
+
+def _select_in(conn, sql: str, ids: List[str]) -> List[Any]:
+    """Run `sql` (with one "{marks}" placeholder) over ids, chunked."""
+    rows: List[Any] = []
+    for i in range(0, len(ids), _SQL_IN_CHUNK):
+        chunk = ids[i : i + _SQL_IN_CHUNK]
+        rows.extend(
+            conn.execute(sql.format(marks=",".join("?" * len(chunk))), tuple(chunk)).fetchall()
+        )
+    return rows
+
+
+def _shift_day(day: str, delta: int) -> Optional[str]:
+    try:
+        return (date.fromisoformat(day) + timedelta(days=delta)).isoformat()
+    except Exception:
+        return None
+
+
+def _usage_window(
+    since: Optional[str], until: Optional[str]
+) -> Tuple[Optional[Tuple[Optional[str], Optional[str]]], List[Tuple[str, List[Any]]]]:
+    """Split a [since, until] ts filter into whole days and partial edge ranges.
+
+    Returns (days, raw_ranges): `days` is an inclusive (first, last) day range
+    to read from rollups (None = no whole days), `raw_ranges` are extra
+    (sql, args) ts conditions to aggregate from raw records. Comparison is
+    the same string comparison the raw `ts>=?`/`ts<=?` filters use.
+    """
+    lo_day: Optional[str] = None
+    hi_day: Optional[str] = None
+    edges: List[Tuple[str, List[Any]]] = []
+
+    bounds: List[str] = []
+    bound_args: List[Any] = []
+    if since:
+        bounds.append("ts>=?")
+        bound_args.append(since)
+    if until:
+        bounds.append("ts<=?")
+        bound_args.append(until)
+
+    if since:
+        first = since[:10]
+        if len(since) <= 10:
+            lo_day = first  # "YYYY-MM-DD" covers the whole day
+        else:
+            lo_day = _shift_day(first, 1)
+            if lo_day is None:
+                return None, [(" AND ".join(bounds), bound_args)]
+            edges.append((" AND ".join(bounds + ["ts<?"]), bound_args + [lo_day]))
+    if until:
+        last = until[:10]
+        hi_day = _shift_day(last, -1)
+        if hi_day is None:
+            return None, [(" AND ".join(bounds), bound_args)]
+        if not (since and len(since) > 10 and since[:10] == last):
+            edges.append((" AND ".join(bounds + ["ts>=?"]), bound_args + [last]))
+
+    if lo_day and hi_day and lo_day > hi_day:
+        return None, edges
+    return (lo_day, hi_day), edges
+
+
+def _usage_blank() -> Dict[str, Any]:
+    return {
+        "records": 0,
+        "promptTokens": 0,
+        "completionTokens": 0,
+        "totalTokens": 0,
+        "cost": 0.0,
+    }
+
+
+def _usage_acc(bucket: Dict[str, Any], measures) -> None:
+    """Add (records, prompt, completion, total, cost) to a _usage_blank() dict."""
+    bucket["records"] += int(measures[0] or 0)
+    bucket["promptTokens"] += int(measures[1] or 0)
+    bucket["completionTokens"] += int(measures[2] or 0)
+    bucket["totalTokens"] += int(measures[3] or 0)
+    bucket["cost"] += float(measures[4] or 0)
+
+
+def _usage_measures(bucket: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (
+        bucket["records"],
+        bucket["promptTokens"],
+        bucket["completionTokens"],
+        bucket["totalTokens"],
+        bucket["cost"],
+    )
+
+
+# granularity -> bucket key template for TokenUsageStore._group_usage.
+# Keys: "YYYY-MM-DDTHH", "YYYY-MM-DD", Monday "YYYY-MM-DD", "YYYY-MM".
+_USAGE_GRANULARITIES = {
+    "hour": "substr({ts}, 1, 13)",
+    "day": "{day}",
+    "week": "date({day}, '-6 days', 'weekday 1')",
+    "month": "substr({day}, 1, 7)",
+}
+
+# groupBy name -> (column, label for NULL)
+_USAGE_GROUP_BY = {
+    "projectId": ("project_id", "unassigned"),
+    "agentId": ("agent_id", "unassigned"),
+    "workspace": ("workspace", "unknown"),
+    "model": ("model", "unknown"),
+    "source": ("source", "unknown"),
+}
+
+_USAGE_SERIES_MAX_BUCKETS = 1000
+
+
+def _usage_bucket(value: str, granularity: str) -> Optional[str]:
+    """Bucket key containing an ISO date/time string (None if unparseable)."""
+    try:
+        d = date.fromisoformat(value[:10])
+        if granularity == "hour":
+            hour = int(value[11:13]) if len(value) >= 13 else 0
+            return f"{d.isoformat()}T{hour:02d}" if 0 <= hour < 24 else None
+        if granularity == "week":
+            return (d - timedelta(days=d.weekday())).isoformat()
+        if granularity == "month":
+            return d.isoformat()[:7]
+        return d.isoformat()
+    except Exception:
+        if granularity == "month" and len(value) == 7:
+            return _usage_bucket(value + "-01", "month")
+        return None
+
+
+def _usage_bucket_label(bucket: str, granularity: str) -> str:
+    return bucket + ":00" if granularity == "hour" else bucket
+
+
+def _usage_buckets(first: str, last: str, granularity: str) -> List[str]:
+    """All bucket keys from first to last inclusive."""
+    out: List[str] = []
+    if granularity == "hour":
+        cur = datetime.fromisoformat(first + ":00")
+        end = datetime.fromisoformat(last + ":00")
+        step = timedelta(hours=1)
+        fmt = "%Y-%m-%dT%H"
+    elif granularity == "month":
+        cur = datetime.fromisoformat(first + "-01")
+        end = datetime.fromisoformat(last + "-01")
+        step = None
+        fmt = "%Y-%m"
+    else:
+        cur = datetime.fromisoformat(first)
+        end = datetime.fromisoformat(last)
+        step = timedelta(days=7 if granularity == "week" else 1)
+        fmt = "%Y-%m-%d"
+    while cur <= end:
+        if len(out) >= _USAGE_SERIES_MAX_BUCKETS:
+            raise ValueError(
+                f"too many {granularity} buckets (max {_USAGE_SERIES_MAX_BUCKETS}); narrow since/until"
+            )
+        out.append(cur.strftime(fmt))
+        if step is None:
+            cur = cur.replace(year=cur.year + cur.month // 12, month=cur.month % 12 + 1)
+        else:
+            cur += step
+    return out
+
+
+def _encode_cursor(values: List[Any]) -> str:
+    """Opaque keyset cursor (urlsafe base64 of the JSON sort key)."""
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Inverse of _encode_cursor; raises ValueError on anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("invalid cursor")
+    return values
+
+
+# Project keys stored in their own (indexed) column; `fields=` projections
+# made only of these never read payload_json.
+_PROJECT_COLUMNS = {
+    "name": "name",
+    "status": "status",
+    "priority": "priority",
+    "category": "category",
+    "progress": "progress",
+    "createdAt": "created_at",
+    "updatedAt": "updated_at",
+    "budget": "budget",
+    "actualCost": "actual_cost",
+}
+_PROJECT_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
 
 
 def _meta_get(conn, key: str) -> Optional[str]:
@@ -53,17 +265,12 @@ def _meta_set(conn, key: str, value: str) -> None:
     )
 
 
+@instrument_store('projects', ('last_updated', 'list', 'get', 'create', 'patch', 'delete', 'reorder',
+                               'batch_update', 'get_statistics'))
 class ProjectsStore:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self._ensure_db()
-
-    def _ensure_db(self) -> None:
-        conn = connect(self.db_path)
-        try:
-            migrate(conn)
-        finally:
-            conn.close()
+    def __init__(self, storage: Union[StorageContext, str]):
+        self._storage = as_storage(storage)
+        self.db_path = self._storage.db_path
 
     def _insert_project(self, conn, project: Project, *, sort_order: int) -> None:
         payload = dict(project)
@@ -96,8 +303,8 @@ class ProjectsStore:
 
         conn.execute(
             (
-                "INSERT INTO projects(id, sort_order, name, status, priority, category, progress, created_at, updated_at, budget, actual_cost, payload_json) "
-                "VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                "INSERT INTO projects(id, sort_order, name, status, priority, category, progress, created_at, updated_at, budget, actual_cost, cost_total, revenue_total, payload_json) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
             ),
             (
                 str(payload.get("id")),
@@ -111,6 +318,8 @@ class ProjectsStore:
                 updated_at,
                 float(budget),
                 float(actual_cost),
+                project_money_total(payload, "cost"),
+                project_money_total(payload, "revenue"),
                 _json_dumps(payload),
             ),
         )
@@ -148,11 +357,15 @@ class ProjectsStore:
         }
 
     def last_updated(self) -> Optional[str]:
-        conn = connect(self.db_path)
+        return self._version()
+
+    def _version(self) -> Optional[str]:
+        # Untimed: list()/get() read it inside their own timed call.
+        conn = self._storage.acquire()
         try:
             return _meta_get(conn, "projects.lastUpdated")
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def list(
         self,
@@ -160,45 +373,136 @@ class ProjectsStore:
         status: Optional[str] = None,
         priority: Optional[str] = None,
         category: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
     ) -> Tuple[List[Project], Dict]:
-        conn = connect(self.db_path)
-        try:
-            where = []
-            args: List[Any] = []
-            if status:
-                where.append("status=?")
-                args.append(status)
-            if priority:
-                where.append("priority=?")
-                args.append(priority)
-            if category:
-                where.append("category=?")
-                args.append(category)
-
-            sql = "SELECT * FROM projects"
-            if where:
-                sql += " WHERE " + " AND ".join(where)
-            sql += " ORDER BY sort_order ASC, created_at ASC"
-
-            rows = conn.execute(sql, tuple(args)).fetchall()
+        """Projects in display order plus {total, lastUpdated[, nextCursor]}.
+
+        `fields` projects each project to `id` plus those keys. Keys in
+        _PROJECT_COLUMNS come from indexed columns; any other key is
+        extracted from payload_json by SQLite, so the full payload is never
+        decoded. With `limit` one page is returned, found by keyset seek on
+        (sort_order, created_at, id) from `cursor` (a previous nextCursor).
+
+        Served from the project cache while `projects.lastUpdated` is
+        unchanged. Each call returns fresh top-level dicts; nested values
+        are shared with the cache and must not be mutated in place.
+
+        Raises:
+            ValueError: If a field name or the cursor is malformed
+        """
+        if fields is not None:
+            fields = [f for f in dict.fromkeys(fields) if f != "id"]
+            bad = [f for f in fields if not _PROJECT_FIELD_RE.match(f)]
+            if bad:
+                raise ValueError(f"invalid field: {bad[0]}")
+        if cursor and limit is None:
+            raise ValueError("cursor requires limit")
+
+        cache = self._storage.project_cache
+        key = (
+            "list", status or None, priority or None, category or None,
+            tuple(fields) if fields is not None else None, limit, cursor or None,
+        )
+        if cache is not None:
+            hit = cache.get(key, self._version())
+            if hit is not None:
+                return [dict(p) for p in hit[0]], dict(hit[1])
+
+        where = []
+        args: List[Any] = []
+        if status:
+            where.append("status=?")
+            args.append(status)
+        if priority:
+            where.append("priority=?")
+            args.append(priority)
+        if category:
+            where.append("category=?")
+            args.append(category)
+
+        page_where = list(where)
+        page_args = list(args)
+        if cursor:
+            sort_order, created_at, project_id = _decode_cursor(cursor, 3)
+            page_where.append("(sort_order, created_at, id) > (?, ?, ?)")
+            page_args.extend([sort_order, created_at, project_id])
+
+        # Cursor columns first, read by position (a field may share their name).
+        cols = ["id", "sort_order", "created_at"]
+        if fields is None:
+            cols.append("*")
+        else:
+            for f in fields:
+                if f in _PROJECT_COLUMNS:
+                    cols.append(_PROJECT_COLUMNS[f])
+                else:
+                    # json_quote keeps arrays/objects as JSON text and quotes scalars.
+                    cols.append(f"json_quote(json_extract(payload_json, '$.{f}'))")
+
+        sql = f"SELECT {', '.join(cols)} FROM projects"
+        if page_where:
+            sql += " WHERE " + " AND ".join(page_where)
+        sql += " ORDER BY sort_order ASC, created_at ASC, id ASC"
+        if limit is not None:
+            # One extra row tells whether another page exists.
+            sql += " LIMIT ?"
+            page_args.append(int(limit) + 1)
+
+        with self._storage.snapshot() as conn:
+            rows = conn.execute(sql, tuple(page_args)).fetchall()
+            if limit is None:
+                total = len(rows)
+            else:
+                count_sql = "SELECT COUNT(1) FROM projects"
+                if where:
+                    count_sql += " WHERE " + " AND ".join(where)
+                total = int(conn.execute(count_sql, tuple(args)).fetchone()[0])
+            version = _meta_get(conn, "projects.lastUpdated")
+
+        meta: Dict[str, Any] = {"total": total, "lastUpdated": version}
+        if limit is not None:
+            meta["nextCursor"] = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                meta["nextCursor"] = _encode_cursor([last[1], last[2], last[0]])
+
+        if fields is None:
             projects = [self._row_to_project(r) for r in rows]
-            meta = {
-                "total": len(projects),
-                "lastUpdated": _meta_get(conn, "projects.lastUpdated"),
-            }
-            return projects, meta
-        finally:
-            conn.close()
+        else:
+            projects = [self._row_to_fields(r, fields) for r in rows]
+        if cache is not None:
+            # Tagged with the version read in the same snapshot as the rows.
+            cache.put(key, version, (projects, meta))
+        return [dict(p) for p in projects], dict(meta)
+
+    def _row_to_fields(self, row, fields: List[str]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"id": row[0]}
+        for i, f in enumerate(fields, start=3):
+            out[f] = row[i] if f in _PROJECT_COLUMNS else _json_loads(row[i])
+        return out
 
     def get(self, project_id: str) -> Optional[Project]:
-        conn = connect(self.db_path)
-        try:
+        cache = self._storage.project_cache
+        key = ("get", project_id)
+        if cache is not None:
+            hit = cache.get(key, self._version())
+            if hit is not None:
+                return dict(hit)
+
+        with self._storage.snapshot() as conn:
             row = conn.execute(
                 "SELECT * FROM projects WHERE id=?", (project_id,)
             ).fetchone()
-            return self._row_to_project(row) if row else None
-        finally:
-            conn.close()
+            version = _meta_get(conn, "projects.lastUpdated")
+        if not row:
+            return None
+        project = self._row_to_project(row)
+        if cache is not None:
+            cache.put(key, version, project)
+        return dict(project)
 
     def create(self, project_data: Dict[str, Any]) -> Project:
         np, _ = normalize_project(project_data)
@@ -206,7 +510,7 @@ class ProjectsStore:
         if not str(np.get("name") or "").strip():
             raise ValueError("Project name cannot be empty")
 
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 row = conn.execute(
@@ -215,18 +519,87 @@ class ProjectsStore:
                 max_sort = int(row["m"] if row and row["m"] is not None else -1)
                 self._insert_project(conn, np, sort_order=max_sort + 1)
                 _meta_set(conn, "projects.lastUpdated", _now())
+            self.publish("project.created", np)
             return np
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def update(self, project_id: str, updates: Dict[str, Any]) -> Project:
         # Full PUT semantics in this codebase are basically a patch excluding protected fields.
         return self.patch(project_id, updates, if_updated_at=None)
 
+    def merge_patch(
+        self, current: Project, patch: Dict[str, Any], *, now: Optional[str] = None
+    ) -> Project:
+        """Apply a PATCH to a project dict (no I/O); returns a new normalized project.
+
+        `now` pins updatedAt, so several merges folded into one write share it.
+        """
+        merged = dict(current)
+        protected = {"id", "createdAt"}
+        for k, v in (patch or {}).items():
+            if k in protected or k == "ifUpdatedAt":
+                continue
+            merged[k] = v
+
+        # Normalize to keep backward-compatible defaults.
+        merged["id"] = current.get("id")
+        merged["updatedAt"] = now or _now()
+        np, _ = normalize_project(merged)
+        return np
+
+    def write(self, conn, project: Project) -> None:
+        """UPDATE an existing project row on a caller-managed transaction."""
+        np = project
+        conn.execute(
+            (
+                "UPDATE projects SET name=?, status=?, priority=?, category=?, progress=?, updated_at=?, budget=?, actual_cost=?, cost_total=?, revenue_total=?, payload_json=? "
+                "WHERE id=?"
+            ),
+            (
+                str(np.get("name") or ""),
+                str(np.get("status") or "planning"),
+                str(np.get("priority") or "medium"),
+                str(np.get("category"))
+                if np.get("category") is not None
+                else None,
+                int(np.get("progress") or 0),
+                str(np.get("updatedAt") or _now()),
+                float(np.get("budget") or 0),
+                float(np.get("actualCost") or 0),
+                project_money_total(np, "cost"),
+                project_money_total(np, "revenue"),
+                _json_dumps(np),
+                str(np.get("id")),
+            ),
+        )
+
+    def load_many(self, conn, project_ids: List[str]) -> Dict[str, Project]:
+        """Fetch projects by id on a caller-managed connection."""
+        rows = _select_in(
+            conn,
+            "SELECT * FROM projects WHERE id IN ({marks})",
+            list({str(i) for i in project_ids if i}),
+        )
+        return {row["id"]: self._row_to_project(row) for row in rows}
+
+    def mark_updated(self, conn) -> None:
+        _meta_set(conn, "projects.lastUpdated", _now())
+
+    def publish(self, typ: str, project: Project) -> None:
+        """Post-commit hook for a project write (see _after_commit)."""
+        self._after_commit(typ, project_id=project.get("id"), data=project)
+
+    def _after_commit(self, typ: str, *, project_id: Optional[str] = None, data: Any = None) -> None:
+        # Drop cached reads, then announce the change on the stream.
+        if self._storage.project_cache is not None:
+            self._storage.project_cache.clear()
+        self._storage.changes.publish(typ, project_id=project_id, data=data)
+
     def patch(
         self, project_id: str, patch: Dict[str, Any], *, if_updated_at: Optional[str]
     ) -> Project:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 row = conn.execute(
@@ -243,55 +616,30 @@ class ProjectsStore:
                         f"updatedAt mismatch: expected={if_updated_at}, actual={current.get('updatedAt')}"
                     )
 
-                protected = {"id", "createdAt"}
-                for k, v in (patch or {}).items():
-                    if k in protected or k == "ifUpdatedAt":
-                        continue
-                    current[k] = v
-
-                # Normalize to keep backward-compatible defaults.
-                current["id"] = project_id
-                current["updatedAt"] = _now()
-                np, _ = normalize_project(current)
-
-                conn.execute(
-                    (
-                        "UPDATE projects SET name=?, status=?, priority=?, category=?, progress=?, updated_at=?, budget=?, actual_cost=?, payload_json=? "
-                        "WHERE id=?"
-                    ),
-                    (
-                        str(np.get("name") or ""),
-                        str(np.get("status") or "planning"),
-                        str(np.get("priority") or "medium"),
-                        str(np.get("category"))
-                        if np.get("category") is not None
-                        else None,
-                        int(np.get("progress") or 0),
-                        str(np.get("updatedAt") or _now()),
-                        float(np.get("budget") or 0),
-                        float(np.get("actualCost") or 0),
-                        _json_dumps(np),
-                        project_id,
-                    ),
-                )
-                _meta_set(conn, "projects.lastUpdated", _now())
-                return np
+                np = self.merge_patch(current, patch)
+                self.write(conn, np)
+                self.mark_updated(conn)
+            self.publish("project.updated", np)
+            return np
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def delete(self, project_id: str) -> None:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 cur = conn.execute("DELETE FROM projects WHERE id=?", (project_id,))
                 if cur.rowcount == 0:
                     raise KeyError("not found")
                 _meta_set(conn, "projects.lastUpdated", _now())
+            self._after_commit(
+                "project.deleted", project_id=project_id, data={"id": project_id}
+            )
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def reorder(self, ids: List[str]) -> List[Project]:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 # Map existing ids to current sort.
@@ -318,16 +666,17 @@ class ProjectsStore:
                     )
 
                 _meta_set(conn, "projects.lastUpdated", _now())
+            self._after_commit("project.reordered", data={"ids": new_order})
 
             # Return reordered list.
             return self.list()[0]
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def batch_update(
         self, ops: List[Dict[str, Any]]
     ) -> Tuple[List[Dict[str, Any]], bool]:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             results: List[Dict[str, Any]] = []
             changed = False
@@ -390,26 +739,7 @@ class ProjectsStore:
                                 cur[k] = v
                             cur["updatedAt"] = _now()
                             np, _ = normalize_project(cur)
-                            conn.execute(
-                                (
-                                    "UPDATE projects SET name=?, status=?, priority=?, category=?, progress=?, updated_at=?, budget=?, actual_cost=?, payload_json=? "
-                                    "WHERE id=?"
-                                ),
-                                (
-                                    str(np.get("name") or ""),
-                                    str(np.get("status") or "planning"),
-                                    str(np.get("priority") or "medium"),
-                                    str(np.get("category"))
-                                    if np.get("category") is not None
-                                    else None,
-                                    int(np.get("progress") or 0),
-                                    str(np.get("updatedAt") or _now()),
-                                    float(np.get("budget") or 0),
-                                    float(np.get("actualCost") or 0),
-                                    _json_dumps(np),
-                                    pid,
-                                ),
-                            )
+                            self.write(conn, np)
                             results.append(
                                 {
                                     "opId": op_id,
@@ -437,84 +767,58 @@ class ProjectsStore:
 
                 if changed:
                     _meta_set(conn, "projects.lastUpdated", _now())
+            for r in results:
+                if r.get("success"):
+                    self.publish("project.updated", r["data"])
             return results, changed
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def get_statistics(self) -> Dict[str, Any]:
-        # Keep semantics identical to ProjectService.get_statistics().
-        projects, _meta = self.list()
-        stats: Dict[str, Any] = {
-            "total": len(projects),
-            "byStatus": {},
-            "byPriority": {},
-            "byCategory": {},
-            "financial": {
-                "totalBudget": 0,
-                "totalCost": 0,
-                "totalRevenue": 0,
-                "netProfit": 0,
-            },
-        }
-
-        for p in projects:
-            if not isinstance(p, dict):
-                continue
-            st = p.get("status") or "unknown"
-            stats["byStatus"][st] = stats["byStatus"].get(st, 0) + 1
-            pr = p.get("priority") or "unknown"
-            stats["byPriority"][pr] = stats["byPriority"].get(pr, 0) + 1
-            cat = p.get("category") or "未分类"
-            stats["byCategory"][cat] = stats["byCategory"].get(cat, 0) + 1
+        """Counts by status/priority/category and financial totals.
 
-            try:
-                budget = p.get("budget")
-                if isinstance(budget, dict) and "planned" in budget:
-                    stats["financial"]["totalBudget"] += float(
-                        budget.get("planned") or 0
-                    )
-                elif isinstance(budget, (int, float)):
-                    stats["financial"]["totalBudget"] += float(budget)
-            except Exception:
-                pass
-
-            try:
-                cost = p.get("cost")
-                if isinstance(cost, dict) and "total" in cost:
-                    stats["financial"]["totalCost"] += float(cost.get("total") or 0)
-                elif isinstance(cost, (int, float)):
-                    stats["financial"]["totalCost"] += float(cost)
-            except Exception:
-                pass
+        Pure GROUP BY / SUM over indexed columns; no payload is decoded.
+        """
+        conn = self._storage.acquire()
+        try:
+            total, budget, cost, revenue = conn.execute(
+                "SELECT COUNT(1), SUM(budget), SUM(cost_total), SUM(revenue_total) FROM projects"
+            ).fetchone()
 
-            try:
-                revenue = p.get("revenue")
-                if isinstance(revenue, dict) and "total" in revenue:
-                    stats["financial"]["totalRevenue"] += float(
-                        revenue.get("total") or 0
-                    )
-                elif isinstance(revenue, (int, float)):
-                    stats["financial"]["totalRevenue"] += float(revenue)
-            except Exception:
-                pass
+            def _count_by(col: str, fallback: str) -> Dict[str, int]:
+                out: Dict[str, int] = {}
+                for key, n in conn.execute(
+                    f"SELECT {col}, COUNT(1) FROM projects GROUP BY {col}"
+                ).fetchall():
+                    k = key or fallback
+                    out[k] = out.get(k, 0) + int(n)
+                return out
+
+            by_status = _count_by("status", "unknown")
+            by_priority = _count_by("priority", "unknown")
+            by_category = _count_by("category", "未分类")
+        finally:
+            self._storage.release(conn)
 
-        stats["financial"]["netProfit"] = (
-            stats["financial"]["totalRevenue"] - stats["financial"]["totalCost"]
-        )
-        return stats
+        return {
+            "total": int(total or 0),
+            "byStatus": by_status,
+            "byPriority": by_priority,
+            "byCategory": by_category,
+            "financial": {
+                "totalBudget": budget or 0,
+                "totalCost": cost or 0,
+                "totalRevenue": revenue or 0,
+                "netProfit": (revenue or 0) - (cost or 0),
+            },
+        }
 
 
+@instrument_store('agent_runs', ('create', 'get', 'list', 'patch'))
 class AgentRunsStore:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self._ensure_db()
-
-    def _ensure_db(self) -> None:
-        conn = connect(self.db_path)
-        try:
-            migrate(conn)
-        finally:
-            conn.close()
+    def __init__(self, storage: Union[StorageContext, str]):
+        self._storage = as_storage(storage)
+        self.db_path = self._storage.db_path
 
     def _insert_run(self, conn, run: AgentRun) -> None:
         payload = dict(run)
@@ -559,9 +863,14 @@ class AgentRunsStore:
             return payload
         return {"id": row["id"]}
 
+    def _publish(self, typ: str, run: AgentRun) -> None:
+        self._storage.changes.publish(
+            typ, project_id=run.get("projectId"), run_id=run.get("id"), data=run
+        )
+
     def create(self, run_data: Dict[str, Any]) -> AgentRun:
         nr, _ = normalize_agent_run(run_data)
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 existing = conn.execute(
@@ -571,19 +880,20 @@ class AgentRunsStore:
                     return self._row_to_run(existing)
                 self._insert_run(conn, nr)
                 _meta_set(conn, "agent_runs.lastUpdated", _now())
-                return nr
+            self._publish("run.created", nr)
+            return nr
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def get(self, run_id: str) -> Optional[AgentRun]:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             row = conn.execute(
                 "SELECT * FROM agent_runs WHERE id=?", (run_id,)
             ).fetchone()
             return self._row_to_run(row) if row else None
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def list(
         self,
@@ -592,41 +902,85 @@ class AgentRunsStore:
         agent_id: Optional[str],
         status: Optional[str],
         limit: int,
-        offset: int,
-    ) -> Tuple[List[AgentRun], int]:
-        conn = connect(self.db_path)
-        try:
-            where = []
-            args: List[Any] = []
-            if project_id:
-                where.append("project_id=?")
-                args.append(project_id)
-            if agent_id:
-                where.append("agent_id=?")
-                args.append(agent_id)
-            if status:
-                where.append("status=?")
-                args.append(status)
-
-            sql_base = "FROM agent_runs"
-            if where:
-                sql_base += " WHERE " + " AND ".join(where)
-
-            total_row = conn.execute(
-                "SELECT COUNT(1) AS n " + sql_base, tuple(args)
-            ).fetchone()
-            total = int(total_row["n"] if total_row else 0)
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+    ) -> Tuple[List[AgentRun], Optional[int], Optional[str]]:
+        """Newest-first page of runs ordered by (created_at, id).
+
+        With `cursor` (a previous nextCursor) the page is found by keyset
+        seek and `offset` is ignored. Runs with a NULL created_at sort last;
+        a row-value comparison never matches them, so once the dated runs
+        run out the page continues into them by id. The optional total is
+        counted in the same read transaction as the page.
+
+        Returns:
+            (runs, total or None, nextCursor or None)
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        where = []
+        args: List[Any] = []
+        if project_id:
+            where.append("project_id=?")
+            args.append(project_id)
+        if agent_id:
+            where.append("agent_id=?")
+            args.append(agent_id)
+        if status:
+            where.append("status=?")
+            args.append(status)
+
+        sql_base = "FROM agent_runs"
+        if where:
+            sql_base += " WHERE " + " AND ".join(where)
+
+        page_where = list(where)
+        page_args = list(args)
+        created_at = None
+        if cursor:
+            created_at, run_id = _decode_cursor(cursor, 2)
+            if created_at is None:
+                page_where.append("created_at IS NULL AND id < ?")
+                page_args.append(run_id)
+            else:
+                page_where.append("(created_at, id) < (?, ?)")
+                page_args.extend([created_at, run_id])
+            offset = 0
+        page_sql = "SELECT * FROM agent_runs"
+        if page_where:
+            page_sql += " WHERE " + " AND ".join(page_where)
+        page_sql += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+
+        with self._storage.snapshot() as conn:
+            total = None
+            if include_total:
+                total_row = conn.execute(
+                    "SELECT COUNT(1) AS n " + sql_base, tuple(args)
+                ).fetchone()
+                total = int(total_row["n"] if total_row else 0)
 
+            # One extra row tells whether another page exists.
             rows = conn.execute(
-                "SELECT * " + sql_base + " ORDER BY created_at DESC LIMIT ? OFFSET ?",
-                tuple(args + [int(limit), int(offset)]),
+                page_sql, tuple(page_args + [int(limit) + 1, int(offset)])
             ).fetchall()
-            return [self._row_to_run(r) for r in rows], total
-        finally:
-            conn.close()
+            if created_at is not None and len(rows) <= limit:
+                # Two index seeks; an OR of both predicates would sort in a temp B-tree.
+                rows += conn.execute(
+                    "SELECT * FROM agent_runs WHERE " + " AND ".join(where + ["created_at IS NULL"])
+                    + " ORDER BY id DESC LIMIT ?",
+                    tuple(args + [int(limit) + 1 - len(rows)]),
+                ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor([rows[-1]["created_at"], rows[-1]["id"]])
+        return [self._row_to_run(r) for r in rows], total, next_cursor
 
     def patch(self, run_id: str, patch: Dict[str, Any]) -> AgentRun:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 row = conn.execute(
@@ -672,57 +1026,125 @@ class AgentRunsStore:
                     ),
                 )
                 _meta_set(conn, "agent_runs.lastUpdated", _now())
-                return nr
+            self._publish("run.updated", nr)
+            return nr
         finally:
-            conn.close()
+            self._storage.release(conn)
 
 
+@instrument_store('agent_events', ('append', 'append_many', 'exists', 'list'))
 class AgentEventsStore:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self._ensure_db()
+    def __init__(self, storage: Union[StorageContext, str]):
+        self._storage = as_storage(storage)
+        self.db_path = self._storage.db_path
 
-    def _ensure_db(self) -> None:
-        conn = connect(self.db_path)
-        try:
-            migrate(conn)
-        finally:
-            conn.close()
+    _INSERT_SQL = (
+        "INSERT OR IGNORE INTO agent_events(id, ts, type, level, project_id, run_id, agent_id, title, message, payload_json) "
+        "VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
 
-    def _insert_event(self, conn, evt: AgentEvent) -> None:
+    def _event_params(self, evt: AgentEvent) -> Tuple[Any, ...]:
         payload = dict(evt)
-        conn.execute(
-            (
-                "INSERT OR IGNORE INTO agent_events(id, ts, type, level, project_id, run_id, agent_id, title, message, payload_json) "
-                "VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-            ),
-            (
-                payload.get("id"),
-                payload.get("ts"),
-                payload.get("type"),
-                payload.get("level"),
-                payload.get("projectId"),
-                payload.get("runId"),
-                payload.get("agentId"),
-                payload.get("title"),
-                payload.get("message"),
-                _json_dumps(payload),
-            ),
+        return (
+            payload.get("id"),
+            payload.get("ts"),
+            payload.get("type"),
+            payload.get("level"),
+            payload.get("projectId"),
+            payload.get("runId"),
+            payload.get("agentId"),
+            payload.get("title"),
+            payload.get("message"),
+            _json_dumps(payload),
         )
 
-    def append(self, event: Dict[str, Any]) -> None:
+    def _insert_event(self, conn, evt: AgentEvent) -> None:
+        conn.execute(self._INSERT_SQL, self._event_params(evt))
+
+    def load_many(self, conn, event_ids: List[str]) -> Dict[str, AgentEvent]:
+        """Fetch events by id on a caller-managed connection."""
+        rows = _select_in(
+            conn,
+            "SELECT id, payload_json FROM agent_events WHERE id IN ({marks})",
+            list({str(i) for i in event_ids if i}),
+        )
+        out: Dict[str, AgentEvent] = {}
+        for row in rows:
+            try:
+                obj = _json_loads(row["payload_json"])
+            except Exception:
+                obj = None
+            out[row["id"]] = (
+                self.normalize_for_read(obj) if isinstance(obj, dict) else {"id": row["id"]}
+            )
+        return out
+
+    def insert(self, conn, event: Dict[str, Any]) -> AgentEvent:
+        """Append one event on a caller-managed transaction."""
         evt = normalize_agent_event(event)
-        conn = connect(self.db_path)
+        self._insert_event(conn, evt)
+        return evt
+
+    def publish(self, events: List[AgentEvent]) -> None:
+        """Announce committed events on the change stream (callers that used insert())."""
+        for evt in events:
+            self._storage.changes.publish(
+                "event.created",
+                project_id=evt.get("projectId"),
+                run_id=evt.get("runId"),
+                data=evt,
+            )
+
+    def append(self, event: Dict[str, Any]) -> None:
+        conn = self._storage.acquire()
         try:
             with conn:
-                self._insert_event(conn, evt)
+                before = conn.total_changes
+                evt = self.insert(conn, event)
+                created = conn.total_changes > before
+            if created:
+                self.publish([evt])
         finally:
-            conn.close()
+            self._storage.release(conn)
+
+    def append_many(
+        self, events: List[Dict[str, Any]]
+    ) -> List[Tuple[AgentEvent, bool]]:
+        """Append a batch of events in one transaction.
+
+        Returns (event, created) per input, in input order. An event whose id
+        already exists (in the DB or earlier in the batch) is returned as
+        stored, with created=False. The write lock is taken before the id
+        lookup, so a concurrent batch cannot insert an id in between.
+        """
+        evts = [normalize_agent_event(e) for e in events or []]
+        if not evts:
+            return []
+
+        with self._storage.transaction() as conn:
+            known = self.load_many(conn, [e.get("id") for e in evts])
+
+            results: List[Tuple[AgentEvent, bool]] = []
+            new_rows: List[Tuple[Any, ...]] = []
+            for evt in evts:
+                existing = known.get(evt.get("id"))
+                if existing is not None:
+                    results.append((existing, False))
+                    continue
+                if evt.get("id"):
+                    known[evt["id"]] = evt
+                new_rows.append(self._event_params(evt))
+                results.append((evt, True))
+
+            if new_rows:
+                conn.executemany(self._INSERT_SQL, new_rows)
+        self.publish([evt for evt, created in results if created])
+        return results
 
     def exists(self, event_id: str) -> Optional[Dict[str, Any]]:
         if not event_id:
             return None
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             row = conn.execute(
                 "SELECT payload_json FROM agent_events WHERE id=?", (event_id,)
@@ -732,7 +1154,7 @@ class AgentEventsStore:
             obj = _json_loads(row["payload_json"])
             return obj if isinstance(obj, dict) else None
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def normalize_for_read(self, obj) -> Dict[str, Any]:
         return normalize_agent_event(obj)
@@ -746,65 +1168,82 @@ class AgentEventsStore:
         typ: Optional[str],
         since_dt,
         limit: int,
-    ) -> List[Dict[str, Any]]:
+        after: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """List events; every returned event carries its `seq`.
+
+        Without `after`: the most recent `limit` events by ts, returned in
+        ascending order (legacy behaviour). With `after`: the next `limit`
+        events with seq > after, in seq order, read by a range scan on the
+        seq key (or a filter index, which also orders by seq).
+
+        Returns:
+            (events, nextAfter): pass nextAfter as `after` on the next poll
+        """
         # since_dt is a datetime or None (parsed in API layer).
         since = since_dt.isoformat() if since_dt else None
 
-        conn = connect(self.db_path)
-        try:
-            where = []
-            args: List[Any] = []
-            if project_id:
-                where.append("project_id=?")
-                args.append(project_id)
-            if run_id:
-                where.append("run_id=?")
-                args.append(run_id)
-            if agent_id:
-                where.append("agent_id=?")
-                args.append(agent_id)
-            if typ:
-                where.append("type=?")
-                args.append(typ)
-            if since:
-                where.append("ts>=?")
-                args.append(since)
-
-            sql = "SELECT payload_json FROM agent_events"
-            if where:
-                sql += " WHERE " + " AND ".join(where)
+        where = []
+        args: List[Any] = []
+        if project_id:
+            where.append("project_id=?")
+            args.append(project_id)
+        if run_id:
+            where.append("run_id=?")
+            args.append(run_id)
+        if agent_id:
+            where.append("agent_id=?")
+            args.append(agent_id)
+        if typ:
+            where.append("type=?")
+            args.append(typ)
+        if since:
+            where.append("ts>=?")
+            args.append(since)
+        if after is not None:
+            where.append("seq>?")
+            args.append(int(after))
+
+        sql = "SELECT seq, payload_json FROM agent_events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if after is not None:
+            sql += " ORDER BY seq ASC"
+        else:
             # Mimic legacy behavior: return the most recent N events, in ascending time order.
-            sql += " ORDER BY ts DESC"
-            sql += " LIMIT ?"
-            args.append(int(limit))
+            sql += " ORDER BY ts DESC, seq DESC"
+        sql += " LIMIT ?"
+        args.append(int(limit))
 
+        with self._storage.snapshot() as conn:
             rows = conn.execute(sql, tuple(args)).fetchall()
-            out: List[Dict[str, Any]] = []
-            for r in rows:
-                try:
-                    obj = _json_loads(r["payload_json"])
-                except Exception:
-                    continue
-                if not isinstance(obj, dict):
-                    continue
-                out.append(self.normalize_for_read(obj))
+            if after is not None:
+                next_after = rows[-1]["seq"] if rows else int(after)
+            else:
+                # Everything up to here is either returned or older than the window.
+                next_after = conn.execute("SELECT MAX(seq) FROM agent_events").fetchone()[0] or 0
+
+        out: List[Dict[str, Any]] = []
+        for r in rows:
+            try:
+                obj = _json_loads(r["payload_json"])
+            except Exception:
+                continue
+            if not isinstance(obj, dict):
+                continue
+            evt = self.normalize_for_read(obj)
+            evt["seq"] = r["seq"]
+            out.append(evt)
+        if after is None:
             out.reverse()
-            return out
-        finally:
-            conn.close()
+        return out, next_after
 
 
+@instrument_store('agent_profiles', ('list', 'get', 'create', 'patch', 'delete'))
 class AgentProfilesStore:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self._ensure_db()
-
-    def _ensure_db(self) -> None:
-        conn = connect(self.db_path)
-        try:
-            migrate(conn)
-        finally:
-            conn.close()
+    def __init__(self, storage: Union[StorageContext, str]):
+        self._storage = as_storage(storage)
+        self.db_path = self._storage.db_path
 
     def _row_to_profile(self, row) -> AgentProfile:
         payload = _json_loads(row["payload_json"])
@@ -826,7 +1265,7 @@ class AgentProfilesStore:
         }
 
     def list(self, *, enabled: Optional[bool] = None) -> List[AgentProfile]:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             sql = "SELECT * FROM agent_profiles"
             args: List[Any] = []
@@ -837,21 +1276,21 @@ class AgentProfilesStore:
             rows = conn.execute(sql, tuple(args)).fetchall()
             return [self._row_to_profile(r) for r in rows]
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def get(self, profile_id: str) -> Optional[AgentProfile]:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             row = conn.execute(
                 "SELECT * FROM agent_profiles WHERE id=?", (profile_id,)
             ).fetchone()
             return self._row_to_profile(row) if row else None
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def create(self, payload: Dict[str, Any]) -> AgentProfile:
         prof, _ = normalize_agent_profile(payload)
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 row = conn.execute(
@@ -877,10 +1316,10 @@ class AgentProfilesStore:
                 _meta_set(conn, "agent_profiles.lastUpdated", _now())
                 return prof
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def patch(self, profile_id: str, patch: Dict[str, Any]) -> AgentProfile:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 row = conn.execute(
@@ -912,10 +1351,10 @@ class AgentProfilesStore:
                 _meta_set(conn, "agent_profiles.lastUpdated", _now())
                 return np
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def delete(self, profile_id: str) -> None:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 cur = conn.execute(
@@ -925,20 +1364,14 @@ class AgentProfilesStore:
                     raise KeyError("not found")
                 _meta_set(conn, "agent_profiles.lastUpdated", _now())
         finally:
-            conn.close()
+            self._storage.release(conn)
 
 
+@instrument_store('agent_capabilities', ('list', 'get', 'create', 'patch', 'delete'))
 class AgentCapabilitiesStore:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self._ensure_db()
-
-    def _ensure_db(self) -> None:
-        conn = connect(self.db_path)
-        try:
-            migrate(conn)
-        finally:
-            conn.close()
+    def __init__(self, storage: Union[StorageContext, str]):
+        self._storage = as_storage(storage)
+        self.db_path = self._storage.db_path
 
     def _row_to_capability(self, row) -> AgentCapability:
         payload = _json_loads(row["payload_json"])
@@ -958,7 +1391,7 @@ class AgentCapabilitiesStore:
         }
 
     def list(self, *, enabled: Optional[bool] = None) -> List[AgentCapability]:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             sql = "SELECT * FROM agent_capabilities"
             args: List[Any] = []
@@ -969,21 +1402,21 @@ class AgentCapabilitiesStore:
             rows = conn.execute(sql, tuple(args)).fetchall()
             return [self._row_to_capability(r) for r in rows]
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def get(self, capability_id: str) -> Optional[AgentCapability]:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             row = conn.execute(
                 "SELECT * FROM agent_capabilities WHERE id=?", (capability_id,)
             ).fetchone()
             return self._row_to_capability(row) if row else None
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def create(self, payload: Dict[str, Any]) -> AgentCapability:
         cap, _ = normalize_agent_capability(payload)
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 row = conn.execute(
@@ -1008,10 +1441,10 @@ class AgentCapabilitiesStore:
                 _meta_set(conn, "agent_capabilities.lastUpdated", _now())
                 return cap
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def patch(self, capability_id: str, patch: Dict[str, Any]) -> AgentCapability:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 row = conn.execute(
@@ -1040,10 +1473,10 @@ class AgentCapabilitiesStore:
                 _meta_set(conn, "agent_capabilities.lastUpdated", _now())
                 return nc
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def delete(self, capability_id: str) -> None:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             with conn:
                 cur = conn.execute(
@@ -1053,20 +1486,14 @@ class AgentCapabilitiesStore:
                     raise KeyError("not found")
                 _meta_set(conn, "agent_capabilities.lastUpdated", _now())
         finally:
-            conn.close()
+            self._storage.release(conn)
 
 
+@instrument_store('token_usage', ('ingest_many', 'list', 'rebuild_rollups', 'aggregate', 'series'))
 class TokenUsageStore:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self._ensure_db()
-
-    def _ensure_db(self) -> None:
-        conn = connect(self.db_path)
-        try:
-            migrate(conn)
-        finally:
-            conn.close()
+    def __init__(self, storage: Union[StorageContext, str]):
+        self._storage = as_storage(storage)
+        self.db_path = self._storage.db_path
 
     def _row_to_usage(self, row) -> TokenUsageRecord:
         payload = _json_loads(row["payload_json"])
@@ -1102,44 +1529,77 @@ class TokenUsageStore:
             "data": {},
         }
 
+    _INSERT_SQL = (
+        "INSERT INTO token_usage_records("
+        "id, ts, project_id, run_id, agent_id, workspace, session_id, source, model, "
+        "prompt_tokens, completion_tokens, total_tokens, cost, payload_json"
+        ") VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    def _usage_params(self, rec: TokenUsageRecord) -> Tuple[Any, ...]:
+        return (
+            rec["id"],
+            rec.get("ts"),
+            rec.get("projectId"),
+            rec.get("runId"),
+            rec.get("agentId"),
+            rec.get("workspace"),
+            rec.get("sessionId"),
+            rec.get("source"),
+            rec.get("model"),
+            int(rec.get("promptTokens") or 0),
+            int(rec.get("completionTokens") or 0),
+            int(rec.get("totalTokens") or 0),
+            float(rec.get("cost") or 0),
+            _json_dumps(rec),
+        )
+
     def ingest(self, payload: Dict[str, Any]) -> Tuple[TokenUsageRecord, bool]:
-        rec, _ = normalize_token_usage_record(payload)
-        conn = connect(self.db_path)
+        return self.ingest_many([payload])[0]
+
+    def ingest_many(
+        self, payloads: List[Dict[str, Any]]
+    ) -> List[Tuple[TokenUsageRecord, bool]]:
+        """Ingest a batch of usage records in one transaction.
+
+        Returns (record, created) per input, in input order. A record whose id
+        already exists (in the DB or earlier in the batch) is returned as
+        stored, with created=False.
+        """
+        recs = [normalize_token_usage_record(p)[0] for p in payloads or []]
+        if not recs:
+            return []
+
+        conn = self._storage.acquire()
         try:
             with conn:
-                existing = conn.execute(
-                    "SELECT * FROM token_usage_records WHERE id=?", (rec["id"],)
-                ).fetchone()
-                if existing:
-                    return self._row_to_usage(existing), False
-                conn.execute(
-                    (
-                        "INSERT INTO token_usage_records("
-                        "id, ts, project_id, run_id, agent_id, workspace, session_id, source, model, "
-                        "prompt_tokens, completion_tokens, total_tokens, cost, payload_json"
-                        ") VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-                    ),
-                    (
-                        rec["id"],
-                        rec.get("ts"),
-                        rec.get("projectId"),
-                        rec.get("runId"),
-                        rec.get("agentId"),
-                        rec.get("workspace"),
-                        rec.get("sessionId"),
-                        rec.get("source"),
-                        rec.get("model"),
-                        int(rec.get("promptTokens") or 0),
-                        int(rec.get("completionTokens") or 0),
-                        int(rec.get("totalTokens") or 0),
-                        float(rec.get("cost") or 0),
-                        _json_dumps(rec),
-                    ),
+                rows = _select_in(
+                    conn,
+                    "SELECT * FROM token_usage_records WHERE id IN ({marks})",
+                    list({r["id"] for r in recs}),
                 )
-                _meta_set(conn, "token_usage.lastUpdated", _now())
-                return rec, True
+                known: Dict[str, TokenUsageRecord] = {
+                    row["id"]: self._row_to_usage(row) for row in rows
+                }
+
+                results: List[Tuple[TokenUsageRecord, bool]] = []
+                new_rows: List[Tuple[Any, ...]] = []
+                for rec in recs:
+                    existing = known.get(rec["id"])
+                    if existing is not None:
+                        results.append((existing, False))
+                        continue
+                    known[rec["id"]] = rec
+                    new_rows.append(self._usage_params(rec))
+                    results.append((rec, True))
+
+                if new_rows:
+                    conn.executemany(self._INSERT_SQL, new_rows)
+                    self._update_rollups(conn, new_rows)
+                    _meta_set(conn, "token_usage.lastUpdated", _now())
+                return results
         finally:
-            conn.close()
+            self._storage.release(conn)
 
     def list(
         self,
@@ -1152,7 +1612,7 @@ class TokenUsageStore:
         until: Optional[str] = None,
         limit: int = 200,
     ) -> List[TokenUsageRecord]:
-        conn = connect(self.db_path)
+        conn = self._storage.acquire()
         try:
             where = []
             args: List[Any] = []
@@ -1184,22 +1644,189 @@ class TokenUsageStore:
             rows = conn.execute(sql, tuple(args)).fetchall()
             return [self._row_to_usage(r) for r in rows]
         finally:
-            conn.close()
-
-    def aggregate(self, **filters) -> Dict[str, Any]:
-        items = self.list(**filters, limit=5000)
-
-        def _blank() -> Dict[str, Any]:
-            return {
-                "records": 0,
-                "promptTokens": 0,
-                "completionTokens": 0,
-                "totalTokens": 0,
-                "cost": 0.0,
-            }
+            self._storage.release(conn)
+
+    _ROLLUP_UPSERT_SQL = (
+        "INSERT INTO token_usage_daily("
+        "day, project_id, agent_id, workspace, model, source, "
+        "records, prompt_tokens, completion_tokens, total_tokens, cost"
+        ") VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(day, project_id, agent_id, workspace, model, source) DO UPDATE SET "
+        "records=records+excluded.records, "
+        "prompt_tokens=prompt_tokens+excluded.prompt_tokens, "
+        "completion_tokens=completion_tokens+excluded.completion_tokens, "
+        "total_tokens=total_tokens+excluded.total_tokens, "
+        "cost=cost+excluded.cost"
+    )
+
+    def _update_rollups(self, conn, rows: List[Tuple[Any, ...]]) -> None:
+        """Fold freshly inserted rows (_usage_params tuples) into token_usage_daily."""
+        buckets: Dict[Tuple[str, ...], List[Any]] = {}
+        for r in rows:
+            # (day, project_id, agent_id, workspace, model, source)
+            key = (str(r[1] or "")[:10],) + tuple(
+                str(v or "") for v in (r[2], r[4], r[5], r[8], r[7])
+            )
+            b = buckets.setdefault(key, [0, 0, 0, 0, 0.0])
+            b[0] += 1
+            b[1] += r[9]
+            b[2] += r[10]
+            b[3] += r[11]
+            b[4] += r[12]
+        conn.executemany(
+            self._ROLLUP_UPSERT_SQL, [k + tuple(v) for k, v in buckets.items()]
+        )
+
+    def rebuild_rollups(self) -> None:
+        """Recompute token_usage_daily from the raw records."""
+        conn = self._storage.acquire()
+        try:
+            with conn:
+                rebuild_token_usage_rollups(conn)
+        finally:
+            self._storage.release(conn)
+
+    # Column expressions per source table for _group_usage key templates.
+    _ROLLUP_COLUMNS = {
+        "day": "day",
+        "project_id": "project_id",
+        "agent_id": "agent_id",
+        "workspace": "workspace",
+        "model": "model",
+        "source": "source",
+    }
+    _RAW_COLUMNS = {
+        "day": "substr(ts, 1, 10)",
+        "ts": "ts",
+        "project_id": "COALESCE(project_id, '')",
+        "agent_id": "COALESCE(agent_id, '')",
+        "workspace": "COALESCE(workspace, '')",
+        "model": "COALESCE(model, '')",
+        "source": "COALESCE(source, '')",
+    }
+
+    def _group_usage(
+        self,
+        keys: List[str],
+        *,
+        project_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        workspace: Optional[str] = None,
+        source: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        raw_only: bool = False,
+    ) -> List[Tuple[Any, ...]]:
+        """SQL GROUP BY over usage, returning (key..., records, prompt, completion, total, cost).
+
+        `keys` are templates over {day}, {ts} and the dimension columns
+        ({project_id}, ...); NULL dimensions come back as ''. Whole days of
+        the window are read from token_usage_daily, partial edge days from
+        raw records. raw_only=True (needed for {ts} keys) groups raw records
+        only. Rows from the two sources are not merged; callers fold them.
+        """
+        dims: List[str] = []
+        dim_args: List[Any] = []
+        for col, val in (
+            ("project_id", project_id),
+            ("agent_id", agent_id),
+            ("workspace", workspace),
+            ("source", source),
+        ):
+            if val:
+                dims.append(f"{col}=?")
+                dim_args.append(val)
+
+        if raw_only:
+            where, args = [], []
+            if since:
+                where.append("ts>=?")
+                args.append(since)
+            if until:
+                where.append("ts<=?")
+                args.append(until)
+            days, raw_ranges = None, [(" AND ".join(where) or "1", args)]
+        else:
+            days, raw_ranges = _usage_window(since, until)
+
+        def _select(table: str, columns: Dict[str, str], count: str) -> str:
+            key_sql = ", ".join(k.format(**columns) for k in keys)
+            return (
+                f"SELECT {key_sql}{', ' if keys else ''}{count}, SUM(prompt_tokens), "
+                "SUM(completion_tokens), SUM(total_tokens), SUM(cost) "
+                f"FROM {table} WHERE "
+            )
+
+        group_sql = (
+            " GROUP BY " + ", ".join(str(i + 1) for i in range(len(keys)))
+            if keys
+            else ""
+        )
+        queries: List[Tuple[str, List[Any]]] = []
+        if days is not None:
+            where = list(dims)
+            args = list(dim_args)
+            if days[0]:
+                where.append("day>=?")
+                args.append(days[0])
+            if days[1]:
+                where.append("day<=?")
+                args.append(days[1])
+            queries.append(
+                (
+                    _select("token_usage_daily", self._ROLLUP_COLUMNS, "SUM(records)")
+                    + (" AND ".join(where) or "1")
+                    + group_sql,
+                    args,
+                )
+            )
+        for range_sql, range_args in raw_ranges:
+            queries.append(
+                (
+                    _select("token_usage_records", self._RAW_COLUMNS, "COUNT(1)")
+                    + " AND ".join(dims + [range_sql])
+                    + group_sql,
+                    dim_args + range_args,
+                )
+            )
+
+        conn = self._storage.acquire()
+        try:
+            rows = []
+            for sql, args in queries:
+                rows.extend(conn.execute(sql, tuple(args)).fetchall())
+            return rows
+        finally:
+            self._storage.release(conn)
+
+    def aggregate(
+        self,
+        *,
+        project_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        workspace: Optional[str] = None,
+        source: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Totals and per-day/project/agent/workspace/model breakdowns.
+
+        Whole days inside [since, until] come from token_usage_daily; partial
+        edge days are grouped from raw records. Cost is O(buckets), and
+        nothing is truncated.
+        """
+        rows = self._group_usage(
+            ["{day}", "{project_id}", "{agent_id}", "{workspace}", "{model}"],
+            project_id=project_id,
+            agent_id=agent_id,
+            workspace=workspace,
+            source=source,
+            since=since,
+            until=until,
+        )
 
         out = {
-            "totals": _blank(),
+            "totals": _usage_blank(),
             "byDay": {},
             "byProject": {},
             "byAgent": {},
@@ -1207,31 +1834,18 @@ class TokenUsageStore:
             "byModel": {},
         }
 
-        def _acc(bucket: Dict[str, Any], rec: TokenUsageRecord) -> None:
-            bucket["records"] += 1
-            bucket["promptTokens"] += int(rec.get("promptTokens") or 0)
-            bucket["completionTokens"] += int(rec.get("completionTokens") or 0)
-            bucket["totalTokens"] += int(rec.get("totalTokens") or 0)
-            bucket["cost"] += float(rec.get("cost") or 0)
-
-        for rec in items:
-            _acc(out["totals"], rec)
-            day = str(rec.get("ts") or "")[:10] or "unknown"
-            pid = str(rec.get("projectId") or "unassigned")
-            aid = str(rec.get("agentId") or "unassigned")
-            wsp = str(rec.get("workspace") or "unknown")
-            mdl = str(rec.get("model") or "unknown")
-
+        for row in rows:
+            _usage_acc(out["totals"], row[5:])
             for group_name, key in (
-                ("byDay", day),
-                ("byProject", pid),
-                ("byAgent", aid),
-                ("byWorkspace", wsp),
-                ("byModel", mdl),
+                ("byDay", row[0] or "unknown"),
+                ("byProject", row[1] or "unassigned"),
+                ("byAgent", row[2] or "unassigned"),
+                ("byWorkspace", row[3] or "unknown"),
+                ("byModel", row[4] or "unknown"),
             ):
                 if key not in out[group_name]:
-                    out[group_name][key] = _blank()
-                _acc(out[group_name][key], rec)
+                    out[group_name][key] = _usage_blank()
+                _usage_acc(out[group_name][key], row[5:])
 
         def _to_list(
             d: Dict[str, Dict[str, Any]], key_name: str
@@ -1252,3 +1866,130 @@ class TokenUsageStore:
             "byWorkspace": _to_list(out["byWorkspace"], "workspace"),
             "byModel": _to_list(out["byModel"], "model"),
         }
+
+    def series(
+        self,
+        *,
+        granularity: str = "day",
+        group_by: Optional[List[str]] = None,
+        limit: int = 10,
+        project_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        workspace: Optional[str] = None,
+        source: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Zero-filled time series of usage, optionally split by dimensions.
+
+        granularity: hour|day|week|month (weeks start on Monday).
+        group_by: any of projectId, agentId, workspace, model, source.
+        limit: keep the top-N series by totalTokens; the rest are summed
+        into `other`.
+
+        With `since` and no `until` the window ends now, at every
+        granularity: future-dated records are left out of both the buckets
+        and the totals.
+
+        Raises:
+            ValueError: On unknown granularity/dimension, unparseable
+                since/until, or a window with too many buckets
+        """
+        if granularity not in _USAGE_GRANULARITIES:
+            raise ValueError(f"invalid granularity: {granularity}")
+        group_by = list(dict.fromkeys(group_by or []))
+        for name in group_by:
+            if name not in _USAGE_GROUP_BY:
+                raise ValueError(f"invalid groupBy: {name}")
+        limit = max(1, int(limit))
+
+        first = _usage_bucket(since, granularity) if since else None
+        last = _usage_bucket(until, granularity) if until else None
+        if since and first is None:
+            raise ValueError(f"invalid since: {since}")
+        if until and last is None:
+            raise ValueError(f"invalid until: {until}")
+        if since and not until:
+            until = datetime.now().isoformat(timespec="seconds")
+            last = _usage_bucket(until, granularity)
+
+        keys = [_USAGE_GRANULARITIES[granularity]] + [
+            "{%s}" % _USAGE_GROUP_BY[name][0] for name in group_by
+        ]
+        rows = self._group_usage(
+            keys,
+            project_id=project_id,
+            agent_id=agent_id,
+            workspace=workspace,
+            source=source,
+            since=since,
+            until=until,
+            raw_only=granularity == "hour",
+        )
+
+        # Fold rows (rollup + raw edges may repeat a bucket) into
+        # {series key: {bucket: measures}}.
+        n = len(keys)
+        grouped: Dict[Tuple[str, ...], Dict[str, Dict[str, Any]]] = {}
+        seen = []
+        for row in rows:
+            bucket = row[0]
+            if not bucket or _usage_bucket(bucket, granularity) != bucket:
+                continue  # malformed ts
+            seen.append(bucket)
+            points = grouped.setdefault(tuple(row[1:n]), {})
+            if bucket not in points:
+                points[bucket] = _usage_blank()
+            _usage_acc(points[bucket], row[n:])
+
+        if seen:
+            first = first or min(seen)
+            last = last or max(seen)
+        buckets = _usage_buckets(first, last, granularity) if first and last else []
+
+        def _series(points: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+            totals = _usage_blank()
+            out = []
+            for b in buckets:
+                m = points.get(b) or _usage_blank()
+                _usage_acc(totals, _usage_measures(m))
+                point = {"bucket": _usage_bucket_label(b, granularity)}
+                point.update(m)
+                out.append(point)
+            return {"totals": totals, "points": out}
+
+        all_series = []
+        for key, points in grouped.items():
+            item = {
+                "key": {name: (v or None) for name, v in zip(group_by, key)},
+                "label": " / ".join(
+                    v or _USAGE_GROUP_BY[name][1] for name, v in zip(group_by, key)
+                ) or "all",
+            }
+            item.update(_series(points))
+            all_series.append(item)
+        all_series.sort(key=lambda x: (-x["totals"]["totalTokens"], x["label"]))
+
+        other = None
+        if len(all_series) > limit:
+            merged: Dict[str, Dict[str, Any]] = {}
+            for item in all_series[limit:]:
+                for b, p in zip(buckets, item["points"]):
+                    _usage_acc(merged.setdefault(b, _usage_blank()), _usage_measures(p))
+            other = {"label": "other", "seriesCount": len(all_series) - limit}
+            other.update(_series(merged))
+            all_series = all_series[:limit]
+
+        totals = _usage_blank()
+        for item in all_series + ([other] if other else []):
+            _usage_acc(totals, _usage_measures(item["totals"]))
+
+        return {
+            "granularity": granularity,
+            "groupBy": group_by,
+            "buckets": [_usage_bucket_label(b, granularity) for b in buckets],
+            "totals": totals,
+            "series": all_series,
+            "other": other,
+        }
+
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""Opt-in SQL tracing (PM_SQL_TRACE=1).
+
+When a tracer is installed (sqlite_db.set_tracer), connect() hands out
+connections whose cursors time every statement:
+
+- duration: execute plus every fetch, until the cursor is exhausted,
+  closed or garbage-collected;
+- rows: rows fetched for queries, `rowcount` for writes;
+- caller: the store method that issued it (`ProjectsStore.list`), found
+  by walking the stack. Outside the stores, the nearest application frame
+  (`action_service.py:ActionService.execute`).
+
+Statements are aggregated by normalized text: literals become `?` and
+`IN (?, ?, ...)` lists collapse to `IN (?...)`. That gives a top-N by
+total time (GET /api/admin/sql). Statements slower than PM_SQL_SLOW_MS are
+appended to a rotating JSONL file. Bound parameters are never logged.
+
+Tracing costs a Python call per execute/fetch and a stack walk per
+statement, so it is meant for diagnosing, not for always-on use. Without
+a tracer, connections are plain PooledConnections and cost nothing extra.
+"""
+
+from __future__ import annotations
+
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..jsoncodec import get_codec
+
+
+_WS_RE = re.compile(r'\s+')
+_STR_RE = re.compile(r"'(?:[^']|'')*'")
+_NUM_RE = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+
+# Frames from these files are plumbing, never reported as the caller.
+_SKIP_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'context.py'),
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'metrics.py'),
+}
+_STORE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sqlite_store.py')
+_STACK_LIMIT = 40
+# Distinct normalized statements kept; the rest are folded into one entry.
+_MAX_STATEMENTS = 2000
+_OTHER = '<other statements>'
+
+
+def normalize_sql(sql: str) -> str:
+    """Statement shape: literals -> ?, IN lists collapsed, whitespace squeezed."""
+    s = _STR_RE.sub('?', str(sql))
+    s = _NUM_RE.sub('?', s)
+    s = _WS_RE.sub(' ', s).strip()
+    return _IN_RE.sub('IN (?...)', s)
+
+
+def _frame_name(code) -> str:
+    return getattr(code, 'co_qualname', code.co_name)
+
+
+def find_caller() -> str:
+    """Outermost store method on the stack, else the nearest app frame."""
+    f = sys._getframe(2)
+    store = None
+    fallback = None
+    depth = 0
+    while f is not None and depth < _STACK_LIMIT:
+        filename = f.f_code.co_filename
+        if filename == _STORE_FILE:
+            store = _frame_name(f.f_code)
+        elif store is None and fallback is None and filename not in _SKIP_FILES \
+                and 'contextlib' not in filename:
+            fallback = f"{os.path.basename(filename)}:{_frame_name(f.f_code)}"
+        f = f.f_back
+        depth += 1
+    return store or fallback or '<unknown>'
+
+
+class _Stat:
+    __slots__ = ('count', 'total', 'max', 'rows', 'callers')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.callers: Dict[str, int] = {}
+
+
+class SqlTracer:
+    """Per-statement aggregates plus the slow-query log."""
+
+    def __init__(self, *, slow_ms: float = 100.0, slow_log: Optional[str] = None,
+                 max_bytes: int = 10 * 1024 * 1024, backups: int = 3):
+        self.slow_ms = max(0.0, float(slow_ms))
+        self.slow_log = slow_log
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _Stat] = {}
+        self._slow = 0
+        self._handler: Optional[logging.Handler] = None
+        if slow_log:
+            os.makedirs(os.path.dirname(os.path.abspath(slow_log)), exist_ok=True)
+            # Opened on first write; rotation as in any RotatingFileHandler.
+            self._handler = logging.handlers.RotatingFileHandler(
+                slow_log, maxBytes=max(0, int(max_bytes)), backupCount=max(0, int(backups)),
+                encoding='utf-8', delay=True,
+            )
+            self._handler.setFormatter(logging.Formatter('%(message)s'))
+        self._classes: Dict[type, type] = {}
+
+    def connection_class(self, base: type) -> type:
+        """Subclass of `base` (a sqlite3.Connection type) whose cursors are traced."""
+        cls = self._classes.get(base)
+        if cls is None:
+            tracer = self
+
+            class _TracedConnection(base):
+                def cursor(self, factory=None):
+                    cur = super().cursor(factory or TracingCursor)
+                    if isinstance(cur, TracingCursor):
+                        cur._tracer = tracer
+                    return cur
+
+                # sqlite3.Connection.execute* do not go through cursor().
+                def execute(self, sql, parameters=()):
+                    return self.cursor().execute(sql, parameters)
+
+                def executemany(self, sql, seq_of_parameters):
+                    return self.cursor().executemany(sql, seq_of_parameters)
+
+                def executescript(self, script):
+                    return self.cursor().executescript(script)
+
+            _TracedConnection.__name__ = f"Traced{base.__name__}"
+            cls = self._classes.setdefault(base, _TracedConnection)
+        return cls
+
+    def record(self, sql: str, seconds: float, rows: int, caller: str) -> None:
+        key = normalize_sql(sql)
+        ms = seconds * 1000.0
+        slow = ms >= self.slow_ms
+        with self._lock:
+            st = self._stats.get(key)
+            if st is None:
+                if len(self._stats) >= _MAX_STATEMENTS:
+                    key = _OTHER
+                st = self._stats.setdefault(key, _Stat())
+            st.count += 1
+            st.total += seconds
+            st.rows += rows
+            if seconds > st.max:
+                st.max = seconds
+            st.callers[caller] = st.callers.get(caller, 0) + 1
+            if slow:
+                self._slow += 1
+        if slow and self._handler is not None:
+            line = get_codec().dumps({
+                'ts': datetime.now().isoformat(),
+                'pid': os.getpid(),
+                'ms': round(ms, 3),
+                'rows': rows,
+                'caller': caller,
+                'sql': key,
+            })
+            self._handler.handle(logging.makeLogRecord({'msg': line, 'levelno': logging.WARNING}))
+
+    def top(self, limit: int = 20, sort: str = 'total') -> List[Dict[str, Any]]:
+        """Statements ordered by `total` (seconds), `max`, `count` or `rows`."""
+        with self._lock:
+            items = [(sql, st.count, st.total, st.max, st.rows, dict(st.callers))
+                     for sql, st in self._stats.items()]
+        index = {'count': 1, 'total': 2, 'max': 3, 'rows': 4}.get(sort, 2)
+        items.sort(key=lambda it: it[index], reverse=True)
+        out = []
+        for sql, count, total, mx, rows, callers in items[:max(1, int(limit))]:
+            out.append({
+                'sql': sql,
+                'count': count,
+                'totalMs': round(total * 1000.0, 3),
+                'avgMs': round(total * 1000.0 / count, 3) if count else 0.0,
+                'maxMs': round(mx * 1000.0, 3),
+                'rows': rows,
+                'callers': dict(sorted(callers.items(), key=lambda kv: kv[1], reverse=True)),
+            })
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'statements': len(self._stats),
+                'executions': sum(st.count for st in self._stats.values()),
+                'totalMs': round(sum(st.total for st in self._stats.values()) * 1000.0, 3),
+                'slow': self._slow,
+                'slowMs': self.slow_ms,
+                'slowLog': self.slow_log,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._slow = 0
+
+    def after_fork(self) -> None:
+        """In a forked child: fresh lock, and no statements from the parent."""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def close(self) -> None:
+        if self._handler is not None:
+            self._handler.close()
+
+
+class TracingCursor(sqlite3.Cursor):
+    """Cursor that reports each statement to its tracer once it is done."""
+
+    _tracer: Optional[SqlTracer] = None
+    _sql: Optional[str] = None
+    _elapsed = 0.0
+    _rows = 0
+    _caller = ''
+
+    def _finish(self) -> None:
+        if self._sql is not None and self._tracer is not None:
+            self._tracer.record(self._sql, self._elapsed, self._rows, self._caller)
+        self._sql = None
+
+    def _start(self, sql: str) -> None:
+        self._finish()
+        self._sql = sql
+        self._elapsed = 0.0
+        self._rows = 0
+        self._caller = find_caller()
+
+    def _done_if_not_query(self) -> None:
+        if self.description is None:
+            self._rows = max(0, self.rowcount)
+            self._finish()
+
+    def execute(self, sql, parameters=()):
+        self._start(sql)
+        t0 = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._elapsed += time.perf_counter() - t0
+        self._done_if_not_query()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql)
+        t0 = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self._elapsed += time.perf_counter() - t0
+        self._done_if_not_query()
+        return self
+
+    def executescript(self, script):
+        self._start(script)
+        t0 = time.perf_counter()
+        try:
+            super().executescript(script)
+        finally:
+            self._elapsed += time.perf_counter() - t0
+        self._finish()
+        return self
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - t0
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._elapsed += time.perf_counter() - t0
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - t0
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - t0
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - t0
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Partially read queries (fetchone() on a one-row lookup) end here.
+        self._finish()
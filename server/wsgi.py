@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""WSGI entry point for production servers.
+
+    gunicorn -c server/gunicorn.conf.py      # what server/main.py runs on Linux
+    waitress-serve --port=8689 wsgi:app       # from server/, e.g. on Windows
+
+Importing this module builds the app: storage is opened and migrations
+are applied. Under gunicorn with preload (the default) that happens once
+in the master, before any worker is forked.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mypm import create_app, Config  # noqa: E402
+
+
+app = create_app(Config())